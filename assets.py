@@ -0,0 +1,170 @@
+"""
+Fonts and images that are loaded the first time they are asked for and shared after that
+images are also kept scaled to the few sizes in {SCALES} the screens can be laid out at, so a window of any size
+only ever blits them and never scales them while drawing
+"""
+
+import os, pygame
+from pygame.locals import *
+from concurrent.futures import ThreadPoolExecutor, Future
+from pygame_tools import Point, clip_surface
+from render_cache import TextCache, CachedFont
+
+
+SCALES = (0.5, 0.75, 1, 1.25, 1.5, 2, 2.5, 3, 4) # the sizes the screens can be laid out at, compared to their design size
+
+# posted when a scale built by {Assets.prescale} is ready. its scale attribute is the scale
+SCALE_READY = pygame.event.custom_type()
+
+def get_scale(window_size: Point, design_size: Point) -> float:
+    """The biggest of {SCALES} that {design_size} fits into {window_size} at"""
+    fit = min(window_size.x / design_size.x, window_size.y / design_size.y)
+    return max((scale for scale in SCALES if scale <= fit), default = SCALES[0])
+
+def get_neighbour_scales(scale: float) -> [float]:
+    """The scales just bigger and smaller than {scale}, the ones a resize is most likely to go to"""
+    i = SCALES.index(scale)
+    return list(SCALES[max(0, i - 1):i]) + list(SCALES[i + 1:i + 2])
+
+def scaled(value: int, scale: float) -> int:
+    """A size or position from the design size at {scale}"""
+    return round(value * scale)
+
+def scaled_rect(x: int, y: int, w: int, h: int, scale: float) -> Rect:
+    """A rect from the design size at {scale}"""
+    return Rect(scaled(x, scale), scaled(y, scale), scaled(w, scale), scaled(h, scale))
+
+def scale_image(image: pygame.Surface, scale: float) -> pygame.Surface:
+    if scale == 1:
+        return image
+    return pygame.transform.smoothscale(image, (scaled(image.get_width(), scale), scaled(image.get_height(), scale)))
+
+def split_cells(image: pygame.Surface, count: int, cell_size: Point) -> [pygame.Surface]:
+    """Split {image} into {count} tiles side by side, each scaled to {cell_size}"""
+    tile_size = Point(image.get_width() // count, image.get_height())
+    return [pygame.transform.scale(clip_surface(image, Rect((x, 0), tile_size)), cell_size) for x in range(0, tile_size.x * count, tile_size.x)]
+
+class Assets:
+    """
+    Loads every font and image once, the first time it is needed
+    images are converted to the pixel format of the display when it has been set, so blitting them doesn't have to.
+    scaled images and cell tiles are kept for the scales in use, and {self.prescale} builds a scale's
+    on a background thread so it is ready before a resize needs it
+    """
+
+    def __init__(self, directory: str = 'assets', font_name: str = 'tetris-atari.ttf', text_cache: TextCache = None):
+        """
+        :directory: Optional. defaults to 'assets'. the folder with the fonts and images folders in it
+        :font_name: Optional. defaults to 'tetris-atari.ttf'. the font in the fonts folder that {self.font} uses
+        :text_cache: Optional. defaults to a new TextCache. the cache the fonts from {self.cached_font} render through
+        """
+        self.directory = directory
+        self.font_path = os.path.join(self.directory, 'fonts', font_name)
+        self.text_cache = text_cache if text_cache is not None else TextCache()
+        self.fonts = {}
+        self.cached_fonts = {}
+        self.images = {}
+        self.cells = {}
+        self.cell_scales = {} # cells key: the scales the tiles are used at, so they are thrown out with the last of them
+        self.scaled_images = {} # scale: {name: image}
+        self.ready_scales = {1} # the scales {self.prescale} has finished, scale 1 is the images as they are
+        self.building = {} # scale: the future of it being built
+        self.builder = None
+        self.builder_images = {} # the builder's own copies of the images, as one being scaled can't be blitted at the same time
+
+    def font(self, size: int) -> pygame.font.Font:
+        """Get the game's font at {size}"""
+        font = self.fonts.get(size)
+        if font is None:
+            font = self.fonts[size] = pygame.font.Font(self.font_path, size)
+        return font
+
+    def cached_font(self, size: int) -> CachedFont:
+        """Get the game's font at {size} with its text rendered through {self.text_cache}"""
+        font = self.cached_fonts.get(size)
+        if font is None:
+            font = self.cached_fonts[size] = CachedFont(self.font(size), self.text_cache)
+        return font
+
+    def image(self, name: str) -> pygame.Surface:
+        """
+        Get an image from the images folder
+        the surface is shared so it must not be drawn on
+        """
+        image = self.images.get(name)
+        if image is None:
+            image = pygame.image.load(os.path.join(self.directory, 'images', name))
+            if pygame.display.get_surface() is not None:
+                image = image.convert_alpha() if image.get_flags() & SRCALPHA else image.convert()
+            self.images[name] = image
+        return image
+
+    def scaled_image(self, name: str, scale: float) -> pygame.Surface:
+        """
+        Get an image from the images folder at {scale} times its size
+        the surface is shared so it must not be drawn on
+        """
+        images = self.scaled_images.setdefault(scale, {})
+        image = images.get(name)
+        if image is None:
+            image = images[name] = scale_image(self.image(name), scale)
+        return image
+
+    def prescale(self, scale: float, images: [str], cells: [(str, int, Point)]) -> Future:
+        """
+        Build {images} at {scale} and the cell tiles of {self.get_cells} for each of {cells} on a background thread
+        a SCALE_READY event is posted when they are all built
+        :returns: the future of them being built, the same one while it is still building
+        """
+        future = self.building.get(scale)
+        if future is not None and not future.done():
+            return future
+        for name in images + [name for name, _, _ in cells]:
+            if name not in self.builder_images:
+                self.builder_images[name] = self.image(name).copy()
+        for name, count, cell_size in cells:
+            self.cell_scales.setdefault((name, count, tuple(cell_size)), set()).add(scale)
+        if self.builder is None:
+            self.builder = ThreadPoolExecutor(max_workers = 1, thread_name_prefix = 'prescale')
+        def build():
+            scaled_images = self.scaled_images.setdefault(scale, {})
+            for name in images:
+                if name not in scaled_images:
+                    scaled_images[name] = scale_image(self.builder_images[name], scale)
+            for name, count, cell_size in cells:
+                key = (name, count, tuple(cell_size))
+                if key not in self.cells:
+                    self.cells[key] = split_cells(self.builder_images[name], count, cell_size)
+            self.ready_scales.add(scale)
+            pygame.event.post(pygame.event.Event(SCALE_READY, scale = scale))
+        future = self.building[scale] = self.builder.submit(build)
+        return future
+
+    def keep_scales(self, scales: {float}):
+        """
+        Throw out the scaled images and cell tiles of every scale except {scales}, so only a few sizes of each are kept
+        scale 1 and the scales {self.prescale} is still building are always kept, as the builder would mark them ready after
+        """
+        scales = set(scales) | {1} | {scale for scale, future in self.building.items() if not future.done()}
+        for scale in list(self.scaled_images):
+            if scale not in scales:
+                del self.scaled_images[scale]
+                self.ready_scales.discard(scale)
+        for key, used_at in list(self.cell_scales.items()):
+            used_at &= scales
+            if not used_at:
+                del self.cell_scales[key]
+                self.cells.pop(key, None)
+
+    def get_cells(self, name: str, count: int, cell_size: Point, scale: float = 1) -> [pygame.Surface]:
+        """
+        Split an image from the images folder into {count} tiles side by side, each scaled to {cell_size}
+        the surfaces are shared so they must not be drawn on
+        :scale: Optional. defaults to 1. the scale the tiles are used at, they are kept until {self.keep_scales} throws it out
+        """
+        key = (name, count, tuple(cell_size))
+        self.cell_scales.setdefault(key, set()).add(scale)
+        cells = self.cells.get(key)
+        if cells is None:
+            cells = self.cells[key] = split_cells(self.image(name), count, cell_size)
+        return cells
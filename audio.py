@@ -0,0 +1,52 @@
+"""
+Sound effects that are decoded once at startup and played without ever waiting on them
+the game plays sounds by name, the file name of the wav without the extension e.g. assets/audio/level_up.wav is 'level_up'
+"""
+
+import os, pygame
+from glob import glob
+
+
+class NullAudio:
+    """Has no sounds and plays nothing. Used when there is no sound device to play through"""
+
+    def __init__(self):
+        self.sounds = {}
+
+    def play(self, name: str):
+        """Do nothing"""
+
+class MixerAudio:
+    """
+    Plays sounds through pygame.mixer
+    every wav in the audio directory is read and decoded into memory up front so playing one never touches the disk.
+    sounds are mixed on a pool of {self.channels} channels. when they are all busy the one that has been playing
+    the longest is cut off, so play returns straight away
+    """
+
+    def __init__(self, directory: str = 'assets/audio', channels: int = 8):
+        """
+        :directory: Optional. defaults to 'assets/audio'. where the wav files are
+        :channels: Optional. defaults to 8. the most sounds that can play at once
+        """
+        self.channels = channels
+        pygame.mixer.set_num_channels(self.channels)
+        self.sounds = {os.path.splitext(os.path.basename(path))[0]: pygame.mixer.Sound(path) for path in sorted(glob(os.path.join(directory, '*.wav')))}
+
+    def play(self, name: str):
+        """Start playing the sound called {name} if there is one"""
+        sound = self.sounds.get(name)
+        if sound is not None:
+            pygame.mixer.find_channel(True).play(sound)
+
+def get_audio(directory: str = 'assets/audio', channels: int = 8) -> MixerAudio:
+    """
+    Start pygame.mixer and load the sounds in {directory}
+    :returns: a MixerAudio, or a NullAudio if the mixer can't start
+    """
+    try:
+        if not pygame.mixer.get_init():
+            pygame.mixer.init()
+        return MixerAudio(directory, channels)
+    except pygame.error:
+        return NullAudio()
@@ -0,0 +1,250 @@
+"""
+Many games of tetris played at once with numpy
+every board moves forward one step per call to {BatchEngine.step}, with one action each
+"""
+
+import numpy as np
+from enum import IntEnum
+from pygame_tools import Point
+from engine import TETRIMINOS, TetrisEngine
+
+
+class BatchAction(IntEnum):
+    """The action each board takes during a step. Only one per board per step"""
+    NONE = 0
+    MOVE_LEFT = 1
+    MOVE_RIGHT = 2
+    ROTATE_LEFT = 3
+    ROTATE_RIGHT = 4
+    SOFT_DROP = 5
+    FAST_DROP = 6
+    HOLD = 7
+
+# every tetrimino has 4 squares so all of the tables are the same shape
+# CELLS[tetrimino, rotation, square] = (x, y)
+CELLS = np.array([[[(x, y) for x, y, _ in shape.cells] for shape in tetrimino.shapes] for tetrimino in TETRIMINOS], dtype = np.int16)
+# KICKS[tetrimino, rotation before, direction, kick] = (x, y). direction 0 is right and 1 is left
+# tetriminos with fewer kicks repeat their last one
+KICKS = np.array([
+    [
+        [
+            [tuple(kick) for kick in (kicks + kicks[-1:] * 5)[:5]]
+            for kicks in (list(tetrimino.kicks[rotation, (rotation + 1) % 4]), list(tetrimino.kicks[rotation, (rotation - 1) % 4]))
+            ]
+        for rotation in range(4)
+        ]
+    for tetrimino in TETRIMINOS
+    ], dtype = np.int16)
+COLORS = np.array([tetrimino.cell.value + 1 for tetrimino in TETRIMINOS], dtype = np.uint8)
+WIDTHS = np.array([tetrimino.matrix_size.x for tetrimino in TETRIMINOS], dtype = np.int16)
+LEVEL_FRAMES = np.array([TetrisEngine.LEVEL_FRAMES[level] for level in range(TetrisEngine.MAX_LEVEL + 1)], dtype = np.int32)
+LEVEL_LINES = np.array([TetrisEngine.LEVEL_LINES.get(level, 0) for level in range(TetrisEngine.MAX_LEVEL + 1)], dtype = np.int32)
+LINE_SCORES = np.array([0, 40, 100, 300, 1200], dtype = np.int64) # {TetrisEngine.calculate_score} at level 0
+
+class BatchEngine:
+    """
+    Plays {self.count} games of tetris at once
+    the boards are one (count, height, width) array of uint8 where 0 is empty and Cell.value + 1 is filled.
+    Moving, rotating with kicks, gravity, locking, clearing lines, scoring and levels follow {TetrisEngine}.
+    DAS and ARE are not simulated since they only pace held keys, here every step is one press
+    """
+
+    def __init__(self, count: int, board_size: Point = Point(10, 20), queue_size: int = 7, seed: int = None):
+        """
+        :count: how many games are played at once
+        :board_size: Optional. defaults to 10x20. the size of each board in cells
+        :queue_size: Optional. defaults to 7. how many upcoming peices each game keeps in {self.queue}
+        :seed: Optional. defaults to None. the seed of every game's grab bag
+        """
+        self.count = count
+        self.board_size = board_size
+        self.queue_size = queue_size
+        self.reset(seed)
+
+    def reset(self, seed: int = None):
+        """Start every game over"""
+        self.random = np.random.default_rng(seed)
+        self.boards = np.zeros((self.count, self.board_size.y, self.board_size.x), dtype = np.uint8)
+        self.score = np.zeros(self.count, dtype = np.int64)
+        self.lines_cleared = np.zeros(self.count, dtype = np.int64)
+        self.lines_cleared_since_level_up = np.zeros(self.count, dtype = np.int32)
+        self.level = np.zeros(self.count, dtype = np.int32)
+        self.game_over = np.zeros(self.count, dtype = bool)
+        self.auto_drop = np.zeros(self.count, dtype = np.int32) # frames until gravity moves the peice
+        self.hold = np.full(self.count, -1, dtype = np.int8)
+        self.hold_rotation = np.zeros(self.count, dtype = np.int8) # a held peice keeps its rotation like in TetrisEngine
+        self.can_swap_hold = np.ones(self.count, dtype = bool)
+        self.peice = np.zeros(self.count, dtype = np.int8)
+        self.rotation = np.zeros(self.count, dtype = np.int8)
+        self.x = np.zeros(self.count, dtype = np.int16)
+        self.y = np.zeros(self.count, dtype = np.int16)
+        self.lines = np.zeros(self.count, dtype = np.int8) # lines cleared during the last step
+        self.bags = self.new_bags(self.count)
+        self.bag_index = np.zeros(self.count, dtype = np.int8)
+        everyone = np.arange(self.count)
+        self.queue = np.stack([self.get_from_grab_bag(everyone) for _ in range(self.queue_size)], axis = 1)
+        self.spawn(everyone, self.get_from_queue(everyone))
+
+    def new_bags(self, count: int) -> np.ndarray:
+        """Shuffle {count} bags of one of each tetrimino"""
+        return np.argsort(self.random.random((count, len(TETRIMINOS))), axis = 1).astype(np.int8)
+
+    def get_from_grab_bag(self, index: np.ndarray) -> np.ndarray:
+        """Take the next tetrimino from each of the bags at {index}, refilling the ones that run out"""
+        empty = index[self.bag_index[index] == len(TETRIMINOS)]
+        if len(empty):
+            self.bags[empty] = self.new_bags(len(empty))
+            self.bag_index[empty] = 0
+        peices = self.bags[index, self.bag_index[index]]
+        self.bag_index[index] += 1
+        return peices
+
+    def get_from_queue(self, index: np.ndarray) -> np.ndarray:
+        peices = self.queue[index, 0]
+        self.queue[index, :-1] = self.queue[index, 1:]
+        self.queue[index, -1] = self.get_from_grab_bag(index)
+        return peices
+
+    def spawn(self, index: np.ndarray, peices: np.ndarray, rotations: np.ndarray = 0):
+        """Put {peices} at the top of the boards at {index} and end the games they don't fit in"""
+        self.peice[index] = peices
+        self.rotation[index] = rotations
+        self.x[index] = self.board_size.x // 2 - WIDTHS[peices] // 2
+        self.y[index] = 0
+        self.game_over[index] |= ~self.check_valid_position(index, self.peice[index], self.rotation[index], self.x[index], self.y[index])
+
+    def check_valid_position(self, index: np.ndarray, peices: np.ndarray, rotations: np.ndarray, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """
+        Check if each peice fits on its board
+        every argument is an array with one value for each of the boards at {index}
+        :returns: an array of bool
+        """
+        cells = CELLS[peices, rotations]
+        xs = cells[:, :, 0] + x[:, None]
+        ys = cells[:, :, 1] + y[:, None]
+        inside = (xs >= 0) & (xs < self.board_size.x) & (ys >= 0) & (ys < self.board_size.y)
+        filled = self.boards[index[:, None], np.clip(ys, 0, self.board_size.y - 1), np.clip(xs, 0, self.board_size.x - 1)] != 0
+        return (inside & ~filled).all(axis = 1)
+
+    def move(self, index: np.ndarray, dx: int, dy: int) -> np.ndarray:
+        """
+        Move the peices on the boards at {index} if they fit
+        :returns: an array of bool of which ones moved
+        """
+        x = self.x[index] + dx
+        y = self.y[index] + dy
+        valid = self.check_valid_position(index, self.peice[index], self.rotation[index], x, y)
+        moved = index[valid]
+        self.x[moved] = x[valid]
+        self.y[moved] = y[valid]
+        return valid
+
+    def rotate(self, index: np.ndarray, direction: int):
+        """
+        Rotate the peices on the boards at {index} trying each kick in order
+        :direction: 0 for right, 1 for left
+        """
+        peices = self.peice[index]
+        before = self.rotation[index]
+        after = (before + (1 if direction == 0 else -1)) % 4
+        kicks = KICKS[peices, before, direction]
+        waiting = np.ones(len(index), dtype = bool)
+        for kick in range(kicks.shape[1]):
+            x = self.x[index] + kicks[:, kick, 0]
+            y = self.y[index] + kicks[:, kick, 1]
+            rotated = waiting & self.check_valid_position(index, peices, after, x, y)
+            done = index[rotated]
+            self.x[done] = x[rotated]
+            self.y[done] = y[rotated]
+            self.rotation[done] = after[rotated]
+            waiting &= ~rotated
+            if not waiting.any():
+                break
+
+    def fast_drop(self, index: np.ndarray):
+        """Drop the peices on the boards at {index} as far as they go"""
+        falling = index
+        while len(falling):
+            falling = falling[self.move(falling, 0, 1)]
+
+    def swap_hold(self, index: np.ndarray):
+        """Swap the peices on the boards at {index} with their holds"""
+        index = index[self.can_swap_hold[index]]
+        empty = index[self.hold[index] == -1]
+        self.hold[empty] = self.get_from_queue(empty)
+        self.hold_rotation[empty] = 0
+        peices = self.hold[index].copy()
+        rotations = self.hold_rotation[index].copy()
+        self.hold[index] = self.peice[index]
+        self.hold_rotation[index] = self.rotation[index]
+        self.can_swap_hold[index] = False
+        self.spawn(index, peices, rotations)
+
+    def lock_and_get_new_peice(self, index: np.ndarray):
+        """Lock the peices on the boards at {index}, clear lines, score them and spawn the next peices"""
+        if not len(index):
+            return
+        cells = CELLS[self.peice[index], self.rotation[index]]
+        self.boards[index[:, None], cells[:, :, 1] + self.y[index, None], cells[:, :, 0] + self.x[index, None]] = COLORS[self.peice[index], None]
+        self.clear_lines(index)
+        lines = self.lines[index]
+        self.score[index] += LINE_SCORES[lines] * (self.level[index] + 1)
+        self.lines_cleared[index] += lines
+        self.lines_cleared_since_level_up[index] += lines
+        level_up = index[(self.level[index] != TetrisEngine.MAX_LEVEL) & (self.lines_cleared_since_level_up[index] >= LEVEL_LINES[self.level[index]])]
+        self.level[level_up] += 1
+        self.lines_cleared_since_level_up[level_up] = 0
+        self.can_swap_hold[index] = True
+        self.spawn(index, self.get_from_queue(index))
+
+    def clear_lines(self, index: np.ndarray):
+        """Remove the full rows of the boards at {index}, moving the rest down in order. the counts go in {self.lines}"""
+        boards = self.boards[index]
+        full = (boards != 0).all(axis = 2)
+        lines = full.sum(axis = 1)
+        self.lines[index] = lines
+        cleared = lines != 0
+        if not cleared.any():
+            return
+        boards = boards[cleared]
+        full = full[cleared]
+        # a stable sort puts the full rows on top in the order they were in, then every other row in order
+        order = np.argsort(~full, axis = 1, kind = 'stable')
+        boards = np.take_along_axis(boards, order[:, :, None], axis = 1)
+        boards[np.arange(self.board_size.y)[None, :] < lines[cleared, None]] = 0
+        self.boards[index[cleared]] = boards
+
+    def step(self, actions: np.ndarray) -> np.ndarray:
+        """
+        Advance every game that isn't over by one frame
+        :actions: a BatchAction for each board
+        :returns: the number of lines each board cleared during this step
+        """
+        actions = np.asarray(actions)
+        self.lines[:] = 0
+        playing = ~self.game_over
+        for action, run in (
+                (BatchAction.MOVE_LEFT, lambda index: self.move(index, -1, 0)),
+                (BatchAction.MOVE_RIGHT, lambda index: self.move(index, 1, 0)),
+                (BatchAction.ROTATE_LEFT, lambda index: self.rotate(index, 1)),
+                (BatchAction.ROTATE_RIGHT, lambda index: self.rotate(index, 0)),
+                (BatchAction.HOLD, self.swap_hold),
+                ):
+            index = np.flatnonzero(playing & (actions == action))
+            if len(index):
+                run(index)
+        soft_drop = np.flatnonzero(playing & (actions == BatchAction.SOFT_DROP))
+        self.move(soft_drop, 0, 1)
+        self.auto_drop[soft_drop] = LEVEL_FRAMES[self.level[soft_drop]]
+        fast_drop = np.flatnonzero(playing & (actions == BatchAction.FAST_DROP))
+        self.fast_drop(fast_drop)
+        self.lock_and_get_new_peice(fast_drop)
+        # gravity, the same as the auto_drop TrueEvery in TetrisEngine. it keeps counting after a fast drop but the new peice doesn't fall
+        ticking = np.flatnonzero(playing)
+        self.auto_drop[ticking] -= 1
+        falling = ticking[self.auto_drop[ticking] <= 0]
+        self.auto_drop[falling] = LEVEL_FRAMES[self.level[falling]]
+        falling = falling[(actions[falling] != BatchAction.FAST_DROP) & ~self.game_over[falling]]
+        landed = falling[~self.move(falling, 0, 1)]
+        self.lock_and_get_new_peice(landed)
+        return self.lines
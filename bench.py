@@ -0,0 +1,295 @@
+"""
+Benchmarks of the engine's hot paths and of drawing a whole frame
+results are compared against a baseline so slowdowns are caught before a release, e.g.:
+    python bench.py                 compare against bench_baseline.json
+    python bench.py --save          make the current results the baseline
+    python bench.py -k board        only run the benchmarks with board in their name
+"""
+
+import os, sys, json, time, argparse, statistics, subprocess
+from functools import partial
+from itertools import cycle
+
+# the frame benchmarks draw to a window that is never shown
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+import numpy as np
+from pygame_tools import Point
+from engine import TetrisEngine, Action, Snapshot
+from board import Cell, Shape, Board, BitBoard
+from batch import BatchEngine, BatchAction
+
+
+def measure(operation, make_args = None, min_time: float = 0.2, repeat: int = 5) -> dict:
+    """
+    Time how many times {operation} can run per second
+    the loop is grown until it takes {min_time} seconds and the best of {repeat} loops is kept
+    :operation: a function that takes one argument
+    :make_args: Optional. defaults to None. makes the argument of each call ahead of time so setting it up isn't timed
+    :returns: {'ops': operations per second}
+    """
+    def time_loop(number: int) -> float:
+        args = [make_args() for _ in range(number)] if make_args else [None] * number
+        start = time.perf_counter()
+        for arg in args:
+            operation(arg)
+        return time.perf_counter() - start
+
+    number = 1
+    while (seconds := time_loop(number)) < min_time:
+        number *= 10 if seconds < min_time / 10 else 2
+    best = min([seconds] + [time_loop(number) for _ in range(repeat - 1)])
+    return {'ops': number / best}
+
+def measure_frames(draw, advance, frames: int = 600) -> dict:
+    """
+    Time every call to {draw} with {advance} called untimed before each one
+    :returns: the percentiles of the frame times in milliseconds and the frames per second they add up to
+    """
+    times = []
+    for _ in range(frames):
+        advance()
+        start = time.perf_counter()
+        draw()
+        times.append((time.perf_counter() - start) * 1000)
+    percentiles = statistics.quantiles(times, n = 100)
+    return {
+            'p50_ms': percentiles[49],
+            'p95_ms': percentiles[94],
+            'p99_ms': percentiles[98],
+            'fps': 1000 / statistics.mean(times),
+            }
+
+def script_game(engine: TetrisEngine):
+    """Drop some peices into a ragged stack, the same one every time"""
+    engine.reset(0)
+    for i in range(14):
+        for _ in range(i * 3 % 5):
+            engine.player.move_left(engine.board) if i % 2 else engine.player.move_right(engine.board)
+        for _ in range(i % 4):
+            engine.player.rotate_right(engine.board)
+        engine.player.fast_drop(engine.board)
+        engine.lock_and_get_new_peice()
+    engine.ARE_locked = False
+    engine.events = []
+
+def get_scripted_engine(board_type: type) -> TetrisEngine:
+    engine = TetrisEngine(board_type = board_type)
+    script_game(engine)
+    return engine
+
+def get_scripted_actions():
+    """Inputs that keep a scripted game moving forever"""
+    pattern = [Action.MOVE_LEFT, Action.NONE, Action.ROTATE_RIGHT, Action.NONE, Action.MOVE_RIGHT, Action.NONE] * 4 + [Action.SOFT_DROP] * 6
+    while True:
+        yield from pattern
+
+SQUARE = Shape.from_matrix([[Cell.I]])
+
+def get_full_board(board_type: type, lines: int = 4) -> Board:
+    """The scripted stack with its bottom {lines} rows filled in"""
+    board = get_scripted_engine(board_type).board
+    for y in range(board.size.y - lines, board.size.y):
+        for x in range(board.size.x):
+            if not board.is_filled(x, y):
+                board.lock(SQUARE, Point(x, y))
+    return board
+
+def bench_check_valid_position(board_type: type) -> dict:
+    engine = get_scripted_engine(board_type)
+    board, shape, pos = engine.board, engine.player.shape, engine.player.pos
+    return measure(lambda _: board.check_valid_position(shape, pos))
+
+def bench_get_fast_drop_pos(board_type: type) -> dict:
+    engine = get_scripted_engine(board_type)
+    board, player = engine.board, engine.player
+    return measure(lambda _: player.get_fast_drop_pos(board))
+
+def bench_rotate(board_type: type, direction: str) -> dict:
+    engine = get_scripted_engine(board_type)
+    board, rotate = engine.board, getattr(engine.player, direction)
+    return measure(lambda _: rotate(board))
+
+def bench_clear_lines(board_type: type) -> dict:
+    board = get_full_board(board_type)
+    return measure(lambda board: board.clear_lines(), board.copy)
+
+def bench_snapshot(board_type: type) -> dict:
+    """Taking a snapshot after every step, so the board changes between some of them"""
+    engine = get_scripted_engine(board_type)
+    actions = get_scripted_actions()
+    def step_and_snapshot(_):
+        engine.step(next(actions))
+        if engine.game_over:
+            script_game(engine)
+        engine.snapshot()
+    return measure(step_and_snapshot)
+
+def bench_restore(board_type: type) -> dict:
+    engine = get_scripted_engine(board_type)
+    snapshot = engine.snapshot()
+    return measure(lambda _: engine.restore(snapshot))
+
+def bench_copy(board_type: type) -> dict:
+    engine = get_scripted_engine(board_type)
+    return measure(lambda _: engine.copy())
+
+def bench_snapshot_bytes() -> dict:
+    """Packing a snapshot to bytes and back"""
+    snapshot = get_scripted_engine(Board).snapshot()
+    return measure(lambda _: Snapshot.from_bytes(snapshot.to_bytes()))
+
+def bench_get_from_grab_bag() -> dict:
+    engine = TetrisEngine(seed = 0)
+    return measure(lambda _: engine.get_from_grab_bag())
+
+def bench_batch_step(count: int = 16384) -> dict:
+    """
+    Stepping {count} boards at once with random presses, as board steps per second
+    most of the games top out after a few hundred steps, so they are all started again once half of them are over
+    """
+    batch = BatchEngine(count, seed = 0)
+    random = np.random.default_rng(0)
+    actions = cycle(random.choice(len(BatchAction), size = (64, count), p = [0.3, 0.15, 0.15, 0.1, 0.1, 0.12, 0.03, 0.05]))
+    def step(_):
+        batch.step(next(actions))
+        if batch.game_over.sum() > count // 2:
+            batch.reset(0)
+    return {'board_steps': measure(step)['ops'] * count}
+
+def get_game(dirty_rects: bool = False) -> 'PyTetrisGame':
+    """Open the game on the dummy display with the scripted stack"""
+    from pytetris import MainMenu
+    pygame.init()
+    size = Point(600, 700)
+    menu = MainMenu(pygame.display.set_mode(size), size, dirty_rects)
+    script_game(menu.game.engine)
+    return menu.game
+
+def bench_get_peice_surface() -> dict:
+    """Getting a peice surface that is already in the sprite cache"""
+    game = get_game()
+    player = game.engine.player
+    return measure(lambda _: game.get_peice_surface(player, game.cells, game.cell_size))
+
+def bench_build_peice_surface() -> dict:
+    """Building a peice surface, what every sprite cache miss costs"""
+    game = get_game()
+    player = game.engine.player
+    return measure(lambda _: game.sprites.build(player, game.cells, game.cell_size))
+
+def bench_draw(dirty_rects: bool) -> dict:
+    """Draw whole frames while the scripted game is played"""
+    game = get_game(dirty_rects)
+    actions = get_scripted_actions()
+    def advance():
+        game.handle_events(game.engine.step(next(actions)))
+        if game.engine.game_over:
+            script_game(game.engine)
+            game.full_redraw = True
+    game.draw()
+    return measure_frames(game.draw, advance)
+
+STARTUP_SCRIPT = """
+import time
+start = time.perf_counter()
+import pygame
+import numpy as np
+from pygame_tools import Point
+from pytetris import MainMenu
+pygame.init()
+size = Point(600, 700)
+menu = MainMenu(pygame.display.set_mode(size), size)
+menu.update()
+pygame.display.update()
+print((time.perf_counter() - start) * 1000)
+"""
+
+def bench_startup(runs: int = 9) -> dict:
+    """Time a cold start from importing the game to the first frame of the main menu, each in a new python"""
+    # the banner pygame prints on import would end up in the output, so it is hidden and only the last line is read
+    env = {**os.environ, 'PYGAME_HIDE_SUPPORT_PROMPT': '1'}
+    times = sorted(float(subprocess.run([sys.executable, '-c', STARTUP_SCRIPT], capture_output = True, text = True, check = True, env = env).stdout.split()[-1])
+            for _ in range(runs))
+    return {'p50_ms': times[len(times) // 2], 'max_ms': times[-1]}
+
+BENCHMARKS = {} # name: function() -> {measurement: value}
+for board_type in (Board, BitBoard):
+    BENCHMARKS.update({
+            f'check_valid_position[{board_type.__name__}]': partial(bench_check_valid_position, board_type),
+            f'get_fast_drop_pos[{board_type.__name__}]': partial(bench_get_fast_drop_pos, board_type),
+            f'rotate_right[{board_type.__name__}]': partial(bench_rotate, board_type, 'rotate_right'),
+            f'rotate_left[{board_type.__name__}]': partial(bench_rotate, board_type, 'rotate_left'),
+            f'clear_lines[{board_type.__name__}]': partial(bench_clear_lines, board_type),
+            f'snapshot[{board_type.__name__}]': partial(bench_snapshot, board_type),
+            f'restore[{board_type.__name__}]': partial(bench_restore, board_type),
+            f'copy[{board_type.__name__}]': partial(bench_copy, board_type),
+            })
+BENCHMARKS.update({
+        'snapshot_bytes': bench_snapshot_bytes,
+        'get_from_grab_bag': bench_get_from_grab_bag,
+        'batch_step': bench_batch_step,
+        'get_peice_surface': bench_get_peice_surface,
+        'build_peice_surface': bench_build_peice_surface,
+        'draw': partial(bench_draw, False),
+        'draw[dirty_rects]': partial(bench_draw, True),
+        'startup': bench_startup,
+        })
+
+# measurements where a bigger number is better. for the rest smaller is better
+HIGHER_IS_BETTER = {'ops', 'fps', 'board_steps'}
+
+def compare(results: dict, baseline: dict, tolerance: float) -> [str]:
+    """
+    Find every measurement that got worse than {baseline} by more than {tolerance}
+    :returns: a description of each regression
+    """
+    regressions = []
+    for name, measurements in results.items():
+        for measurement, value in measurements.items():
+            old = baseline.get(name, {}).get(measurement)
+            if not old:
+                continue
+            change = (value - old) / old
+            if measurement not in HIGHER_IS_BETTER:
+                change = -change
+            if change < -tolerance:
+                regressions.append(f'{name} {measurement}: {old:.4g} -> {value:.4g} ({change:+.0%})')
+    return regressions
+
+def format_result(name: str, result: dict, baseline: dict) -> str:
+    """A line of the results table"""
+    parts = []
+    for measurement, value in result.items():
+        old = baseline.get(name, {}).get(measurement)
+        parts.append(f'{measurement} {value:12.4g}' + (f' ({(value - old) / old:+6.1%})' if old else ' ' * 10))
+    return f'{name:>32}: ' + '  '.join(parts)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-k', dest = 'filter', default = '', help = 'only run benchmarks with this in their name')
+    parser.add_argument('--baseline', default = 'bench_baseline.json', help = 'the results to compare against')
+    parser.add_argument('--save', action = 'store_true', help = 'write the results to the baseline instead of comparing')
+    parser.add_argument('--tolerance', type = float, default = 0.15, help = 'how much worse than the baseline a result can be. defaults to 0.15')
+    args = parser.parse_args()
+    try:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    except FileNotFoundError:
+        baseline = None
+    results = {}
+    for name, function in BENCHMARKS.items():
+        if args.filter.lower() in name.lower():
+            results[name] = function()
+            print(format_result(name, results[name], baseline or {}))
+    if args.save:
+        with open(args.baseline, 'w') as file:
+            json.dump({**(baseline or {}), **results}, file, indent = 4, sort_keys = True)
+        print(f'saved to {args.baseline}')
+    elif baseline is None:
+        print(f'there is no baseline at {args.baseline} to compare against. run make bench-baseline to save one')
+    elif regressions := compare(results, baseline, args.tolerance):
+        print(f'{len(regressions)} regressions:', *regressions, sep = '\n    ')
+        sys.exit(1)
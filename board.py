@@ -0,0 +1,345 @@
+"""
+The boards a tetris game can be played on
+every board has the same interface so the engine can use whichever one is faster for the job
+"""
+
+from enum import Enum
+from copy import copy
+from collections import namedtuple
+from pygame_tools import Point
+
+
+def new_matrix(width: int, height: int = None, value = None) -> [[]]:
+    """Create a 2d array with the passed width and height"""
+    return [[value for j in range(width)] for i in range(height if height else width)]
+
+def get_kept_slices(removed: [int], length: int) -> [slice]:
+    """
+    Get the runs of indicies that are left when {removed} are taken out of range({length})
+    :removed: sorted indicies
+    """
+    kept = []
+    start = 0
+    for i in removed:
+        if i > start:
+            kept.append(slice(start, i))
+        start = i + 1
+    if start < length:
+        kept.append(slice(start, length))
+    return kept
+
+class Cell(Enum):
+    """Represents a square on the grid"""
+    EMPTY = None
+    Z = 0
+    L = 1
+    O = 2
+    S = 3
+    I = 4
+    J = 5
+    T = 6
+    GARBAGE = 7
+
+# a square stored as a byte is its Cell.value + 1, or 0 when it is empty
+CELL_BYTES = {cell: 0 if cell == Cell.EMPTY else cell.value + 1 for cell in Cell}
+BYTE_CELLS = {byte: cell for cell, byte in CELL_BYTES.items()}
+
+# {Board.to_bytes} turned into a string of 0s and 1s for whether each square is filled
+FILLED_DIGITS = bytes.maketrans(bytes(range(256)), b'0' + b'1' * 255)
+
+def get_heights(size: Point, data: bytes) -> [int]:
+    """Get {Board.heights} straight from the squares of {Board.to_bytes}"""
+    columns = (data[x::size.x] for x in range(size.x))
+    return [size.y - len(column.lstrip(b'\0')) for column in columns]
+
+class Shape(namedtuple('Shape', ['matrix', 'cells', 'masks', 'left', 'right', 'bottoms'])):
+    """
+    A peice matrix along with the lookups the boards use to test it
+    :matrix: the peice represented in a 2d array of type Cell
+    :cells: (x, y, Cell) of every filled square in the matrix
+    :masks: (y, bitmask) of every row in the matrix with a filled square. bit x is set when column x is filled
+    :left: the lowest column of the matrix with a filled square
+    :right: the highest column of the matrix with a filled square
+    :bottoms: (x, y) of the lowest filled square in every column of the matrix with a filled square
+    """
+
+    @classmethod
+    def from_matrix(cls, matrix: [[Cell]]) -> 'Shape':
+        cells = tuple((x, y, cell) for y, row in enumerate(matrix) for x, cell in enumerate(row) if cell != Cell.EMPTY)
+        masks = {}
+        bottoms = {}
+        for x, y, _ in cells:
+            masks[y] = masks.get(y, 0) | 1 << x
+            bottoms[x] = max(bottoms.get(x, y), y)
+        return cls(matrix, cells, tuple(masks.items()), min(bottoms), max(bottoms), tuple(bottoms.items()))
+
+class Board:
+    """
+    The locked squares of a game stored as a list of rows of Cell
+    {self.version} goes up every time the squares change
+    {self.heights} is the highest filled row of each column, or the height of the board if the column is empty
+    {self.fills} is the number of filled squares in each row, so a row is full when it reaches the width of the board
+    {self.touched_rows} are the rows that have been locked into since lines were last cleared, the only rows that can be full
+    """
+
+    def __init__(self, size: Point):
+        self.size = size
+        self.version = 0
+        self.rows = new_matrix(self.size.x, self.size.y, Cell.EMPTY)
+        self.fills = [0] * self.size.y
+        self.touched_rows = set()
+        self.heights = [self.size.y] * self.size.x
+
+    def __getitem__(self, i: int) -> [Cell]:
+        return self.rows[i]
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self) -> int:
+        return self.size.y
+
+    def check_valid_position(self, shape: Shape, pos: Point) -> bool:
+        """Check if {shape} fits on the board with its top left corner at {pos}"""
+        for x, y, _ in shape.cells:
+            x += pos.x
+            y += pos.y
+            if not (0 <= x < self.size.x and 0 <= y < self.size.y) or self.rows[y][x] != Cell.EMPTY:
+                return False
+        return True
+
+    def lock(self, shape: Shape, pos: Point):
+        """Write the squares of {shape} onto the board"""
+        for x, y, cell in shape.cells:
+            y += pos.y
+            self.rows[y][x + pos.x] = cell
+            self.fills[y] += 1
+            self.touched_rows.add(y)
+        self.version += 1
+        self.update_heights(shape, pos)
+
+    def is_row_full(self, y: int) -> bool:
+        return self.fills[y] == self.size.x
+
+    def clear_lines(self) -> [int]:
+        """
+        Remove every complete row and move the rows above it down
+        only {self.touched_rows} are checked, since nothing else can have filled up
+        :returns: the indicies of the cleared rows from top to bottom
+        """
+        cleared = sorted(y for y in self.touched_rows if self.is_row_full(y))
+        self.touched_rows.clear()
+        if cleared:
+            self.remove_rows(cleared)
+            self.version += 1
+            self.find_heights()
+        return cleared
+
+    def remove_rows(self, cleared: [int]):
+        """
+        Take out the rows {cleared} in one pass, keeping the rest in order with new empty rows on top
+        :cleared: the indicies of the rows from top to bottom
+        """
+        kept = get_kept_slices(cleared, self.size.y)
+        self.rows = new_matrix(self.size.x, len(cleared), Cell.EMPTY) + [row for rows in kept for row in self.rows[rows]]
+        self.fills = [0] * len(cleared) + [fill for rows in kept for fill in self.fills[rows]]
+
+    def add_garbage(self, count: int, hole: int) -> bool:
+        """
+        Push {count} rows up from the bottom that are full except for the column {hole}
+        :returns: True if any filled squares were pushed off the top of the board
+        """
+        count = min(count, self.size.y)
+        topped_out = any(self.fills[:count])
+        row = [Cell.GARBAGE] * self.size.x
+        row[hole] = Cell.EMPTY
+        self.rows = self.rows[count:] + [row[:] for _ in range(count)]
+        self.fills = self.fills[count:] + [self.size.x - 1] * count
+        self.raise_touched_rows(count)
+        self.version += 1
+        self.find_heights()
+        return topped_out
+
+    def raise_touched_rows(self, count: int):
+        """Move {self.touched_rows} up with the rows they belong to"""
+        self.touched_rows = {y - count for y in self.touched_rows if y >= count}
+
+    def copy(self) -> 'Board':
+        """Get an independent copy of the board"""
+        board = copy(self)
+        board.rows = [row[:] for row in self.rows]
+        board.fills = self.fills[:]
+        board.touched_rows = set(self.touched_rows)
+        board.heights = self.heights[:]
+        return board
+
+    def to_bytes(self) -> bytes:
+        """Every square row by row as a byte from {CELL_BYTES}. it comes out the same for every kind of board"""
+        return bytes(CELL_BYTES[cell] for row in self.rows for cell in row)
+
+    @classmethod
+    def from_bytes(cls, size: Point, data: bytes) -> 'Board':
+        """Make a board from the squares of {self.to_bytes}"""
+        board = cls(size)
+        board.rows = [[BYTE_CELLS[byte] for byte in data[i:i + size.x]] for i in range(0, size.x * size.y, size.x)]
+        board.fills = [size.x - row.count(Cell.EMPTY) for row in board.rows]
+        board.heights = get_heights(size, data)
+        return board
+
+    def is_filled(self, x: int, y: int) -> bool:
+        return self.rows[y][x] != Cell.EMPTY
+
+    def update_heights(self, shape: Shape, pos: Point):
+        """Raise {self.heights} to cover {shape} after it was locked at {pos}"""
+        for x, y, _ in shape.cells:
+            x += pos.x
+            y += pos.y
+            if y < self.heights[x]:
+                self.heights[x] = y
+
+    def find_heights(self):
+        """Work out {self.heights} from scratch by looking down each column"""
+        self.heights = [self.size.y] * self.size.x
+        unknown = set(range(self.size.x))
+        for y in range(self.size.y):
+            for x in [x for x in unknown if self.is_filled(x, y)]:
+                self.heights[x] = y
+                unknown.remove(x)
+            if not unknown:
+                break
+
+    def get_landing_y(self, shape: Shape, pos: Point) -> int:
+        """
+        Find how far down {shape} can fall from {pos}
+        when every column of the shape is above the stack this comes straight from {self.heights},
+        otherwise the shape is tucked under something and it is moved down one row at a time
+        :returns: the lowest y {shape} fits at
+        """
+        drop = self.size.y
+        for x, bottom in shape.bottoms:
+            x += pos.x
+            bottom += pos.y
+            if not 0 <= x < self.size.x or self.heights[x] <= bottom:
+                return self.find_landing_y(shape, pos)
+            drop = min(drop, self.heights[x] - bottom - 1)
+        return pos.y + drop
+
+    def find_landing_y(self, shape: Shape, pos: Point) -> int:
+        """The slow version of {self.get_landing_y} that checks every row on the way down"""
+        y = pos.y
+        while self.check_valid_position(shape, Point(pos.x, y)):
+            y += 1
+        return y - 1
+
+class BitBoard(Board):
+    """
+    The locked squares of a game stored as one int per row
+    bit x of a row is set when column x is filled, so a peice can be tested against a row with a single and.
+    The Cell of each square is kept in {self.colors} for drawing
+    {self.version} goes up every time the squares change
+    a row is its own fill counter so it is full when it equals {self.full_row}
+    """
+
+    def __init__(self, size: Point):
+        self.size = size
+        self.version = 0
+        self.full_row = (1 << self.size.x) - 1
+        self.rows = [0] * self.size.y
+        self.colors = bytearray(self.size.x * self.size.y) # Cell.value + 1, 0 is empty
+        self.touched_rows = set()
+        self.heights = [self.size.y] * self.size.x
+
+    def __getitem__(self, i: int) -> [Cell]:
+        start = (i % self.size.y) * self.size.x
+        return [Cell(color - 1) if color else Cell.EMPTY for color in self.colors[start:start + self.size.x]]
+
+    def __iter__(self):
+        return (self[i] for i in range(self.size.y))
+
+    def check_valid_position(self, shape: Shape, pos: Point) -> bool:
+        """Check if {shape} fits on the board with its top left corner at {pos}"""
+        if pos.x + shape.left < 0 or pos.x + shape.right >= self.size.x:
+            return False
+        for y, mask in shape.masks:
+            y += pos.y
+            if not 0 <= y < self.size.y or self.rows[y] & (mask << pos.x if pos.x >= 0 else mask >> -pos.x):
+                return False
+        return True
+
+    def lock(self, shape: Shape, pos: Point):
+        """Write the squares of {shape} onto the board"""
+        for y, mask in shape.masks:
+            self.rows[y + pos.y] |= mask << pos.x if pos.x >= 0 else mask >> -pos.x
+            self.touched_rows.add(y + pos.y)
+        for x, y, cell in shape.cells:
+            self.colors[(y + pos.y) * self.size.x + x + pos.x] = cell.value + 1
+        self.version += 1
+        self.update_heights(shape, pos)
+
+    def is_row_full(self, y: int) -> bool:
+        return self.rows[y] == self.full_row
+
+    def remove_rows(self, cleared: [int]):
+        """
+        Take out the rows {cleared} in one pass, keeping the rest in order with new empty rows on top
+        :cleared: the indicies of the rows from top to bottom
+        """
+        width = self.size.x
+        kept = get_kept_slices(cleared, self.size.y)
+        self.rows = [0] * len(cleared) + [row for rows in kept for row in self.rows[rows]]
+        self.colors = bytearray(width * len(cleared)) + b''.join(self.colors[rows.start * width:rows.stop * width] for rows in kept)
+
+    def add_garbage(self, count: int, hole: int) -> bool:
+        """
+        Push {count} rows up from the bottom that are full except for the column {hole}
+        :returns: True if any filled squares were pushed off the top of the board
+        """
+        count = min(count, self.size.y)
+        width = self.size.x
+        topped_out = any(self.rows[:count])
+        row = bytearray([Cell.GARBAGE.value + 1]) * width
+        row[hole] = 0
+        self.rows = self.rows[count:] + [self.full_row & ~(1 << hole)] * count
+        self.colors = self.colors[count * width:] + row * count
+        self.raise_touched_rows(count)
+        self.version += 1
+        self.find_heights()
+        return topped_out
+
+    def copy(self) -> 'BitBoard':
+        """Get an independent copy of the board"""
+        board = copy(self)
+        board.rows = self.rows[:]
+        board.colors = self.colors[:]
+        board.touched_rows = set(self.touched_rows)
+        board.heights = self.heights[:]
+        return board
+
+    def to_bytes(self) -> bytes:
+        return bytes(self.colors)
+
+    @classmethod
+    def from_bytes(cls, size: Point, data: bytes) -> 'BitBoard':
+        board = cls(size)
+        board.colors[:] = data
+        digits = data.translate(FILLED_DIGITS)
+        board.rows = [int(digits[i:i + size.x][::-1], 2) for i in range(0, size.x * size.y, size.x)]
+        board.heights = get_heights(size, data)
+        return board
+
+    def is_filled(self, x: int, y: int) -> bool:
+        return self.rows[y] >> x & 1
+
+    def find_heights(self):
+        """Work out {self.heights} from scratch by looking down each column"""
+        self.heights = [self.size.y] * self.size.x
+        seen = 0
+        for y, row in enumerate(self.rows):
+            new = row & ~seen
+            while new:
+                x = (new & -new).bit_length() - 1
+                self.heights[x] = y
+                new &= new - 1
+            seen |= row
+            if seen == self.full_row:
+                break
@@ -0,0 +1,317 @@
+"""
+Stream a game to any number of spectators as it is played
+the game publishes what changed each frame as a few bytes of diffs, which are encoded once and written to every viewer.
+every {Broadcaster.KEYFRAME_INTERVAL} frames the whole game is sent as a keyframe so viewers that join late or fall
+behind can start again from it. a diff is one byte of its {Diff} type followed by its fixed size payload from
+{FORMATS}, except keyframes and the queue that are followed by the board and the queue's cells, e.g.:
+    python pytetris.py --broadcast 7778           play with spectators
+    python pytetris.py --watch localhost:7778     watch them
+    python broadcast.py localhost:7778            watch headless, printing the score as it changes
+"""
+
+import time, asyncio, argparse, threading, queue
+from enum import IntEnum
+from struct import Struct
+from pygame_tools import Point
+from engine import TetrisEngine, Peice, Event, TETRIMINO_OF_CELL_VALUE
+from board import Cell, Shape
+from versus import set_no_delay
+
+
+# the size of each diff is with its type byte, e.g. a PLAYER is 1 + 6 bytes of <BBhh
+class Diff(IntEnum):
+    KEYFRAME = 0 # the whole game: board size, player, hold, score, level, lines, game over, then a byte for every cell of the board. 22 bytes + the cells
+    PLAYER = 1 # the falling peice moved, rotated or spawned: cell, rotation, x, y. 7 bytes
+    LOCK = 2 # a peice locked and the full lines were cleared: cell, rotation, x, y. 7 bytes
+    GARBAGE = 3 # garbage was pushed up the board: rows, hole. 5 bytes
+    HOLD = 4 # the peice in hold: cell. 2 bytes
+    QUEUE = 5 # the number of peices in the queue, then their cells. 2 bytes + the cells
+    STATS = 6 # score, level, lines. 10 bytes
+    GAME_OVER = 7 # 1 byte
+
+FORMATS = {
+        Diff.KEYFRAME: Struct('<HHBBhhBIBIB'),
+        Diff.PLAYER: Struct('<BBhh'),
+        Diff.LOCK: Struct('<BBhh'),
+        Diff.GARBAGE: Struct('<HH'),
+        Diff.HOLD: Struct('<B'),
+        Diff.QUEUE: Struct('<B'),
+        Diff.STATS: Struct('<IBI'),
+        Diff.GAME_OVER: Struct('<'),
+        }
+
+NO_CELL = 0xff # the cell sent for an empty hold
+
+def encode(diff: Diff, *values: int, extra: bytes = b'') -> bytes:
+    return bytes((diff,)) + FORMATS[diff].pack(*values) + extra
+
+async def read_diff(reader: asyncio.StreamReader) -> (Diff, (int,), bytes):
+    """
+    Wait for the next whole diff
+    :returns: its type, its values and the cells sent after them
+    :raises asyncio.IncompleteReadError: when the connection closes
+    """
+    diff = Diff((await reader.readexactly(1))[0])
+    values = FORMATS[diff].unpack(await reader.readexactly(FORMATS[diff].size))
+    if diff == Diff.KEYFRAME:
+        extra = await reader.readexactly(values[0] * values[1])
+    elif diff == Diff.QUEUE:
+        extra = await reader.readexactly(values[0])
+    else:
+        extra = b''
+    return diff, values, extra
+
+def encode_cells(cells: [Cell]) -> bytes:
+    return bytes(NO_CELL if cell == Cell.EMPTY else cell.value for cell in cells)
+
+def decode_cell(value: int) -> Cell:
+    return Cell.EMPTY if value == NO_CELL else Cell(value)
+
+def encode_queue(engine: TetrisEngine) -> bytes:
+    return encode(Diff.QUEUE, len(engine.queue), extra = encode_cells(peice.get_cell_type() for peice in engine.queue))
+
+def encode_keyframe(engine: TetrisEngine) -> bytes:
+    """The whole state of {engine} that a viewer needs to draw it"""
+    hold = engine.hold.get_cell_type().value if engine.hold else NO_CELL
+    return encode(Diff.KEYFRAME, engine.board_size.x, engine.board_size.y, *engine.player.get_values(), hold,
+            engine.score, engine.level, engine.lines_cleared, engine.game_over,
+            extra = encode_cells(cell for row in engine.board for cell in row)) + encode_queue(engine)
+
+class Broadcaster:
+    """
+    A server that streams the game it is given through {self.publish} to every viewer connected to it
+    the network runs an event loop on its own thread so the game never waits on a viewer.
+    a viewer that can't keep up has its diffs dropped until the next keyframe instead of them piling up
+    """
+
+    KEYFRAME_INTERVAL = 120 # frames between keyframes, so a viewer is never more than 2 seconds from being in sync
+    MAX_BUFFERED = 16384 # bytes waiting to go to a viewer before it counts as behind
+
+    def __init__(self, host: str = '', port: int = 7778):
+        """
+        :host: Optional. defaults to every interface. the address to listen on
+        :port: Optional. defaults to 7778
+        """
+        self.host = host
+        self.port = port
+        self.viewers = set() # viewers that are in sync
+        self.joining = set() # viewers that need a keyframe before they can use any diffs
+        self.frames_since_keyframe = 0
+        self.loop = asyncio.new_event_loop()
+        self.thread = None
+
+    def start(self):
+        """
+        Start taking viewers in the background
+        :raises OSError: when the port can't be listened on
+        """
+        self.thread = threading.Thread(target = self.loop.run_forever, daemon = True)
+        self.thread.start()
+        server = asyncio.run_coroutine_threadsafe(asyncio.start_server(self.add_viewer, self.host, self.port), self.loop).result()
+        self.port = server.sockets[0].getsockname()[1]
+
+    async def add_viewer(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Keep a new viewer until it disconnects. viewers don't send anything so this only waits for the end"""
+        set_no_delay(writer)
+        self.joining.add(writer)
+        try:
+            while await reader.read(1024):
+                pass
+        except ConnectionError:
+            pass
+        finally:
+            self.viewers.discard(writer)
+            self.joining.discard(writer)
+            writer.close()
+
+    def resync(self):
+        """Send everyone a keyframe after the next step, for when the game changed all at once e.g. it was reset"""
+        self.frames_since_keyframe = self.KEYFRAME_INTERVAL
+
+    def publish(self, engine: TetrisEngine, events: [Event]):
+        """Send viewers what {events} changed in {engine} during its last step"""
+        data = bytearray()
+        moved = queue_changed = stats_changed = False
+        for event in events:
+            if event == Event.LOCK:
+                data += encode(Diff.LOCK, *engine.last_locked.get_values())
+                stats_changed = True
+            elif event == Event.GARBAGE:
+                data += encode(Diff.GARBAGE, min(engine.last_garbage[0], 0xffff), engine.last_garbage[1])
+            elif event == Event.HOLD:
+                data += encode(Diff.HOLD, engine.hold.get_cell_type().value)
+                moved = queue_changed = True
+            elif event == Event.SPAWN:
+                moved = queue_changed = True
+            elif event in (Event.MOVE, Event.ROTATE):
+                moved = True
+            elif event == Event.LEVEL_UP:
+                stats_changed = True
+            elif event == Event.GAME_OVER:
+                data += encode(Diff.GAME_OVER)
+        if stats_changed:
+            data += encode(Diff.STATS, engine.score, engine.level, engine.lines_cleared)
+        if queue_changed:
+            data += encode_queue(engine)
+        if moved:
+            data += encode(Diff.PLAYER, *engine.player.get_values())
+        self.frames_since_keyframe += 1
+        everyone = self.frames_since_keyframe >= self.KEYFRAME_INTERVAL
+        if everyone:
+            self.frames_since_keyframe = 0
+        keyframe = encode_keyframe(engine) if everyone or self.joining else None
+        if data or keyframe:
+            self.loop.call_soon_threadsafe(self.fan_out, bytes(data), keyframe, everyone)
+
+    def fan_out(self, data: bytes, keyframe: bytes, everyone: bool):
+        """Write the diffs of a step to the viewers in sync, and the keyframe to the viewers that need it"""
+        for writer in list(self.viewers):
+            if writer.transport.get_write_buffer_size() > self.MAX_BUFFERED:
+                self.viewers.discard(writer)
+                self.joining.add(writer)
+            elif data and not everyone:
+                writer.write(data)
+        if keyframe:
+            for writer in list(self.joining if not everyone else self.joining | self.viewers):
+                if writer.transport.get_write_buffer_size() <= self.MAX_BUFFERED:
+                    writer.write(keyframe)
+                    self.joining.discard(writer)
+                    self.viewers.add(writer)
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+class Viewer:
+    """
+    Watches a game streamed by a {Broadcaster}
+    the game is rebuilt in {self.engine}, which is never stepped, so it can be drawn the same way as one being played.
+    the network runs an event loop on its own thread and the diffs are only applied when {self.poll} is called
+    """
+
+    def __init__(self, host: str, port: int, board_size: Point = Point(10, 20)):
+        """
+        :host: the address of the broadcaster
+        :port: the port of the broadcaster
+        :board_size: Optional. defaults to 10x20. the size of the board until the first keyframe says otherwise
+        """
+        self.host = host
+        self.port = port
+        self.engine = TetrisEngine(board_size)
+        self.synced = False # diffs mean nothing until there has been a keyframe
+        self.resynced = False # set by every keyframe, for whoever draws {self.engine} to redraw everything
+        self.connected = False
+        self.incoming = queue.SimpleQueue()
+        self.loop = asyncio.new_event_loop()
+        self.thread = None
+        self.writer = None
+
+    def connect(self):
+        """
+        Connect to the broadcaster in the background
+        :raises OSError: when it can't be reached
+        """
+        future = asyncio.run_coroutine_threadsafe(asyncio.open_connection(self.host, self.port), self.loop)
+        self.thread = threading.Thread(target = self.loop.run_forever, daemon = True)
+        self.thread.start()
+        reader, self.writer = future.result()
+        set_no_delay(self.writer)
+        self.connected = True
+        asyncio.run_coroutine_threadsafe(self.receive(reader), self.loop)
+
+    async def receive(self, reader: asyncio.StreamReader):
+        try:
+            while True:
+                self.incoming.put(await read_diff(reader))
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            self.incoming.put(None)
+
+    def poll(self) -> [Event]:
+        """
+        Apply the diffs that came in since the last poll to {self.engine}
+        :returns: the events the engine would have had for them, so the game can be redrawn the same way
+        """
+        events = []
+        while True:
+            try:
+                diff = self.incoming.get_nowait()
+            except queue.Empty:
+                return events
+            if diff is None:
+                self.connected = False
+            else:
+                events += self.apply(*diff)
+
+    def apply(self, diff: Diff, values: (int,), extra: bytes) -> [Event]:
+        engine = self.engine
+        if diff == Diff.KEYFRAME:
+            self.load_keyframe(values, extra)
+            return []
+        if not self.synced:
+            return []
+        if diff == Diff.PLAYER:
+            engine.player = Peice.from_values(*values, engine.board_size)
+            return [Event.MOVE]
+        elif diff == Diff.LOCK:
+            engine.last_locked = Peice.from_values(*values, engine.board_size)
+            engine.last_locked.lock(engine.board)
+            engine.last_cleared = engine.board.clear_lines()
+            return [Event.LOCK, Event.LINE_CLEAR] if engine.last_cleared else [Event.LOCK]
+        elif diff == Diff.GARBAGE:
+            engine.board.add_garbage(*values)
+            return [Event.GARBAGE]
+        elif diff == Diff.HOLD:
+            engine.hold = Peice(TETRIMINO_OF_CELL_VALUE[values[0]], engine.board_size)
+            return [Event.HOLD]
+        elif diff == Diff.QUEUE:
+            self.load_queue(extra)
+            return [Event.SPAWN]
+        elif diff == Diff.STATS:
+            level = engine.level
+            engine.score, engine.level, engine.lines_cleared = values
+            return [Event.LEVEL_UP] if engine.level > level else []
+        elif diff == Diff.GAME_OVER:
+            engine.game_over = True
+            return [Event.GAME_OVER]
+        return []
+
+    def load_keyframe(self, values: (int,), cells: bytes):
+        engine = self.engine
+        width, height, cell, rotation, x, y, hold, engine.score, engine.level, engine.lines_cleared, game_over = values
+        engine.board_size = Point(width, height)
+        engine.board = engine.board_type(engine.board_size)
+        matrix = [[decode_cell(value) for value in cells[row:row + width]] for row in range(0, width * height, width)]
+        if any(cell != Cell.EMPTY for row in matrix for cell in row):
+            engine.board.lock(Shape.from_matrix(matrix), Point(0, 0))
+        engine.player = Peice.from_values(cell, rotation, x, y, engine.board_size)
+        engine.hold = Peice(TETRIMINO_OF_CELL_VALUE[hold], engine.board_size) if hold != NO_CELL else None
+        engine.game_over = bool(game_over)
+        self.synced = self.resynced = True
+
+    def load_queue(self, cells: bytes):
+        self.engine.queue = [Peice(TETRIMINO_OF_CELL_VALUE[value], self.engine.board_size) for value in cells]
+
+    def close(self):
+        if self.connected:
+            self.connected = False
+            self.loop.call_soon_threadsafe(self.writer.close)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('address', metavar = 'HOST:PORT', help = 'the broadcaster to watch')
+    args = parser.parse_args()
+    host, _, port = args.address.rpartition(':')
+    viewer = Viewer(host or 'localhost', int(port))
+    try:
+        viewer.connect()
+    except OSError as error:
+        parser.error(f"can't connect to {args.address}: {error}")
+    last = None
+    while viewer.connected or not viewer.incoming.empty():
+        viewer.poll()
+        engine = viewer.engine
+        stats = (engine.score, engine.level, engine.lines_cleared, engine.game_over)
+        if viewer.synced and stats != last:
+            last = stats
+            print(f'score {engine.score} level {engine.level} lines {engine.lines_cleared}' + (' game over' if engine.game_over else ''))
+        time.sleep(1 / 60)
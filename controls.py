@@ -0,0 +1,158 @@
+"""
+The keys that control the game, and the buffer that turns key presses into the actions of each step
+the bindings can be changed in the controls menu and are kept in a json file of action names to key names, e.g.:
+    {"MOVE_LEFT": ["a", "left"], "HOLD": ["space"]}
+"""
+
+import json, pygame
+from time import perf_counter
+from collections import deque
+from pygame.locals import *
+from engine import Action
+
+
+# every action a key can be bound to, in the order the controls menu shows them
+ACTION_NAMES = {
+        Action.FAST_DROP: 'Fast Drop',
+        Action.SOFT_DROP: 'Soft Drop',
+        Action.MOVE_LEFT: 'Move Left',
+        Action.MOVE_RIGHT: 'Move Right',
+        Action.ROTATE_LEFT: 'Rotate Left',
+        Action.ROTATE_RIGHT: 'Rotate Right',
+        Action.HOLD: 'Hold',
+        }
+
+DEFAULT_BINDINGS = {
+        K_s: Action.SOFT_DROP,
+        K_w: Action.FAST_DROP,
+        K_a: Action.MOVE_LEFT,
+        K_d: Action.MOVE_RIGHT,
+        K_q: Action.ROTATE_LEFT,
+        K_e: Action.ROTATE_RIGHT,
+        K_SPACE: Action.HOLD,
+        }
+
+# keys the game uses for itself that can't be bound to an action
+RESERVED_KEYS = {K_ESCAPE, K_p, K_F3, K_F4, K_F11}
+
+def load_bindings(path: str) -> {int: Action}:
+    """
+    Load the bindings saved by {save_bindings}
+    :returns: a copy of {DEFAULT_BINDINGS} when there is no file at {path} or it can't be read
+    """
+    try:
+        with open(path) as file:
+            saved = json.load(file)
+        bindings = {}
+        for name, key_names in saved.items():
+            for key_name in key_names:
+                key = pygame.key.key_code(key_name)
+                if key not in RESERVED_KEYS:
+                    bindings[key] = Action[name]
+        return bindings
+    except (OSError, ValueError, KeyError, AttributeError):
+        # AttributeError is a file that isn't a json object of lists
+        return dict(DEFAULT_BINDINGS)
+
+def save_bindings(bindings: {int: Action}, path: str):
+    saved = {}
+    for key, action in bindings.items():
+        saved.setdefault(action.name, []).append(pygame.key.name(key))
+    with open(path, 'w') as file:
+        json.dump(saved, file, indent = 4)
+
+def get_keys(bindings: {int: Action}, action: Action) -> [int]:
+    """The keys bound to {action}"""
+    return [key for key, bound in bindings.items() if bound == action]
+
+def rebind(bindings: {int: Action}, key: int, action: Action):
+    """Make {key} the only key for {action}. whatever {key} did before is unbound from it"""
+    for old_key in get_keys(bindings, action):
+        del bindings[old_key]
+    bindings[key] = action
+
+class InputBuffer:
+    """
+    Turns KEYDOWN and KEYUP events into the actions of each step of the engine
+    the events are queued with the time they were taken from pygame's queue, and {self.get_actions} applies every
+    press since the last step in the order they happened, so a tap shorter than a frame still moves the peice.
+    the engine applies the actions of a step in the order of their flags, so a press that would go before an earlier
+    one of the same step waits for the next step instead, as does pressing an action again before the engine saw it let go.
+    the time from each press being taken in to the step that applied it is kept in {self.latencies}
+    """
+
+    def __init__(self, bindings: {int: Action} = None, size: int = 600):
+        """
+        :bindings: Optional. defaults to a copy of {DEFAULT_BINDINGS}. the action of each key. changes to it apply straight away
+        :size: Optional. defaults to 600. the number of latencies kept, older ones are thrown out
+        """
+        self.bindings = bindings if bindings is not None else dict(DEFAULT_BINDINGS)
+        self.pending = deque() # (time, key, pressed) of the events since the last step
+        self.held = {} # key: the action it was bound to when it was pressed
+        self.last_actions = Action.NONE
+        self.latencies = deque(maxlen = size) # milliseconds
+
+    def record(self, event: pygame.event.Event, time: float = None) -> bool:
+        """
+        Queue a KEYDOWN or KEYUP event for the next step
+        :time: Optional. defaults to now. when the event happened on the perf_counter clock
+        :returns: True if the event was for a bound key or a key being held
+        """
+        if event.key not in self.bindings and event.key not in self.held:
+            return False
+        self.pending.append((perf_counter() if time is None else time, event.key, event.type == KEYDOWN))
+        return True
+
+    def get_actions(self) -> Action:
+        """
+        Take in the queued events for the next step
+        :returns: the actions for {TetrisEngine.step}, which are the ones held plus every one pressed since the last step
+        """
+        now = perf_counter()
+        pending = self.pending
+        held = self.held
+        held_actions = Action.NONE
+        for action in held.values():
+            held_actions |= action
+        pressed = Action.NONE
+        while pending:
+            time, key, down = pending[0]
+            if down:
+                action = self.bindings.get(key, Action.NONE)
+                if action and not action & held_actions:
+                    if action & (self.last_actions | pressed) or pressed > action:
+                        break
+                    pressed |= action
+                    self.latencies.append((now - time) * 1000)
+                held[key] = action
+                held_actions |= action
+            elif held.pop(key, None) is not None:
+                held_actions = Action.NONE
+                for action in held.values():
+                    held_actions |= action
+            pending.popleft()
+        self.last_actions = held_actions | pressed
+        return self.last_actions
+
+    def sync(self, keys: [bool]):
+        """
+        Throw out the queued events and hold the bound keys that are down in {keys}
+        for when events went to another screen, e.g. the pause menu, so the buffer missed keys being let go
+        :keys: what is down like pygame.key.get_pressed
+        """
+        self.pending.clear()
+        self.held = {key: action for key, action in self.bindings.items() if keys[key]}
+        self.last_actions = Action.NONE
+        for action in self.held.values():
+            self.last_actions |= action
+
+    def get_latency_stats(self) -> {str: float}:
+        """The p50, p99 and max milliseconds from a press being taken in to being applied, empty before any press"""
+        latencies = sorted(self.latencies)
+        if not latencies:
+            return {}
+        return {
+                'p50': latencies[len(latencies) // 2],
+                'p99': latencies[min(len(latencies) - 1, len(latencies) * 99 // 100)],
+                'max': latencies[-1],
+                }
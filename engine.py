@@ -0,0 +1,818 @@
+"""
+The rules of PyTetris without any rendering
+nothing in here needs a display so it can be stepped as fast as the cpu allows
+"""
+
+from enum import Enum, IntFlag
+from random import Random
+from struct import Struct, error as StructError
+from collections import deque, namedtuple
+from pygame_tools import Point, TrueEvery
+from board import Cell, Shape, Board
+
+
+class Action(IntFlag):
+    """The inputs the engine understands. Any combination can be passed to {TetrisEngine.step}"""
+    NONE = 0
+    SOFT_DROP = 1
+    FAST_DROP = 2
+    MOVE_LEFT = 4
+    MOVE_RIGHT = 8
+    ROTATE_LEFT = 16
+    ROTATE_RIGHT = 32
+    HOLD = 64
+
+class Event(Enum):
+    """Things that can happen during a call to {TetrisEngine.step}"""
+    MOVE = 0
+    ROTATE = 1
+    LOCK = 2
+    SPAWN = 3
+    LINE_CLEAR = 4
+    LEVEL_UP = 5
+    HOLD = 6
+    GAME_OVER = 7
+    ATTACK = 8
+    GARBAGE = 9
+
+def rotate_matrix_right(matrix: [[Cell]]) -> ((Cell,),):
+    """
+    Rotate a matrix 90 degrees to the right
+    matrix can be any size as long and width and height are the same
+    e.g.:
+        Matrix:
+            +--+--+--+--+      +--+--+--+--+
+            |00|01|02|03|      |30|20|10|00|
+            +--+--+--+--+      +--+--+--+--+
+            |10|11|12|13|      |31|21|11|01|
+            +--+--+--+--+ ---> +--+--+--+--+
+            |20|21|22|23|      |32|22|12|02|
+            +--+--+--+--+      +--+--+--+--+
+            |30|31|32|33|      |33|23|13|03|
+            +--+--+--+--+      +--+--+--+--+
+    """
+    size = len(matrix)
+    return tuple(tuple(matrix[size - j - 1][i] for j in range(size)) for i in range(size))
+
+# wall kicks from the super rotation system, indexed by (state before, state after)
+# state 0 is the SRS spawn state and each step is one turn to the right
+# y is flipped from the usual tables because down is positive on the board
+SRS_KICKS = {
+        (0, 1): ((0, 0), (-1, 0), (-1, -1), (0, 2), (-1, 2)),
+        (1, 0): ((0, 0), (1, 0), (1, 1), (0, -2), (1, -2)),
+        (1, 2): ((0, 0), (1, 0), (1, 1), (0, -2), (1, -2)),
+        (2, 1): ((0, 0), (-1, 0), (-1, -1), (0, 2), (-1, 2)),
+        (2, 3): ((0, 0), (1, 0), (1, -1), (0, 2), (1, 2)),
+        (3, 2): ((0, 0), (-1, 0), (-1, 1), (0, -2), (-1, -2)),
+        (3, 0): ((0, 0), (-1, 0), (-1, 1), (0, -2), (-1, -2)),
+        (0, 3): ((0, 0), (1, 0), (1, -1), (0, 2), (1, 2)),
+        }
+SRS_I_KICKS = {
+        (0, 1): ((0, 0), (-2, 0), (1, 0), (-2, 1), (1, -2)),
+        (1, 0): ((0, 0), (2, 0), (-1, 0), (2, -1), (-1, 2)),
+        (1, 2): ((0, 0), (-1, 0), (2, 0), (-1, -2), (2, 1)),
+        (2, 1): ((0, 0), (1, 0), (-2, 0), (1, 2), (-2, -1)),
+        (2, 3): ((0, 0), (2, 0), (-1, 0), (2, -1), (-1, 2)),
+        (3, 2): ((0, 0), (-2, 0), (1, 0), (-2, 1), (1, -2)),
+        (3, 0): ((0, 0), (1, 0), (-2, 0), (1, 2), (-2, -1)),
+        (0, 3): ((0, 0), (-1, 0), (2, 0), (-1, -2), (2, 1)),
+        }
+NO_KICKS = {key: ((0, 0),) for key in SRS_KICKS}
+
+class Tetrimino:
+    """
+    The parts of a tetrimino that never change
+    all four rotations and the kicks between them are worked out once here and shared by every Peice of that type
+    """
+
+    __slots__ = ('matrix_size', 'shapes', 'cell', 'kicks')
+
+    def __init__(self, matrix: [[Cell]], kicks: {(int, int): ((int, int),)}, spawn_state: int = 0):
+        """
+        :matrix: the spawn rotation represented in a 2d array of type Cell
+        :kicks: the offsets to try for each (SRS state before, SRS state after)
+        :spawn_state: Optional. defaults to 0. the SRS state {matrix} is in, in turns to the right.
+            rotation 0 of the peice is this state so the kicks are looked up that many turns on
+        """
+        self.matrix_size = Point(len(matrix[0]), len(matrix))
+        self.shapes = []
+        matrix = tuple(tuple(row) for row in matrix)
+        for _ in range(4):
+            self.shapes.append(Shape.from_matrix(matrix))
+            matrix = rotate_matrix_right(matrix)
+        self.shapes = tuple(self.shapes)
+        self.cell = self.shapes[0].cells[0][2]
+        self.kicks = {(before, after): tuple(Point(x, y) for x, y in kicks[(before + spawn_state) % 4, (after + spawn_state) % 4])
+                for before, after in kicks}
+        self.kicks.update({(rotation, rotation): (Point(0, 0),) for rotation in range(4)})
+
+    def __deepcopy__(self, memo: dict) -> 'Tetrimino':
+        """Nothing in here is ever changed so copies can share it"""
+        return self
+
+class Peice:
+    """
+    Represents a tetris peice or tetrimino
+    only the rotation and position belong to the peice, everything else is shared through {self.tetrimino}
+    """
+
+    __slots__ = ('tetrimino', 'board_size', 'rotation', 'shape', 'pos')
+
+    def __init__(self, tetrimino: Tetrimino, board_size: Point):
+        self.tetrimino = tetrimino
+        self.board_size = board_size
+        self.rotation = 0
+        self.shape = self.tetrimino.shapes[self.rotation]
+        self.reset()
+
+    def copy(self) -> 'Peice':
+        """Get a peice of the same type in the same rotation and position"""
+        peice = Peice(self.tetrimino, self.board_size)
+        peice.rotation = self.rotation
+        peice.shape = self.shape
+        peice.pos = self.pos
+        return peice
+
+    def get_values(self) -> (int, int, int, int):
+        """The cell, rotation and position of the peice as plain ints, e.g. to send or save it"""
+        return self.tetrimino.cell.value, self.rotation, self.pos.x, self.pos.y
+
+    @classmethod
+    def from_values(cls, cell: int, rotation: int, x: int, y: int, board_size: Point) -> 'Peice':
+        """Make the peice {self.get_values} came from"""
+        peice = cls(TETRIMINO_OF_CELL_VALUE[cell], board_size)
+        peice.rotation = rotation
+        peice.shape = peice.tetrimino.shapes[rotation]
+        peice.pos = Point(x, y)
+        return peice
+
+    @property
+    def matrix(self) -> ((Cell,),):
+        return self.shape.matrix
+
+    @property
+    def matrix_size(self) -> Point:
+        return self.tetrimino.matrix_size
+
+    def reset(self):
+        """resets the position of the Peice to the top"""
+        self.pos = Point(self.board_size.x // 2 - self.matrix_size.x // 2, 0)
+
+    def get_cell_type(self) -> Cell:
+        """Get the type of Cell this peice is made of"""
+        return self.tetrimino.cell
+
+    def fast_drop(self, board: Board):
+        self.pos = self.get_fast_drop_pos(board)
+
+    def get_fast_drop_pos(self, board: Board) -> Point:
+        return Point(self.pos.x, board.get_landing_y(self.shape, self.pos))
+
+    def move_down(self, board: Board) -> bool:
+        """Move the tetris peice down"""
+        return self.move_to(board, Point(self.pos.x, self.pos.y + 1))
+
+    def move_left(self, board: Board) -> bool:
+        """Move the tetris peice left"""
+        return self.move_to(board, Point(self.pos.x - 1, self.pos.y))
+
+    def move_right(self, board: Board) -> bool:
+        """Move the tetris peice right"""
+        return self.move_to(board, Point(self.pos.x + 1, self.pos.y))
+
+    def move_to(self, board: Board, pos: Point) -> bool:
+        """Try to move to a new position"""
+        if valid := self.check_valid_position(board, pos):
+            self.pos = pos
+        return valid
+
+    def rotate_right(self, board: Board) -> bool:
+        """
+        Rotate the peice 90 degrees to the right
+        :board: the Board the Peice cannot intersect with
+        :returns: boolean of success
+        """
+        return self.rotate_to(board, (self.rotation + 1) % 4)
+
+    def rotate_left(self, board: Board) -> bool:
+        """
+        Rotate the peice 90 degrees to the left
+        :board: the Board the Peice cannot intersect with
+        :returns: boolean of success
+        """
+        return self.rotate_to(board, (self.rotation - 1) % 4)
+
+    def rotate_to(self, board: Board, rotation: int) -> bool:
+        """
+        attempts to rotate the peice to the passed rotation
+        :rotation: the index of the rotation in {self.tetrimino.shapes}
+        :returns: boolean of success
+        """
+        rotated, pos = self.check_valid_rotate(board, rotation = rotation)
+        if rotated:
+            self.pos = pos
+            self.rotation = rotation
+            self.shape = self.tetrimino.shapes[rotation]
+        return rotated
+
+    def check_valid_rotate(self, board: Board, pos: Point = None, rotation: int = None) -> (bool, Point):
+        """
+        Check if a rotated rotated position is ok and move it around slightly if it can
+        :board: the Board the Peice cannot intersect with
+        :pos: Optional. deaults to {self.pos}. the coordinates of the peice
+        :rotation: Optional. defaults to {self.rotation}. the rotation to check
+        :returns: a boolean of succes and the point in ended up landing in if it succeeded
+        """
+        if rotation is None:
+            rotation = self.rotation
+        if not pos:
+            pos = self.pos
+        shape = self.tetrimino.shapes[rotation]
+        for kick in self.tetrimino.kicks[self.rotation, rotation]:
+            shifted = Point(pos.x + kick.x, pos.y + kick.y)
+            if board.check_valid_position(shape, shifted):
+                return True, shifted
+        return False, None
+
+    def check_valid_position(self, board: Board, pos: Point = None, shape: Shape = None) -> bool:
+        """Check if the position passed is avaliale for the this object"""
+        return board.check_valid_position(shape or self.shape, pos or self.pos)
+
+    def lock(self, board: Board):
+        """Lock the peice in place on the board"""
+        board.lock(self.shape, self.pos)
+
+TETRIMINOS = [
+        Tetrimino(
+            [
+                [Cell.O, Cell.O],
+                [Cell.O, Cell.O],
+                ],
+            NO_KICKS
+            ),
+        Tetrimino(
+            [
+                [Cell.EMPTY, Cell.T, Cell.EMPTY],
+                [Cell.T, Cell.T, Cell.T],
+                [Cell.EMPTY, Cell.EMPTY, Cell.EMPTY],
+                ],
+            SRS_KICKS
+            ),
+        Tetrimino(
+            [
+                [Cell.EMPTY, Cell.L, Cell.EMPTY],
+                [Cell.EMPTY, Cell.L, Cell.EMPTY],
+                [Cell.EMPTY, Cell.L, Cell.L],
+                ],
+            SRS_KICKS,
+            spawn_state = 1
+            ),
+        Tetrimino(
+            [
+                [Cell.EMPTY, Cell.J, Cell.EMPTY],
+                [Cell.EMPTY, Cell.J, Cell.EMPTY],
+                [Cell.J, Cell.J, Cell.EMPTY],
+                ],
+            SRS_KICKS,
+            spawn_state = 3
+            ),
+        Tetrimino(
+            [
+                [Cell.EMPTY, Cell.EMPTY, Cell.EMPTY, Cell.EMPTY],
+                [Cell.I, Cell.I, Cell.I, Cell.I],
+                [Cell.EMPTY, Cell.EMPTY, Cell.EMPTY, Cell.EMPTY],
+                [Cell.EMPTY, Cell.EMPTY, Cell.EMPTY, Cell.EMPTY],
+                ],
+            SRS_I_KICKS
+            ),
+        Tetrimino(
+            [
+                [Cell.Z, Cell.Z, Cell.EMPTY],
+                [Cell.EMPTY, Cell.Z, Cell.Z],
+                [Cell.EMPTY, Cell.EMPTY, Cell.EMPTY],
+                ],
+            SRS_KICKS
+            ),
+        Tetrimino(
+            [
+                [Cell.EMPTY, Cell.S, Cell.S],
+                [Cell.S, Cell.S, Cell.EMPTY],
+                [Cell.EMPTY, Cell.EMPTY, Cell.EMPTY],
+                ],
+            SRS_KICKS
+            ),
+        ]
+
+TETRIMINO_OF_CELL_VALUE = {tetrimino.cell.value: tetrimino for tetrimino in TETRIMINOS}
+
+class GrabBag:
+    """
+    Deals tetriminos in shuffled sets of one of each, so the same peice never goes missing for long
+    the order only depends on the seed so a game can be played again exactly
+    """
+
+    def __init__(self, tetriminos: [Tetrimino], seed: int = None):
+        """
+        :tetriminos: one of each tetrimino that goes in a bag
+        :seed: Optional. defaults to None. None picks a random seed
+        """
+        self.tetriminos = tetriminos
+        self.random = Random(seed)
+        self.random_state = None # kept until the next shuffle so snapshots in between share it
+        self.upcoming = deque()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> Tetrimino:
+        if not self.upcoming:
+            self.fill()
+        return self.upcoming.popleft()
+
+    def fill(self):
+        """Shuffle another bag onto the end of {self.upcoming}"""
+        bag = list(self.tetriminos)
+        self.random.shuffle(bag)
+        self.random_state = None
+        self.upcoming.extend(bag)
+
+    def peek(self, count: int) -> [Tetrimino]:
+        """Look at the next {count} tetriminos without taking them out. bags are only shuffled when needed"""
+        while len(self.upcoming) < count:
+            self.fill()
+        return [self.upcoming[i] for i in range(count)]
+
+    def get_state(self) -> tuple:
+        """The state of {self.random}. it only changes when a bag is shuffled, until then the same tuple is given out"""
+        if self.random_state is None:
+            self.random_state = self.random.getstate()
+        return self.random_state
+
+    def set_state(self, state: tuple, upcoming: [Tetrimino]):
+        """Go back to a {self.get_state} with {upcoming} already shuffled"""
+        self.random.setstate(state)
+        self.random_state = state
+        self.upcoming = deque(upcoming)
+
+class Snapshot(namedtuple('Snapshot', ['seed', 'board_size', 'board', 'touched_rows', 'player', 'hold', 'queue', 'upcoming', 'bag_state',
+        'garbage_state', 'score', 'level', 'lines_cleared', 'lines_cleared_since_level_up', 'pending_garbage', 'can_swap_hold', 'ARE_locked',
+        'game_over', 'delay_counters'])):
+    """
+    Everything that decides how a game plays out from a point in it, as immutable values
+    snapshots taken while the board or a Random doesn't change share them, so keeping a lot of them is cheap
+    :board_size: (width, height)
+    :board: every square from {Board.to_bytes}
+    :touched_rows: the rows {Board.clear_lines} will check
+    :player: {Peice.get_values} of the falling peice
+    :hold: {Peice.get_values} of the peice in hold or None
+    :queue: the cell values of the peices in the queue
+    :upcoming: the cell values of the peices already shuffled into the grab bag
+    :bag_state: the state of the grab bag's Random
+    :garbage_state: the state of the Random that picks the holes in garbage
+    :delay_counters: (count, calls, first_call) of each of {TetrisEngine.delay_counters} in order
+    """
+
+    MAGIC = b'PTSS'
+    VERSION = 1
+    # magic, version, seed, board size, player, hold, score, level, lines, lines since level up, pending garbage,
+    # flags, then the number of queued peices, upcoming peices, touched rows and delay counters that come after it
+    HEADER = Struct('<4sBQHHBBhhBBhhIBIIHBBBHB')
+    DELAY_COUNTER = Struct('<hh?')
+    RANDOM_STATE = Struct('<625I?d')
+    NO_HOLD = (0xff, 0, 0, 0)
+
+    def to_bytes(self) -> bytes:
+        """
+        Pack the snapshot for saving. after the header are the queued and upcoming cells, the touched rows as shorts,
+        the delay counters, the board's squares and both Randoms
+        """
+        flags = self.can_swap_hold | self.ARE_locked << 1 | self.game_over << 2
+        data = bytearray(self.HEADER.pack(self.MAGIC, self.VERSION, self.seed, *self.board_size, *self.player, *(self.hold or self.NO_HOLD),
+                self.score, self.level, self.lines_cleared, self.lines_cleared_since_level_up, self.pending_garbage, flags,
+                len(self.queue), len(self.upcoming), len(self.touched_rows), len(self.delay_counters)))
+        data += bytes(self.queue) + bytes(self.upcoming)
+        data += Struct(f'<{len(self.touched_rows)}H').pack(*self.touched_rows)
+        for counter in self.delay_counters:
+            data += self.DELAY_COUNTER.pack(*counter)
+        data += self.board
+        for version, state, gauss in (self.bag_state, self.garbage_state):
+            data += self.RANDOM_STATE.pack(*state, gauss is not None, gauss or 0)
+        return bytes(data)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'Snapshot':
+        try:
+            (magic, version, seed, width, height, *values) = cls.HEADER.unpack_from(data)
+        except StructError:
+            raise ValueError('snapshot is too short to have a header') from None
+        if magic != cls.MAGIC:
+            raise ValueError('not a pytetris snapshot')
+        if version != cls.VERSION:
+            raise ValueError(f'snapshot version {version} is not supported')
+        player, hold = tuple(values[0:4]), tuple(values[4:8])
+        score, level, lines_cleared, lines_cleared_since_level_up, pending_garbage, flags, queued, upcoming, touched, counters = values[8:]
+        i = cls.HEADER.size
+        try:
+            queue = tuple(data[i:i + queued])
+            upcoming = tuple(data[i + queued:i + queued + upcoming])
+            i += len(queue) + len(upcoming)
+            touched_rows = Struct(f'<{touched}H').unpack_from(data, i)
+            i += touched * 2
+            delay_counters = tuple(cls.DELAY_COUNTER.unpack_from(data, i + cls.DELAY_COUNTER.size * n) for n in range(counters))
+            i += cls.DELAY_COUNTER.size * counters
+            board = bytes(data[i:i + width * height])
+            i += width * height
+            states = []
+            for _ in range(2):
+                *state, has_gauss, gauss = cls.RANDOM_STATE.unpack_from(data, i)
+                states.append((Random.VERSION, tuple(state), gauss if has_gauss else None))
+                i += cls.RANDOM_STATE.size
+        except StructError:
+            raise ValueError('snapshot is cut off') from None
+        if i != len(data):
+            raise ValueError(f'snapshot has {len(data) - i} bytes left over')
+        return cls(seed, (width, height), board, touched_rows, player, hold if hold != cls.NO_HOLD else None, queue, upcoming, *states,
+                score, level, lines_cleared, lines_cleared_since_level_up, pending_garbage, bool(flags & 1), bool(flags & 2), bool(flags & 4),
+                delay_counters)
+
+class TetrisEngine:
+    """
+    The state and rules of one game of tetris
+    call {self.step} once per frame with the actions being held down
+    """
+
+    SCORE_DICT = {
+            # TODO
+            }
+    ATTACK_LINES = { # garbage lines sent to an opponent for clearing {key} lines at once
+            0: 0,
+            1: 0,
+            2: 1,
+            3: 2,
+            4: 4,
+            }
+    LEVEL_FRAMES = { # 1 cell per {value} at level {key}
+            0: 48,
+            1: 43,
+            2: 38,
+            3: 33,
+            4: 28,
+            5: 23,
+            6: 18,
+            7: 13,
+            8: 8,
+            9: 6,
+            10: 5,
+            11: 5,
+            12: 5,
+            13: 4,
+            14: 4,
+            15: 4,
+            16: 3,
+            17: 3,
+            18: 3,
+            19: 2,
+            20: 2,
+            21: 2,
+            22: 2,
+            23: 2,
+            24: 2,
+            25: 2,
+            26: 2,
+            27: 2,
+            28: 2,
+            29: 1,
+            }
+    LEVEL_LINES = { # how many lines it takes to reach the next level
+            0: 10,
+            1: 20,
+            2: 30,
+            3: 40,
+            4: 50,
+            5: 60,
+            6: 70,
+            7: 80,
+            8: 90,
+            9: 100,
+            10: 100,
+            11: 100,
+            12: 100,
+            13: 100,
+            14: 100,
+            15: 100,
+            16: 110,
+            17: 120,
+            18: 130,
+            19: 140,
+            20: 150,
+            21: 160,
+            22: 170,
+            23: 180,
+            24: 190,
+            25: 200,
+            26: 200,
+            27: 200,
+            28: 200,
+            }
+    MAX_LEVEL = 29
+    # TODO: check if this is actually true
+    SOFT_DROP_DELAY = 2 # 1 cell per 2 frames
+    DAS_INITIAL_DELAY = 16 # 1 cell per 16 frames; inital speed when holding button
+    DAS_REPEAT_DELAY = 6 # 1 cell per 6 frames; speed after first iteration of holding button
+    ARE_DELAY = 15 # time(frames) after a new peice is created where the peice cannot move
+    MAX_SEED = 2 ** 64 - 1 # the biggest seed a {Snapshot} or replay can hold
+
+    def __init__(self, board_size: Point = Point(10, 20), queue_size: int = 7, board_type: type = Board, seed: int = None):
+        """
+        :board_size: Optional. defaults to 10x20. the size of the board in cells
+        :queue_size: Optional. defaults to 7. how many upcoming peices are kept in {self.queue}
+        :board_type: Optional. defaults to Board. the board backend, {BitBoard} is faster for simulations
+        :seed: Optional. defaults to None. the seed of the first game's grab bag
+        """
+        self.board_size = board_size
+        self.queue_size = queue_size
+        self.board_type = board_type
+        self.num_of_peices = len(TETRIMINOS)
+        self.reset(seed)
+
+    def reset(self, seed: int = None):
+        """
+        Start a new game
+        :seed: Optional. defaults to None. the seed of the grab bag. the same seed always deals the same peices.
+            None picks a random seed, either way it is kept in {self.seed} so the game can be played again
+        :raises ValueError: when {seed} is outside 0 to {self.MAX_SEED}, since snapshots and replays save it as 8 bytes
+        """
+        if seed is None:
+            seed = Random().getrandbits(32)
+        elif not 0 <= seed <= self.MAX_SEED:
+            raise ValueError(f'seed {seed} is not between 0 and {self.MAX_SEED}')
+        self.seed = seed
+        self.grab_bag = GrabBag(TETRIMINOS, self.seed)
+        self.score = 0
+        self.level = 0
+        self.can_swap_hold = True
+        self.hold = None
+        self.ARE_locked = False
+        self.game_over = False
+        self.lines_cleared = 0
+        self.lines_cleared_since_level_up = 0
+        self.delay_counters = self.get_delay_counters()
+        self.board = self.board_type(self.board_size)
+        self.board_bytes = (None, 0, b'') # board, version, {Board.to_bytes} of the last snapshot
+        self.queue = []
+        self.last_cleared = []
+        self.last_locked = None
+        self.last_attack = 0
+        self.last_garbage = None
+        self.pending_garbage = 0
+        self.garbage_random = Random(f'garbage {self.seed}')
+        self.garbage_random_state = None
+        self.events = []
+        for _ in range(self.queue_size):
+            self.queue.append(self.get_from_grab_bag())
+        self.player = self.get_from_queue()
+
+    def get_delay_counters(self) -> {str: TrueEvery}:
+        """The delay counters as they are at the start of a game, with gravity at the speed of {self.level}"""
+        return {
+                'ARE_lock': TrueEvery(self.ARE_DELAY, once = True, start_value = self.ARE_DELAY),
+                'soft_drop': TrueEvery(self.SOFT_DROP_DELAY, start_value = self.SOFT_DROP_DELAY),
+                'auto_drop': TrueEvery(self.LEVEL_FRAMES[self.level]),
+                'DAS_fast_drop': TrueEvery(self.DAS_REPEAT_DELAY, self.DAS_INITIAL_DELAY),
+                'DAS_move_left': TrueEvery(self.DAS_REPEAT_DELAY, self.DAS_INITIAL_DELAY),
+                'DAS_move_right': TrueEvery(self.DAS_REPEAT_DELAY, self.DAS_INITIAL_DELAY),
+                'DAS_rotate_left': TrueEvery(self.DAS_REPEAT_DELAY, self.DAS_INITIAL_DELAY),
+                'DAS_rotate_right': TrueEvery(self.DAS_REPEAT_DELAY, self.DAS_INITIAL_DELAY),
+                }
+
+    def snapshot(self) -> Snapshot:
+        """Get the state of the game as a {Snapshot} that {self.restore} can go back to"""
+        board = self.board
+        if self.board_bytes[0] is not board or self.board_bytes[1] != board.version:
+            self.board_bytes = (board, board.version, board.to_bytes())
+        if self.garbage_random_state is None:
+            self.garbage_random_state = self.garbage_random.getstate()
+        return Snapshot(self.seed, (self.board_size.x, self.board_size.y), self.board_bytes[2], tuple(sorted(board.touched_rows)),
+                self.player.get_values(), self.hold.get_values() if self.hold else None,
+                tuple(peice.tetrimino.cell.value for peice in self.queue), tuple(tetrimino.cell.value for tetrimino in self.grab_bag.upcoming),
+                self.grab_bag.get_state(), self.garbage_random_state, self.score, self.level, self.lines_cleared, self.lines_cleared_since_level_up,
+                self.pending_garbage, self.can_swap_hold, self.ARE_locked, self.game_over,
+                tuple((counter.count, counter.calls, counter.first_call) for counter in self.delay_counters.values()))
+
+    def restore(self, snapshot: Snapshot):
+        """
+        Put the game back exactly how it was when {snapshot} was taken, so it plays out the same from there
+        the board is made as {self.board_type} whatever kind it was taken from
+        """
+        self.seed = snapshot.seed
+        self.board_size = Point(*snapshot.board_size)
+        self.board = self.board_type.from_bytes(self.board_size, snapshot.board)
+        self.board.touched_rows = set(snapshot.touched_rows)
+        self.board_bytes = (self.board, self.board.version, snapshot.board)
+        self.player = Peice.from_values(*snapshot.player, self.board_size)
+        self.hold = Peice.from_values(*snapshot.hold, self.board_size) if snapshot.hold else None
+        self.queue = [Peice(TETRIMINO_OF_CELL_VALUE[cell], self.board_size) for cell in snapshot.queue]
+        self.grab_bag = GrabBag(TETRIMINOS, 0)
+        self.grab_bag.set_state(snapshot.bag_state, [TETRIMINO_OF_CELL_VALUE[cell] for cell in snapshot.upcoming])
+        self.garbage_random = Random(0)
+        self.garbage_random.setstate(snapshot.garbage_state)
+        self.garbage_random_state = snapshot.garbage_state
+        self.score = snapshot.score
+        self.level = snapshot.level
+        self.lines_cleared = snapshot.lines_cleared
+        self.lines_cleared_since_level_up = snapshot.lines_cleared_since_level_up
+        self.pending_garbage = snapshot.pending_garbage
+        self.can_swap_hold = snapshot.can_swap_hold
+        self.ARE_locked = snapshot.ARE_locked
+        self.game_over = snapshot.game_over
+        self.delay_counters = self.get_delay_counters()
+        for counter, (count, calls, first_call) in zip(self.delay_counters.values(), snapshot.delay_counters):
+            counter.count, counter.calls, counter.first_call = count, calls, first_call
+        self.last_cleared = []
+        self.last_locked = None
+        self.last_attack = 0
+        self.last_garbage = None
+        self.events = []
+
+    def copy(self) -> 'TetrisEngine':
+        """Get an independent engine in the same state, e.g. for a search to play ahead on without touching this one"""
+        engine = TetrisEngine.__new__(TetrisEngine)
+        engine.queue_size = self.queue_size
+        engine.board_type = self.board_type
+        engine.num_of_peices = self.num_of_peices
+        engine.restore(self.snapshot())
+        return engine
+
+    def step(self, actions: Action = Action.NONE) -> [Event]:
+        """
+        Advance the game by one frame
+        :actions: the inputs that are held down during this frame
+        :returns: the events that happened during this frame in the order they happened
+        """
+        self.events = []
+        if self.game_over:
+            return self.events
+        if self.delay_counters['ARE_lock']():
+            self.ARE_locked = False
+        self.handle_actions(actions)
+        if not self.game_over:
+            self.auto_drop()
+        return self.events
+
+    def end_game(self) -> [Event]:
+        """
+        End the game where it is, e.g. when the opponent of a versus match topped out first
+        :returns: the events of ending it like {self.step}, which is GAME_OVER unless the game was already over
+        """
+        self.events = []
+        if not self.game_over:
+            self.game_over = True
+            self.events.append(Event.GAME_OVER)
+        return self.events
+
+    def handle_actions(self, actions: Action):
+        """Apply the held actions through the delay counters"""
+        if not self.ARE_locked:
+            if self.delay_counters['soft_drop'].run_or_reset(actions & Action.SOFT_DROP):
+                if self.player.move_down(self.board):
+                    self.events.append(Event.MOVE)
+                # gravity waits a whole drop from here, rather than moving the peice again this frame
+                self.delay_counters['auto_drop'].reset(self.LEVEL_FRAMES[self.level])
+            if self.delay_counters['DAS_fast_drop'].run_or_reset(actions & Action.FAST_DROP):
+                self.player.fast_drop(self.board)
+                self.lock_and_get_new_peice()
+                if self.game_over:
+                    return
+            if self.delay_counters['DAS_move_left'].run_or_reset(actions & Action.MOVE_LEFT):
+                if self.player.move_left(self.board):
+                    self.events.append(Event.MOVE)
+            if self.delay_counters['DAS_move_right'].run_or_reset(actions & Action.MOVE_RIGHT):
+                if self.player.move_right(self.board):
+                    self.events.append(Event.MOVE)
+            if self.delay_counters['DAS_rotate_left'].run_or_reset(actions & Action.ROTATE_LEFT):
+                if self.player.rotate_left(self.board):
+                    self.events.append(Event.ROTATE)
+            if self.delay_counters['DAS_rotate_right'].run_or_reset(actions & Action.ROTATE_RIGHT):
+                if self.player.rotate_right(self.board):
+                    self.events.append(Event.ROTATE)
+        if actions & Action.HOLD:
+            self.swap_hold()
+
+    def clear_lines(self) -> int:
+        """
+        Clear the complete lines from the board
+        the indicies of the cleared lines are kept in {self.last_cleared}
+        :returns: number of lines cleared
+        """
+        self.last_cleared = self.board.clear_lines()
+        return len(self.last_cleared)
+
+    def get_from_queue(self) -> Peice:
+        self.queue.append(self.get_from_grab_bag())
+        return self.queue.pop(0)
+
+    def get_from_grab_bag(self) -> Peice:
+        return Peice(next(self.grab_bag), self.board_size)
+
+    def spawn(self, peice: Peice, topped_out: bool = False):
+        """
+        Make {peice} the player and end the game if it has no room
+        :topped_out: Optional. defaults to False. the stack was pushed off the top of the board so the game is over anyway
+        """
+        self.player = peice
+        self.events.append(Event.SPAWN)
+        if topped_out or not self.player.check_valid_position(self.board):
+            self.game_over = True
+            self.events.append(Event.GAME_OVER)
+
+    def swap_hold(self):
+        """"Swap the current peice with the peice in self.hold"""
+        if self.can_swap_hold:
+            self.can_swap_hold = False
+            if not self.hold:
+                self.hold = self.get_from_queue()
+            temp = self.hold
+            self.hold = self.player
+            temp.reset()
+            self.events.append(Event.HOLD)
+            self.spawn(temp)
+
+    def calculate_score(self, lines: int) -> int:
+        if lines == 0:
+            return 0
+        elif lines == 1:
+            return 40 * (self.level + 1)
+        elif lines == 2:
+            return 100 * (self.level + 1)
+        elif lines == 3:
+            return 300 * (self.level + 1)
+        elif lines == 4:
+            return 1200 * (self.level + 1)
+
+    def level_up(self):
+        self.level += 1
+        self.lines_cleared_since_level_up = 0
+        # both counts, since a soft drop resets the counter back to its initial count
+        auto_drop = self.delay_counters['auto_drop']
+        auto_drop.count = auto_drop.initial_count = self.LEVEL_FRAMES[self.level]
+        self.events.append(Event.LEVEL_UP)
+
+    def lock_and_get_new_peice(self):
+        """
+        Lock {self.player} in place and get a new peice from the queue
+        the locked peice is kept in {self.last_locked}
+        """
+        self.last_locked = self.player
+        self.player.lock(self.board)
+        self.events.append(Event.LOCK)
+        new_peice = self.get_from_queue()
+        lines = self.clear_lines()
+        self.score += self.calculate_score(lines)
+        self.lines_cleared += lines
+        self.lines_cleared_since_level_up += lines
+        if lines != 0:
+            self.events.append(Event.LINE_CLEAR)
+        topped_out = self.attack(lines)
+        if self.level != self.MAX_LEVEL and self.lines_cleared_since_level_up >= self.LEVEL_LINES[self.level]:
+            self.level_up()
+        self.can_swap_hold = True
+        self.delay_counters['ARE_lock'].reset()
+        self.ARE_locked = True
+        self.spawn(new_peice, topped_out)
+
+    def calculate_attack(self, lines: int) -> int:
+        """The garbage lines clearing {lines} at once sends. unlike the score it doesn't grow with the level"""
+        return self.ATTACK_LINES[lines]
+
+    def receive_garbage(self, lines: int):
+        """Queue up {lines} of garbage from an opponent. it comes up the next time a peice locks without clearing anything"""
+        self.pending_garbage += lines
+
+    def attack(self, lines: int) -> bool:
+        """
+        Use the attack from clearing {lines} to cancel garbage in {self.pending_garbage} and send what is left over,
+        or push the pending garbage onto the board if nothing was cleared
+        the attack sent is in {self.last_attack} with an Event.ATTACK, the garbage added in {self.last_garbage} with an Event.GARBAGE
+        :returns: True if garbage pushed the stack off the top of the board
+        """
+        attack = self.calculate_attack(lines)
+        cancelled = min(attack, self.pending_garbage)
+        self.pending_garbage -= cancelled
+        self.last_attack = attack - cancelled
+        if self.last_attack:
+            self.events.append(Event.ATTACK)
+        if lines == 0 and self.pending_garbage:
+            self.last_garbage = (self.pending_garbage, self.garbage_random.randrange(self.board_size.x))
+            self.garbage_random_state = None
+            self.pending_garbage = 0
+            self.events.append(Event.GARBAGE)
+            return self.board.add_garbage(*self.last_garbage)
+        return False
+
+    def auto_drop(self):
+        """Move the peice down one and lock if it cannot go farther down"""
+        if self.delay_counters['auto_drop']() and not self.ARE_locked:
+            if self.player.move_down(self.board):
+                self.events.append(Event.MOVE)
+            else:
+                self.lock_and_get_new_peice()
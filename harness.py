@@ -0,0 +1,141 @@
+"""
+Play seeded games with placement heuristics on every core and record how well each one does
+e.g.:
+    python harness.py --heuristics balanced holes --games 1000 --results results.jsonl
+running the same command again skips the games that are already in the results file
+"""
+
+import sys, json, time, argparse
+from os import cpu_count
+from multiprocessing import Pool
+from engine import TetrisEngine
+from board import Board, BitBoard
+from movegen import find_placements
+
+
+def get_column_heights(board: Board) -> [int]:
+    return [board.size.y - height for height in board.heights]
+
+def count_holes(board: Board) -> int:
+    """Count the empty squares that have a filled square somewhere above them"""
+    return sum(1 for x, top in enumerate(board.heights) for y in range(top + 1, board.size.y) if not board.is_filled(x, y))
+
+def get_bumpiness(heights: [int]) -> int:
+    return sum(abs(a - b) for a, b in zip(heights, heights[1:]))
+
+def balanced(board: Board, lines: int) -> float:
+    """Weigh height, lines, holes and bumpiness against each other"""
+    heights = get_column_heights(board)
+    return -0.51 * sum(heights) + 0.76 * lines - 0.36 * count_holes(board) - 0.18 * get_bumpiness(heights)
+
+def holes(board: Board, lines: int) -> float:
+    """Avoid holes above everything else, then keep the stack low"""
+    return -count_holes(board) * 100 - sum(get_column_heights(board)) + lines
+
+def lowest(board: Board, lines: int) -> float:
+    """Keep the stack as low as possible"""
+    return -max(get_column_heights(board)) * 10 - sum(get_column_heights(board))
+
+def flat(board: Board, lines: int) -> float:
+    """Keep the top of the stack as flat as possible"""
+    heights = get_column_heights(board)
+    return -get_bumpiness(heights) * 2 - count_holes(board) * 4 - max(heights) + lines
+
+HEURISTICS = { # name: function(board after the peice locked and lines cleared, lines cleared) -> higher is better
+        'balanced': balanced,
+        'holes': holes,
+        'lowest': lowest,
+        'flat': flat,
+        }
+
+def play_game(heuristic: str, seed: int, max_peices: int = 1000) -> dict:
+    """
+    Play one game with {heuristic} placing every peice
+    :returns: a dict of the results
+    """
+    evaluate = HEURISTICS[heuristic]
+    engine = TetrisEngine(board_type = BitBoard, seed = seed)
+    start = time.perf_counter()
+    peices = 0
+    while not engine.game_over and peices < max_peices:
+        best = None
+        for placement in find_placements(engine.board, engine.player):
+            peice = placement.move(engine.player)
+            board = engine.board.copy()
+            peice.lock(board)
+            value = evaluate(board, len(board.clear_lines()))
+            if best is None or value > best_value:
+                best, best_value = peice, value
+        engine.events = []
+        engine.player = best
+        engine.lock_and_get_new_peice()
+        peices += 1
+    return {
+            'heuristic': heuristic,
+            'seed': seed,
+            'score': engine.score,
+            'lines': engine.lines_cleared,
+            'level': engine.level,
+            'peices': peices,
+            'game_over': engine.game_over,
+            'seconds': round(time.perf_counter() - start, 4),
+            }
+
+def run_job(job: (str, int, int)) -> dict:
+    """Unpack a job for the process pool"""
+    return play_game(*job)
+
+def load_results(path: str) -> [dict]:
+    """Read the games that were already played. a line cut off by a crash is skipped"""
+    results = []
+    try:
+        with open(path) as file:
+            for line in file:
+                try:
+                    results.append(json.loads(line))
+                except json.JSONDecodeError:
+                    pass
+    except FileNotFoundError:
+        pass
+    return results
+
+def evaluate(heuristics: [str], seeds: range, results_path: str, workers: int = None, max_peices: int = 1000) -> [dict]:
+    """
+    Play every heuristic on every seed across a pool of {workers} processes
+    each result is appended to {results_path} as soon as its game finishes
+    :returns: every result, including the ones that were already in the file
+    """
+    results = load_results(results_path)
+    done = {(result['heuristic'], result['seed']) for result in results}
+    jobs = [(heuristic, seed, max_peices) for heuristic in heuristics for seed in seeds if (heuristic, seed) not in done]
+    print(f'{len(done)} games already played, {len(jobs)} to go', file = sys.stderr)
+    with open(results_path, 'a') as file, Pool(workers) as pool:
+        for i, result in enumerate(pool.imap_unordered(run_job, jobs), 1):
+            file.write(json.dumps(result) + '\n')
+            file.flush()
+            results.append(result)
+            print(f'\r{i}/{len(jobs)}', end = '', file = sys.stderr)
+    print(file = sys.stderr)
+    return results
+
+def summarize(results: [dict], heuristics: [str]):
+    """Print the average results of each heuristic, best first"""
+    rows = []
+    for heuristic in heuristics:
+        games = [result for result in results if result['heuristic'] == heuristic]
+        if games:
+            rows.append((sum(game['score'] for game in games) / len(games), sum(game['lines'] for game in games) / len(games), len(games), heuristic))
+    for score, lines, games, heuristic in sorted(rows, reverse = True):
+        print(f'{heuristic:>12}: {score:10.1f} score {lines:8.1f} lines over {games} games')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--heuristics', nargs = '+', default = list(HEURISTICS), choices = list(HEURISTICS))
+    parser.add_argument('--games', type = int, default = 100, help = 'number of seeds each heuristic plays')
+    parser.add_argument('--first-seed', type = int, default = 0)
+    parser.add_argument('--max-peices', type = int, default = 1000, help = 'stop a game after this many peices')
+    parser.add_argument('--workers', type = int, default = cpu_count(), help = 'number of processes. defaults to one per core')
+    parser.add_argument('--results', default = 'results.jsonl', help = 'the file results are appended to and resumed from')
+    args = parser.parse_args()
+    results = evaluate(args.heuristics, range(args.first_seed, args.first_seed + args.games), args.results, args.workers, args.max_peices)
+    summarize(results, args.heuristics)
@@ -0,0 +1,115 @@
+"""
+Find every place a peice can come to rest on a board and the inputs that get it there
+"""
+
+from collections import deque, namedtuple
+from pygame_tools import Point
+from engine import Action, Peice, TetrisEngine
+from board import Board
+
+
+class Placement(namedtuple('Placement', ['pos', 'rotation', 'path'])):
+    """
+    A place a peice can be locked
+    :pos: the top left corner of the peice matrix
+    :rotation: the index of the shape in Tetrimino.shapes
+    :path: the Action of each press that gets the peice there from where it started. it always ends with
+        Action.FAST_DROP, which locks the peice where it is
+    """
+
+    def move(self, peice: Peice) -> Peice:
+        """Get a copy of {peice} moved to the placement"""
+        placed = peice.copy()
+        placed.rotation = self.rotation
+        placed.shape = placed.tetrimino.shapes[self.rotation]
+        placed.pos = self.pos
+        return placed
+
+    def get_frames(self, soft_drop_frames: int = TetrisEngine.SOFT_DROP_DELAY) -> [Action]:
+        """
+        Turn {self.path} into the actions to pass to TetrisEngine.step, one per frame
+        every press is let go for a frame afterwards so it never runs into the DAS delay.
+        gravity keeps going while the path is played, so it only ends up at {self.pos} if the peice
+        doesn't fall on its own along the way
+        :soft_drop_frames: Optional. defaults to TetrisEngine.SOFT_DROP_DELAY. frames soft drop is held to move a row
+        """
+        frames = []
+        for action in self.path:
+            frames += [action] * (soft_drop_frames if action == Action.SOFT_DROP else 1)
+            frames.append(Action.NONE)
+        return frames
+
+# (action, x, y) for each press that moves the peice without turning it
+MOVES = (
+        (Action.MOVE_LEFT, -1, 0),
+        (Action.MOVE_RIGHT, 1, 0),
+        (Action.SOFT_DROP, 0, 1),
+        )
+# (action, change in rotation) for each press that turns the peice
+TURNS = (
+        (Action.ROTATE_RIGHT, 1),
+        (Action.ROTATE_LEFT, -1),
+        )
+
+def find_placements(board: Board, peice: Peice) -> [Placement]:
+    """
+    Search every way {peice} can move, turn and soft drop on {board} for the places it can be locked.
+    tucks under overhangs and spins through kicks are found because the search keeps going after the peice
+    has dropped, and turns go through {peice.check_valid_rotate} so they kick exactly as they do in a game
+    The search is breadth first so the path to each placement is as short as possible.
+    every (x, y, rotation) state goes into a table the first time it is reached, so no state is tried twice,
+    along with the state and action it came from so a path is only built for the placements at the end.
+    the rotations of a shape that fill the same squares, like every rotation of the O peice, are one placement
+    :returns: the placements in the order they were found
+    """
+    shapes = peice.tetrimino.shapes
+    turner = peice.copy()
+    fits = {} # (x, y, rotation): whether the shape fits there
+    def check_fits(state: (int, int, int)) -> bool:
+        valid = fits.get(state)
+        if valid is None:
+            x, y, rotation = state
+            valid = fits[state] = board.check_valid_position(shapes[rotation], Point(x, y))
+        return valid
+
+    start = (peice.pos.x, peice.pos.y, peice.rotation)
+    visited = {start: (None, None, 0)} # state: (state it was reached from, action, presses to get there)
+    queue = deque([start])
+    found = {} # (x, y, rotation) the peice lands at: the state it was dropped from
+    while queue:
+        state = queue.popleft()
+        x, y, rotation = state
+        presses = visited[state][2] + 1
+        for action, dx, dy in MOVES:
+            moved = (x + dx, y + dy, rotation)
+            if moved not in visited and check_fits(moved):
+                visited[moved] = (state, action, presses)
+                queue.append(moved)
+        turner.rotation = rotation
+        for action, turn in TURNS:
+            turned, pos = turner.check_valid_rotate(board, Point(x, y), (rotation + turn) % 4)
+            if turned:
+                moved = (pos.x, pos.y, (rotation + turn) % 4)
+                fits[moved] = True
+                if moved not in visited:
+                    visited[moved] = (state, action, presses)
+                    queue.append(moved)
+        # fast dropping from here locks the peice at the bottom of this column.
+        # states come off the queue in order of presses so the first to reach a landing has the shortest path
+        landing = (x, board.get_landing_y(shapes[rotation], Point(x, y)), rotation)
+        if landing not in found:
+            found[landing] = state
+
+    placements = []
+    filled = set()
+    for (x, y, rotation), state in found.items():
+        squares = frozenset((x + cell_x, y + cell_y) for cell_x, cell_y, _ in shapes[rotation].cells)
+        if squares in filled:
+            continue
+        filled.add(squares)
+        path = [Action.FAST_DROP]
+        while visited[state][0] is not None:
+            state, action, _ = visited[state]
+            path.append(action)
+        placements.append(Placement(Point(x, y), rotation, tuple(reversed(path))))
+    return placements
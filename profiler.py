@@ -0,0 +1,93 @@
+"""Time how long each phase of a frame takes without slowing anything down when it is off"""
+
+import json
+from time import perf_counter
+from collections import deque
+
+
+class FrameProfiler:
+    """
+    Keeps the time spent in each phase of the last {self.frames.maxlen} frames
+    a phase is a method of some object. turning the profiler on puts a timed wrapper of each method on its object,
+    turning it off takes them away again, so nothing extra runs while it is off.
+    phases that call each other are timed inside each other, e.g. auto_drop includes lock_and_get_new_peice
+    """
+
+    def __init__(self, size: int = 600):
+        """
+        :size: Optional. defaults to 600. the number of frames kept, older ones are thrown out
+        """
+        self.frames = deque(maxlen = size) # {phase: milliseconds} of every frame
+        self.current = {}
+        self.phases = [] # (object, method name)
+        self.frame_method = None
+        self.enabled = False
+
+    def add(self, obj, *names: str):
+        """Time the methods called {names} of {obj}"""
+        for name in names:
+            self.phases.append((obj, name))
+            if self.enabled:
+                self.wrap(obj, name)
+
+    def add_frame(self, obj, name: str):
+        """Time the method that runs a whole frame. the phases are put into {self.frames} each time it returns"""
+        self.frame_method = (obj, name)
+        if self.enabled:
+            self.wrap(obj, name, True)
+
+    def enable(self):
+        if not self.enabled:
+            self.enabled = True
+            for obj, name in self.phases:
+                self.wrap(obj, name)
+            if self.frame_method:
+                self.wrap(*self.frame_method, True)
+
+    def disable(self):
+        if self.enabled:
+            self.enabled = False
+            for obj, name in self.phases + ([self.frame_method] if self.frame_method else []):
+                if name in vars(obj):
+                    delattr(obj, name)
+            self.current.clear()
+
+    def toggle(self):
+        self.disable() if self.enabled else self.enable()
+
+    def wrap(self, obj, name: str, is_frame: bool = False):
+        """Put a timed version of the method {name} on {obj}, hiding the method of its class"""
+        method = getattr(obj, name)
+        current = self.current
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                current[name] = current.get(name, 0) + (perf_counter() - start) * 1000
+                if is_frame:
+                    self.frames.append(dict(current))
+                    current.clear()
+        setattr(obj, name, timed)
+
+    def get_stats(self) -> {str: {str: float}}:
+        """
+        Get the p50, p99 and max time in milliseconds of every phase over the kept frames
+        frames where a phase didn't run count as 0 for it
+        """
+        stats = {}
+        names = [name for _, name in ([self.frame_method] if self.frame_method else []) + self.phases]
+        for name in names:
+            times = sorted(frame.get(name, 0) for frame in self.frames)
+            if times:
+                stats[name] = {
+                        'p50': times[len(times) // 2],
+                        'p99': times[min(len(times) - 1, len(times) * 99 // 100)],
+                        'max': times[-1],
+                        }
+        return stats
+
+    def dump(self, path: str):
+        """Write every kept frame and the stats to a json file"""
+        with open(path, 'w') as file:
+            json.dump({'stats': self.get_stats(), 'frames': list(self.frames)}, file, indent = 1)
@@ -1,491 +1,409 @@
 """PyTetris is a game that is made to to be a unoffical version of tetris made with pygame"""
 
-import pygame, sys, winsound
+import pygame, os, sys, time, argparse
 from pygame.locals import *
-from glob import glob
-from enum import Enum
-from copy import deepcopy
-from random import randrange
-from collections import namedtuple
-from pygame_tools import Point, Button, GameScreen, MenuScreen, clip_surface, ToggleButton, TrueEvery
-
-
-def new_matrix(width: int, height: int = None, value = None) -> [[]]:
-    """Create a 2d array with the passed width and height"""
-    return [[value for j in range(width)] for i in range(height if height else width)]
-
-# TODO: Deal with cell_size being needed everwhere <08-01-21, Shane McDonough>
-#   maybe put everything in one bigger class PyTetris?
-class Cell(Enum):
-    """Represents a square on the grid"""
-    EMPTY = None
-    Z = 0
-    L = 1
-    O = 2
-    S = 3
-    I = 4
-    J = 5
-    T = 6
-
-class Peice:
-    """Represents a tetris peice or tetrimino"""
-
-    def __init__(self, matrix: [[Cell]], board_size: Point, window_size: Point):
-        self.matrix = matrix
-        self.matrix_size = Point(len(matrix[0]), len(matrix))
-        self.board_size = board_size
-        self.window_size = window_size
-        self.reset()
-
-    def reset(self):
-        """resets the position of the Peice to the top"""
-        self.pos = Point(self.board_size.x // 2 - self.matrix_size.x // 2, 0)
+from pygame_tools import Point, Button, GameScreen, MenuScreen, ToggleButton, TrueEvery
+from engine import Cell, Peice, TetrisEngine, Action, Event, TETRIMINOS
+from board import Board
+from functools import cached_property
+from render_cache import SpriteCache, TextCache
+from replay import Replay
+from profiler import FrameProfiler
+from audio import get_audio
+from assets import Assets, SCALES, SCALE_READY, get_scale, get_neighbour_scales, scaled, scaled_rect
+from versus import Message, VersusClient
+from broadcast import Broadcaster, Viewer
+from controls import ACTION_NAMES, RESERVED_KEYS, InputBuffer, load_bindings, save_bindings, get_keys, rebind
+
+
+def get_cell_size(board_size: Point, area: Point, min_cell_size: int) -> int:
+    """
+    The biggest square cells that fit {board_size} into {area}
+    boards too tall to fit get cells {min_cell_size} big and only show some of their rows
+    """
+    return max(1, min(area.x // board_size.x, max(area.y // board_size.y, min_cell_size)))
 
-    def get_cell_type(self) -> Cell:
-        """Find the first cell in the matrix and return it"""
-        for row in self.matrix:
-            for cell in row:
-                if cell != Cell.EMPTY:
-                    return cell
-        return Cell.EMPTY
-
-    def get_surface(self, cells: [pygame.Surface], cell_size: Point) -> pygame.Surface:
-        """Get a surface witht the given tetris peice on it"""
-        # SRCALPHA allows the background to be transparent
-        result = pygame.Surface((self.matrix_size.x * cell_size.x, self.matrix_size.y * cell_size.y), flags = SRCALPHA)
-        result.fill((0, 0, 0, 0)) # set transparent
-        for i, row in enumerate(self.matrix):
-            for j, cell in enumerate(row):
-                if cell != Cell.EMPTY:
-                    result.blit(pygame.transform.scale(cells[cell.value], cell_size), (j * cell_size.x, i * cell_size.y))
-        return result
+def get_viewport_y(viewport_y: int, peice: Peice, board: Board, visible_rows: int, margin: int = 4) -> int:
+    """
+    Scroll a view {visible_rows} tall over {board} just far enough to keep {peice} and where it will land in view
+    when they don't both fit where it will land is kept in view
+    :viewport_y: the top row of the view before scrolling
+    :margin: Optional. defaults to 4. the rows kept in view above and below them
+    :returns: the top row of the view after scrolling
+    """
+    if visible_rows >= board.size.y:
+        return 0
+    top = peice.pos.y - margin
+    bottom = peice.get_fast_drop_pos(board).y + peice.matrix_size.y + margin
+    top = max(top, bottom - visible_rows)
+    viewport_y = min(max(viewport_y, bottom - visible_rows), top)
+    return max(0, min(viewport_y, board.size.y - visible_rows))
+
+# the size every screen is designed at. they are laid out at the biggest of {SCALES} times this that fits in the window
+DESIGN_SIZE = Point(600, 700)
+
+class PyTetrisScreen(MenuScreen):
+    """
+    A screen of the game laid out at {self.scale} times {DESIGN_SIZE} in the middle of the window
+    everything on it is placed by {self.layout}, which {MainMenu.resize} calls again whenever the window changes size
+    """
 
-    def draw(self, cells: [pygame.Surface], cell_size: Point, screen: pygame.Surface):
-        """Draw the peice onto the board"""
-        screen.blit(self.get_surface(cells, cell_size), (cell_size.x * self.pos.x, cell_size.y * self.pos.y))
-
-    def draw_shadow(self, shadows: [pygame.Surface], cell_size: Point, screen: pygame.Surface, board: [[Cell]]):
-        shadow_pos = self.get_fast_drop_pos(board)
-        shadow_surface = self.get_surface(shadows, cell_size)
-        shadow_surface.set_alpha(50)
-        screen.blit(shadow_surface, (cell_size.x * shadow_pos.x, cell_size.y * shadow_pos.y))
-
-    def fast_drop(self, board: [[Cell]]):
-        while self.move_down(board): pass
-
-    def get_fast_drop_pos(self, board: [[Cell]]) -> Point:
-        point = deepcopy(self.pos)
-        while self.check_valid_position(board, point):
-            point = Point(point.x, point.y + 1)
-        point = Point(point.x, point.y - 1)
-        return point
-
-    def move_down(self, board: [[Cell]]) -> bool:
-        """Move the tetris peice down"""
-        return self.move_to(board, Point(self.pos.x, self.pos.y + 1))
-
-    def move_left(self, board: [[Cell]]) -> bool:
-        """Move the tetris peice left"""
-        return self.move_to(board, Point(self.pos.x - 1, self.pos.y))
-
-    def move_right(self, board: [[Cell]]) -> bool:
-        """Move the tetris peice right"""
-        return self.move_to(board, Point(self.pos.x + 1, self.pos.y))
-
-    def move_to(self, board: [[Cell]], pos: Point) -> bool:
-        """Try to move to a new position"""
-        if valid := self.check_valid_position(board, pos):
-            self.pos = pos
-        return valid
-
-    def rotate_right(self, board: [[Cell]]) -> bool:
+    def __init__(self, display: pygame.Surface, scale: float, frame_rate: int = 30):
         """
-        Rotate a peice's matrix 90 degrees to the right
-        matrix can be any size as long and width and height are the same
-            ^^^^ make it work with other sizes
-        e.g.:
-            Matrix:
-                +--+--+--+--+      +--+--+--+--+
-                |00|01|02|03|      |30|20|10|00|
-                +--+--+--+--+      +--+--+--+--+
-                |10|11|12|13|      |31|21|11|01|
-                +--+--+--+--+ ---> +--+--+--+--+
-                |20|21|22|23|      |32|22|12|02|
-                +--+--+--+--+      +--+--+--+--+
-                |30|31|32|33|      |33|23|13|03|
-                +--+--+--+--+      +--+--+--+--+
-        :board: a 2d array of Cells the Peice cannot intersect with
-        :returns: boolean of success
+        :display: the surface of the whole window
+        :scale: the scale to lay the screen out at
         """
-        matrix = [[self.matrix[self.matrix_size.y - j - 1][i] for j in range(self.matrix_size.x)] for i in range(self.matrix_size.y)]
-        return self.rotate_to(board, matrix)
+        super().__init__(display, display.get_size(), frame_rate = frame_rate)
+        self.place(display, scale)
+
+    def place(self, display: pygame.Surface, scale: float):
+        """Make {self.screen} the part of {display} in the middle of it that the screen is laid out on at {scale}"""
+        self.display = display
+        self.scale = scale
+        self.real_screen = display
+        self.real_window_size = Point._make(display.get_size())
+        area = Rect((0, 0), (scaled(DESIGN_SIZE.x, scale), scaled(DESIGN_SIZE.y, scale)))
+        area.center = display.get_rect().center
+        area = area.clip(display.get_rect())
+        # a subsurface draws straight onto the display, so nothing is copied or scaled to the window each frame
+        self.screen = display.subsurface(area)
+        self.offset = Point(*area.topleft)
+        self.window_size = Point._make(area.size)
+        self.rect = self.screen.get_rect()
+
+    def set_window(self, display: pygame.Surface, scale: float):
+        """Move the screen onto {display} at {scale}. it is only laid out again when the scale changed"""
+        changed = scale != self.scale
+        self.place(display, scale)
+        if changed:
+            self.layout()
+
+    def layout(self):
+        """Place everything on the screen for {self.scale}"""
+
+    def handle_event(self, event: pygame.event.Event):
+        if event.type == VIDEORESIZE or event.type == SCALE_READY:
+            self.root.resize()
+        else:
+            super().handle_event(event)
 
-    def rotate_left(self, board: [[Cell]]):
-        """
-        Rotate a peice's matrix 90 degrees to the left
-        matrix can be any size as long and width and height are the same
-        e.g.:
-            Matrix:
-                +--+--+--+--+      +--+--+--+--+
-                |00|01|02|03|      |03|13|23|33|
-                +--+--+--+--+      +--+--+--+--+
-                |10|11|12|13|      |02|12|22|22|
-                +--+--+--+--+ ---> +--+--+--+--+
-                |20|21|22|23|      |01|11|21|31|
-                +--+--+--+--+      +--+--+--+--+
-                |30|31|32|33|      |00|10|20|30|
-                +--+--+--+--+      +--+--+--+--+
-        :board: a 2d array of Cells the Peice cannot intersect with
-        :returns: boolean of success
-        """
-        matrix = [[self.matrix[j][self.matrix_size.x - i - 1] for j in range(self.matrix_size.x)] for i in range(self.matrix_size.y)]
-        return self.rotate_to(board, matrix)
+    def key_down(self, event: pygame.event.Event):
+        if event.key == K_F11:
+            self.root.toggle_fullscreen()
+        else:
+            super().key_down(event)
 
-    #  TODO: Fix I peice edge case wall kick
-    def rotate_to(self, board: [[Cell]], matrix: [[Cell]]) -> bool:
-        """
-        attempts to rotate the peice to the passed matrix
-        :matrix: Optional. defaults to {self.matrix}. peice represented in a 2d array of type Cell
-        :returns: boolean of success
-        """
-        rotated, pos = self.check_valid_rotate(board, peice_matrix = matrix)
-        if rotated:
-            self.pos = pos
-            self.matrix = matrix
-        return rotated
+    def mouse_button_down(self, event: pygame.event.Event):
+        """Press the button that was clicked, with the mouse moved by where the screen is in the window"""
+        if event.button == 1:
+            mouse_pos = Point(event.pos[0] - self.offset.x, event.pos[1] - self.offset.y)
+            for i, button in enumerate(self.buttons):
+                if button.rect.collidepoint(mouse_pos):
+                    self.button_index = i
+                    button()
 
-    def check_valid_rotate(self, board: [[Cell]], pos: Point = None, peice_matrix: [[Cell]] = None) -> (bool, Point):
-        """
-        Check if a rotated rotated position is ok and move it around slightly if it can
-        :board: a 2d array of Cells the Peice cannot intersect with
-        :pos: Optional. deaults to {self.pos}. the coordinates of the peice
-        :matrix: Optional. defaults to {self.matrix}. peice represented in a 2d array of type Cell
-        :returns: a boolean of succes and the point in ended up landing in if it succeeded
-        """
-        # TODO: EDGECASE WITH I PEICE NEEDING TO MOVE 2
-        if not peice_matrix:
-            peice_matrix = self.matrix
-        if not pos:
-            pos = self.pos
-        directions = [
-                Point(0, 0),
-                Point(0, 1),
-                Point(1, 1),
-                Point(-1, 1),
-                Point(1, 0),
-                Point(-1, 0),
-                Point(1, -1),
-                Point(-1, -1),
-                ]
-        for direction in directions:
-            shifted = Point(pos.x + direction.x, pos.y + direction.y)
-            if self.check_valid_position(board, shifted, peice_matrix):
-                return True, shifted
-        return False, None
-
-    def check_valid_position(self, board: [[Cell]], pos: Point = None, peice_matrix: [[Cell]] = None) -> bool:
-        """Check if the position passed is avaliale for the this object"""
-        if not peice_matrix:
-            peice_matrix = self.matrix
-        if not pos:
-            pos = self.pos
-        for i, row in enumerate(peice_matrix):
-            for j, cell in enumerate(row):
-                if cell != Cell.EMPTY and not (pos.x + j >= 0 and pos.x + j < self.board_size.x and pos.y + i < self.board_size.y and board[i + pos.y][j + pos.x] == Cell.EMPTY):
-                    return False
-        return True
-
-    def lock(self, board: [[Cell]]):
-        """Lock the peice in place on the board"""
-        for i, row in enumerate(self.matrix):
-            for j, cell in enumerate(row):
-                if cell != Cell.EMPTY:
-                    board[i + self.pos.y][j + self.pos.x] = cell
 
+# TODO: Deal with cell_size being needed everwhere <08-01-21, Shane McDonough>
+#   maybe put everything in one bigger class PyTetris?
 # TODO: Show queue, hold, and maybe grab_bag
-class PyTetrisGame(MenuScreen):
+class PyTetrisGame(PyTetrisScreen):
     """
     The pytetris game itself.
-    runs the game logic
+    draws a {TetrisEngine} and feeds it the keyboard through an {InputBuffer} with the bindings of the main menu
     """
 
-    SCORE_DICT = {
-            # TODO
-            }
-    LEVEL_FRAMES = { # 1 cell per {value} at level {key}
-            0: 48,
-            1: 43,
-            2: 38,
-            3: 33,
-            4: 28,
-            5: 23,
-            6: 18,
-            7: 13,
-            8: 8,
-            9: 6,
-            10: 5,
-            11: 5,
-            12: 5,
-            13: 4,
-            14: 4,
-            15: 4,
-            16: 3,
-            17: 3,
-            18: 3,
-            19: 2,
-            20: 2,
-            21: 2,
-            22: 2,
-            23: 2,
-            24: 2,
-            25: 2,
-            26: 2,
-            27: 2,
-            28: 2,
-            29: 1,
-            }
-    LEVEL_LINES = { # how many lines it takes to reach the next level
-            0: 10,
-            1: 20,
-            2: 30,
-            3: 40,
-            4: 50,
-            5: 60,
-            6: 70,
-            7: 80,
-            8: 90,
-            9: 100,
-            10: 100,
-            11: 100,
-            12: 100,
-            13: 100,
-            14: 100,
-            15: 100,
-            16: 110,
-            17: 120,
-            18: 130,
-            19: 140,
-            20: 150,
-            21: 160,
-            22: 170,
-            23: 180,
-            24: 190,
-            25: 200,
-            26: 200,
-            27: 200,
-            28: 200,
-            }
-    # TODO: check if this is actually true
-    SOFT_DROP_DELAY = 2 # 1 cell per 2 frames
-    DAS_INITIAL_DELAY = 16 # 1 cell per 16 frames; inital speed when holding button
-    DAS_REPEAT_DELAY = 6 # 1 cell per 6 frames; speed after first iteration of holding button
-    ARE_DELAY = 15 # time(frames) after a new peice is created where the peice cannot move
-
-    def __init__(self, parent: GameScreen):
-        super().__init__(parent.screen, parent.window_size, frame_rate = 60)
+    INPUT_POLL_INTERVAL = 0.001 # seconds between taking in key events while waiting for the next frame
+    MAX_STALL = 1 # seconds a fixed timestep can fall behind the clock before the steps it missed are skipped instead of played
+    # sizes are at the design size and multiplied by the scale the game is laid out at
+    BOARD_AREA = Point(300, 600) # the space the board is fit into
+    MIN_CELL_SIZE = 12 # taller boards scroll instead of getting smaller cells than this
+    OPPONENT_AREA = Point(100, 200)
+    MIN_OPPONENT_CELL_SIZE = 2
+    HOLD_SIZE = 120
+    PADDING = 10
+
+    def __init__(self, parent: GameScreen, dirty_rects: bool = False, record_dir: str = None, replay: Replay = None, profile: bool = False,
+            fixed_timestep: bool = False, versus: VersusClient = None, broadcaster: Broadcaster = None, viewer: Viewer = None, board_size: Point = Point(10, 20)):
+        """
+        :parent: the screen that opened the game
+        :dirty_rects: Optional. defaults to False. only redraw and update the parts of the screen that changed each frame
+        :record_dir: Optional. defaults to None. save a replay of every game into this directory
+        :replay: Optional. defaults to None. play this replay instead of reading the keyboard
+        :profile: Optional. defaults to False. start with the frame times being measured and shown. F3 turns this on and off
+        :fixed_timestep: Optional. defaults to False. step the game {self.frame_rate} times a second by the clock, skipping drawing when it falls behind
+        :versus: Optional. defaults to None. play against the opponent this client is connected to, with their board shown on the left
+        :broadcaster: Optional. defaults to None. stream the game to the spectators watching through this
+        :viewer: Optional. defaults to None. watch the game streamed to this instead of playing
+        :board_size: Optional. defaults to 10x20. the size of the board in cells. when watching the size comes from the game being watched
+        """
+        super().__init__(parent.display, parent.scale, frame_rate = 60)
         self.parent = parent
-        self.font_path = self.parent.font_path
-        self.pause_button_font = pygame.font.Font(self.font_path, 15)
-        self.pause_button_rect = Rect(10, 10, 100, 50)
-        self.board_size = Point(10, 20)
-        self.board = new_matrix(self.board_size.x, self.board_size.y, Cell.EMPTY)
-        self.board_surface_size = Point(300, 600) # work in multiples of 10s and 20s or the bord gets wonky
-        self.board_surface = pygame.Surface(self.board_surface_size, flags = SRCALPHA)
-        self.cell_size = Point(self.board_surface_size.x // self.board_size.x, self.board_surface_size.y // self.board_size.y)
-        board_center = self.board_surface.get_rect().center
-        self.board_surface_pos = Point(self.rect.center[0] - board_center[0], self.rect.center[1] - board_center[1])
-        self.hold_rect = Rect(self.board_surface_pos.x + self.board_surface_size.x + 15, 50, 120, 120)
+        self.root = parent.root
+        self.use_dirty_rects = dirty_rects
+        self.record_dir = record_dir
+        self.replay = replay
+        self.fixed_timestep = fixed_timestep
+        self.versus = versus
+        self.broadcaster = broadcaster
+        self.viewer = viewer
+        self.next_step_time = None
+        self.frame_start = None
+        self.dropped_frames = 0 # frames stepped without being drawn to keep up with the clock
+        self.skipped_steps = 0 # steps thrown away after a stall
+        self.input = InputBuffer(self.root.bindings)
+        self.assets = self.parent.assets
+        self.engine = self.viewer.engine if self.viewer else TetrisEngine(board_size)
+        self.sprites = SpriteCache()
+        # the opponent's tiles are a different size, and sharing a cache with them would clear it every frame
+        self.opponent_sprites = SpriteCache()
+        self.audio = self.parent.audio
+        self.line_clear_sounds = sorted(name for name in self.audio.sounds if name.startswith('clear_'))
+        self.profiler = FrameProfiler()
+        self.profiler.add_frame(self, 'update')
+        self.profiler.add(self, 'keyboard_input', 'draw', 'draw_board', 'draw_hold', 'draw_queue', 'draw_statistics', 'handle_events')
+        self.profiler.add(self.engine, 'step', 'auto_drop', 'lock_and_get_new_peice')
+        self.profiler_font = pygame.font.Font(None, 16)
+        self.profiler_refresh = TrueEvery(30)
+        self.profiler_lines = []
+        self.layout()
+        self.reset()
+        if profile:
+            self.profiler.enable()
+
+    def place(self, display: pygame.Surface, scale: float):
+        super().place(display, scale)
+        self.full_redraw = True
+
+    @classmethod
+    def get_cell_sizes(cls, board_size: Point, scale: float) -> [Point]:
+        """
+        The size of the cells on the board, in the hold, in the queue and on the opponent's board when laid out at {scale}
+        :returns: [board, hold, queue, opponent]
+        """
+        board = get_cell_size(board_size, Point(scaled(cls.BOARD_AREA.x, scale), scaled(cls.BOARD_AREA.y, scale)), scaled(cls.MIN_CELL_SIZE, scale))
+        hold = (scaled(cls.HOLD_SIZE, scale) - scaled(cls.PADDING, scale) * 2) // 4
+        queue = (scaled(cls.HOLD_SIZE, scale) - scaled(cls.PADDING, scale) * 3) // 4
+        opponent = get_cell_size(board_size, Point(scaled(cls.OPPONENT_AREA.x, scale), scaled(cls.OPPONENT_AREA.y, scale)), cls.MIN_OPPONENT_CELL_SIZE)
+        return [Point(size, size) for size in (board, hold, queue, opponent)]
+
+    def layout(self):
+        """Place the board, hold, queue and statistics for {self.scale}"""
+        scale = self.scale
+        self.pause_button_font = self.assets.cached_font(scaled(15, scale))
+        self.pause_button_rect = scaled_rect(10, 10, 100, 50, scale)
+        self.buttons = [
+                Button(self.pause, 'Pause', self.pause_button_rect, self.pause_button_font, highlight_color = None)
+                ]
+        self.board_area = Rect((0, 0), (scaled(self.BOARD_AREA.x, scale), scaled(self.BOARD_AREA.y, scale)))
+        self.board_area.center = self.rect.center
+        self.hold_rect = Rect(self.board_area.right + scaled(15, scale), scaled(50, scale), scaled(self.HOLD_SIZE, scale), scaled(self.HOLD_SIZE, scale))
         self.hold_surface = pygame.Surface(self.hold_rect.size)
-        self.hold_padding = Point(10, 10)
-        self.hold_cell_size = Point((self.hold_rect.w - self.hold_padding.x * 2) // 4, (self.hold_rect.h - self.hold_padding.y * 2) // 4)
-        self.hold_text = pygame.font.Font(self.font_path, 30).render('Hold', True, (255, 255, 255))
+        self.hold_padding = Point(scaled(self.PADDING, scale), scaled(self.PADDING, scale))
+        self.hold_text = self.assets.font(scaled(30, scale)).render('Hold', True, (255, 255, 255))
         self.hold_text_rect = self.hold_text.get_rect()
         self.hold_text_rect.topleft = Point(self.hold_rect.centerx - self.hold_text_rect.centerx, self.hold_rect.y - self.hold_text_rect.h - self.hold_padding.y)
-        self.queue_rect = Rect(self.hold_rect.x + 5, self.hold_rect.y + self.hold_rect.h + 40, self.hold_rect.w - 10, 400)
+        self.queue_rect = Rect(self.hold_rect.x + scaled(5, scale), self.hold_rect.y + self.hold_rect.h + scaled(40, scale), self.hold_rect.w - scaled(10, scale), scaled(400, scale))
         self.queue_surface = pygame.Surface(self.queue_rect.size)
-        self.queue_padding = Point(10, 10)
-        self.queue_cell_size = Point((self.queue_rect.w - self.queue_padding.x * 2) // 4, (self.queue_rect.w - self.queue_padding.x * 2) // 4)
-        self.queue_text = pygame.font.Font(self.font_path, 20).render('Queue', True, (255, 255, 255))
+        self.queue_padding = Point(scaled(self.PADDING, scale), scaled(self.PADDING, scale))
+        self.queue_text = self.assets.font(scaled(20, scale)).render('Queue', True, (255, 255, 255))
         self.queue_text_rect = self.queue_text.get_rect()
         self.queue_text_rect.topleft = Point(self.queue_rect.centerx - self.queue_text_rect.centerx, self.queue_rect.y - self.queue_text_rect.h - self.queue_padding.y)
-        self.statistics_font_size = 12
-        self.statistics_font = pygame.font.Font(self.font_path, self.statistics_font_size)
-        self.statistics_padding = Point(10, 10 + self.pause_button_rect.bottom)
-        self.peices = [
-                Peice(
-                    [
-                        [Cell.O, Cell.O],
-                        [Cell.O, Cell.O],
-                        ],
-                    self.board_size,
-                    self.window_size
-                    ),
-                Peice(
-                    [
-                        [Cell.EMPTY, Cell.T, Cell.EMPTY],
-                        [Cell.T, Cell.T, Cell.T],
-                        [Cell.EMPTY, Cell.EMPTY, Cell.EMPTY],
-                        ],
-                    self.board_size,
-                    self.window_size
-                    ),
-                Peice(
-                    [
-                        [Cell.EMPTY, Cell.L, Cell.EMPTY],
-                        [Cell.EMPTY, Cell.L, Cell.EMPTY],
-                        [Cell.EMPTY, Cell.L, Cell.L],
-                        ],
-                    self.board_size,
-                    self.window_size
-                    ),
-                Peice(
-                    [
-                        [Cell.EMPTY, Cell.J, Cell.EMPTY],
-                        [Cell.EMPTY, Cell.J, Cell.EMPTY],
-                        [Cell.J, Cell.J, Cell.EMPTY],
-                        ],
-                    self.board_size,
-                    self.window_size
-                    ),
-                Peice(
-                    [
-                        [Cell.EMPTY, Cell.EMPTY, Cell.EMPTY, Cell.EMPTY],
-                        [Cell.I, Cell.I, Cell.I, Cell.I],
-                        [Cell.EMPTY, Cell.EMPTY, Cell.EMPTY, Cell.EMPTY],
-                        [Cell.EMPTY, Cell.EMPTY, Cell.EMPTY, Cell.EMPTY],
-                        ],
-                    self.board_size,
-                    self.window_size
-                    ),
-                Peice(
-                    [
-                        [Cell.Z, Cell.Z, Cell.EMPTY],
-                        [Cell.EMPTY, Cell.Z, Cell.Z],
-                        [Cell.EMPTY, Cell.EMPTY, Cell.EMPTY],
-                        ],
-                    self.board_size,
-                    self.window_size
-                    ),
-                Peice(
-                    [
-                        [Cell.EMPTY, Cell.S, Cell.S],
-                        [Cell.S, Cell.S, Cell.EMPTY],
-                        [Cell.EMPTY, Cell.EMPTY, Cell.EMPTY],
-                        ],
-                    self.board_size,
-                    self.window_size
-                    ),
-                ]
-        self.num_of_peices = len(self.peices)
-        self.cells = self.load_cells_from_image('assets/images/peices.png')
-        self.queue_size = 7 # arbitrary number
-        self.reset()
-        self.pause_menu = PauseMenu(self)
-        self.buttons = [
-                Button(self.pause_menu.run, 'Pause', self.pause_button_rect, self.pause_button_font, highlight_color = None)
-                ]
-        self.line_clear_sound_paths = glob('assets/audio/clear_*.wav')
-
-    def clear_lines(self) -> int:
+        self.statistics_font_size = scaled(12, scale)
+        self.statistics_font = self.assets.cached_font(self.statistics_font_size)
+        self.statistics_line_height = scaled(5, scale) + self.statistics_font_size
+        self.statistics_padding = Point(scaled(10, scale), scaled(10, scale) + self.pause_button_rect.bottom)
+        self.statistics_rect = Rect(self.statistics_padding, (self.board_area.x - self.statistics_padding.x - 2, self.statistics_line_height * 9))
+        self.statistics_surface = pygame.Surface(self.statistics_rect.size, flags = SRCALPHA)
+        self.statistics_key = None
+        self.opponent_text_rect = Rect(0, self.statistics_rect.bottom + scaled(20, scale), self.board_area.x - 2, scaled(20, scale))
+        self.profiler_rect = Rect(5, self.statistics_rect.bottom + 10, self.board_area.x - 10, 14 * (len(self.profiler.phases) * 2 + 7))
+        self.set_board_size(self.engine.board_size)
+        self.full_redraw = True
+
+    def set_board_size(self, board_size: Point):
         """
-        Clear the complete lines from the board
-        :returns: number of lines cleared
+        Lay the board out for {board_size}, with square cells as big as fit in {self.board_area}
+        a board too tall to fit is drawn through a viewport of {self.visible_rows} rows that scrolls with the player,
+        so the surfaces and the cost of drawing them only grow with what is on screen
         """
-        lines = 0
-        for i, row in enumerate(self.board):
-            for cell in row:
-                if cell == Cell.EMPTY:
-                    break
-            else:
-                # create clearing lines animations
-                self.cleared_indicies.append(i)
-                self.board.pop(i)
-                self.board.insert(0, [Cell.EMPTY for _ in range(self.board_size.x)])
-                lines += 1
-        return lines
-
-    def get_from_queue(self):
-        self.queue.append(self.get_from_grab_bag())
-        return self.queue.pop(0)
+        self.board_size = board_size
+        self.cell_size, self.hold_cell_size, self.queue_cell_size, self.opponent_cell_size = self.get_cell_sizes(board_size, self.scale)
+        self.visible_rows = min(board_size.y, self.board_area.h // self.cell_size.y)
+        self.viewport_y = 0
+        self.board_surface_size = Point(self.cell_size.x * board_size.x, self.cell_size.y * self.visible_rows)
+        self.board_surface = pygame.Surface(self.board_surface_size)
+        self.board_surface_pos = Point(self.board_area.centerx - self.board_surface_size.x // 2, self.board_area.centery - self.board_surface_size.y // 2)
+        self.cells = self.load_cells_from_image('peices.png') + [self.get_garbage_cell(self.cell_size)]
+        self.board_background = self.get_board_background()
+        self.stack_layer = self.board_background.copy()
+        self.stack_layer_key = None
+        self.opponent_visible_rows = min(board_size.y, scaled(self.OPPONENT_AREA.y, self.scale) // self.opponent_cell_size.y)
+        self.opponent_viewport_y = 0
+        self.opponent_rect = Rect((0, 0), (self.opponent_cell_size.x * board_size.x, self.opponent_cell_size.y * self.opponent_visible_rows))
+        self.opponent_rect.midtop = (self.board_area.x // 2, self.opponent_text_rect.bottom + scaled(10, self.scale))
+        self.opponent_cells = self.load_cells_from_image('peices.png', self.opponent_cell_size) + [self.get_garbage_cell(self.opponent_cell_size)]
+
+    def update_viewport(self):
+        """Scroll the board to keep the player in view, redrawing all of it when it moves"""
+        viewport_y = get_viewport_y(self.viewport_y, self.engine.player, self.engine.board, self.visible_rows)
+        if viewport_y != self.viewport_y:
+            self.viewport_y = viewport_y
+            self.changed_regions.add('board')
+
+    @cached_property
+    def pause_menu(self) -> 'PauseMenu':
+        """The pause menu is only built the first time the game is paused"""
+        return PauseMenu(self)
 
     def reset(self):
-        self.score = 0
-        self.level = 0
-        self.can_swap_hold = True
-        self.hold = None
-        self.ARE_locked = False
-        self.no_pause = False
-        self.lines_cleared = 0
-        self.lines_cleared_since_level_up = 0
-        self.delay_counters = {
-                'ARE_lock': TrueEvery(self.ARE_DELAY, once = True, start_value = self.ARE_DELAY),
-                'soft_drop': TrueEvery(self.SOFT_DROP_DELAY, start_value = self.SOFT_DROP_DELAY),
-                'auto_drop': TrueEvery(self.LEVEL_FRAMES[self.level]),
-                'DAS_fast_drop': TrueEvery(self.DAS_REPEAT_DELAY, self.DAS_INITIAL_DELAY),
-                'DAS_move_left': TrueEvery(self.DAS_REPEAT_DELAY, self.DAS_INITIAL_DELAY),
-                'DAS_move_right': TrueEvery(self.DAS_REPEAT_DELAY, self.DAS_INITIAL_DELAY),
-                'DAS_rotate_left': TrueEvery(self.DAS_REPEAT_DELAY, self.DAS_INITIAL_DELAY),
-                'DAS_rotate_right': TrueEvery(self.DAS_REPEAT_DELAY, self.DAS_INITIAL_DELAY),
-                'clear_lines': TrueEvery(15, start_value = 15)
-                }
-        self.board = new_matrix(self.board_size.x, self.board_size.y, Cell.EMPTY)
-        self.queue = []
+        if self.versus:
+            self.engine.reset(self.versus.seed)
+        elif not self.viewer: # a game being watched is only reset by whoever is playing it
+            self.engine.reset(self.replay.seed if self.replay else None)
+        if self.broadcaster:
+            self.broadcaster.resync()
+        self.playback = iter(self.replay) if self.replay else None
+        # a versus game can't be recorded as the garbage from the opponent isn't in the replay
+        self.recording = Replay.from_engine(self.engine) if self.record_dir and not self.replay and not self.versus else None
+        self.pause_pressed = False
+        self.input.sync(pygame.key.get_pressed())
         self.cleared_indicies = []
-        for i in range(self.queue_size):
-            self.queue.append(self.get_from_grab_bag(i == 0))
-        self.player = self.get_from_queue()
+        self.clear_lines_animation = TrueEvery(15, start_value = 15)
+        self.full_redraw = True
+        self.changed_regions = set()
+        self.dirty_rects = []
+        self.player_rects = []
+
+    def restart(self):
+        """Start the game again. in a versus match that gives it up"""
+        if self.versus and self.versus.winner is None and not self.engine.game_over:
+            self.versus.send_game_over()
+        self.reset()
+
+    def pause(self):
+        """Open the pause menu and redraw everything when it closes"""
+        self.pause_menu.run()
+        self.input.sync(pygame.key.get_pressed()) # keys let go of while paused never reached the game
+        self.full_redraw = True
+        self.next_step_time = None # the time spent paused isn't time the game is behind
+        self.frame_start = None
 
     def exit(self):
+        self.save_recording()
         self.reset()
+        if self.versus:
+            self.versus.close()
         self.running = False
 
-    def get_from_grab_bag(self, new_bag: bool = False):
-        if new_bag or not hasattr(self, 'grab_bag') or not self.grab_bag:
-            self.grab_bag = deepcopy(self.peices)
-        return self.grab_bag.pop(randrange(len(self.grab_bag)))
-
     def draw(self):
-        """Draw Everything"""
+        """
+        Draw Everything
+        the parts of the screen that were drawn on are put in {self.dirty_rects}
+        """
+        self.dirty_rects = []
         if self.cleared_indicies == []:
-            self.screen.fill((0, 0, 0))
-            self.draw_board()
-            self.draw_hold()
-            self.draw_queue()
-            self.draw_statistics()
-            self.draw_buttons()
+            self.update_viewport()
+            if self.use_dirty_rects and not self.full_redraw:
+                self.draw_changed()
+            else:
+                self.draw_everything()
         else:
             for i in self.cleared_indicies:
+                if not 0 <= i - self.viewport_y < self.visible_rows:
+                    continue
                 surface = pygame.Surface((self.cell_size.x * self.board_size.x, self.cell_size.y))
                 surface.fill('white')
-                self.board_surface.blit(surface, (0, self.cell_size.y * i))
+                self.board_surface.blit(surface, (0, self.cell_size.y * (i - self.viewport_y)))
                 self.screen.blit(self.board_surface, self.board_surface_pos)
-            if self.delay_counters['clear_lines']():
+            self.dirty_rects.append(Rect(self.board_surface_pos, self.board_surface_size))
+            if self.clear_lines_animation():
                 self.cleared_indicies = []
+                self.full_redraw = True
+
+    def draw_everything(self):
+        """Clear the screen and draw every part of the game"""
+        self.screen.fill((0, 0, 0))
+        self.draw_board()
+        self.draw_hold()
+        self.draw_queue()
+        self.draw_statistics()
+        if self.versus:
+            self.draw_opponent()
+        self.draw_buttons()
+        self.dirty_rects = [self.rect]
+        self.full_redraw = False
+        self.changed_regions = set()
+        self.player_rects = self.get_player_rects()
+
+    def draw_changed(self):
+        """Only draw the regions in {self.changed_regions}"""
+        board_rect = Rect(self.board_surface_pos, self.board_surface_size)
+        if 'board' in self.changed_regions or 'player' in self.changed_regions:
+            self.draw_board()
+            player_rects = self.get_player_rects()
+            if 'board' in self.changed_regions:
+                self.dirty_rects.append(board_rect.inflate(2, 2))
+            else:
+                self.dirty_rects.extend(self.player_rects + player_rects)
+            self.player_rects = player_rects
+        for region, rects, draw in (('hold', (self.hold_rect, self.hold_text_rect), self.draw_hold), ('queue', (self.queue_rect, self.queue_text_rect), self.draw_queue)):
+            if region in self.changed_regions:
+                for rect in rects:
+                    self.screen.fill((0, 0, 0), rect)
+                draw()
+                self.dirty_rects.extend(rects)
+        if 'statistics' in self.changed_regions:
+            self.screen.fill((0, 0, 0), self.statistics_rect)
+            self.draw_statistics()
+            self.dirty_rects.append(self.statistics_rect)
+        if 'opponent' in self.changed_regions:
+            self.draw_opponent()
+            self.dirty_rects.extend((self.opponent_text_rect, self.opponent_rect.inflate(4, 4)))
+        self.draw_buttons()
+        self.dirty_rects.extend(button.rect for button in self.buttons)
+        self.changed_regions = set()
+
+    def get_player_rects(self) -> [Rect]:
+        """Get where the player and its shadow are on the screen"""
+        player = self.engine.player
+        board_rect = Rect(self.board_surface_pos, self.board_surface_size)
+        size = (player.matrix_size.x * self.cell_size.x, player.matrix_size.y * self.cell_size.y)
+        return [
+                Rect(self.board_surface_pos.x + pos.x * self.cell_size.x, self.board_surface_pos.y + (pos.y - self.viewport_y) * self.cell_size.y, *size).clip(board_rect)
+                for pos in (player.pos, player.get_fast_drop_pos(self.engine.board))
+                ]
 
     def draw_statistics(self):
         """
         Print the games statistics
         e.g. Score, level, etc
         """
-        i = 0
-        for (string, skip_line) in {
-            'Score:' : False,
-            f'{self.score}': True,
-            f'Level: {self.level}': True,
-            f'Cleared: {self.lines_cleared}' : True,
-            'Till next': False,
-            f'level: {self.LEVEL_LINES[self.level] - self.lines_cleared_since_level_up}': True,
-            }.items():
-            self.screen.blit(self.statistics_font.render(string, True, (255, 255, 255)), (self.statistics_padding.x, self.statistics_padding.y + (5 + self.statistics_font_size) * i))
-            i += 2 if skip_line else 1
+        key = (self.engine.score, self.engine.level, self.engine.lines_cleared, self.engine.lines_cleared_since_level_up)
+        if key != self.statistics_key:
+            # only render the text again when one of the values changed
+            self.statistics_key = key
+            self.statistics_surface.fill((0, 0, 0, 0))
+            i = 0
+            for (string, skip_line) in {
+                'Score:' : False,
+                f'{self.engine.score}': True,
+                f'Level: {self.engine.level}': True,
+                f'Cleared: {self.engine.lines_cleared}' : True,
+                'Till next': False,
+                f'level: {self.engine.LEVEL_LINES[self.engine.level] - self.engine.lines_cleared_since_level_up}': True,
+                }.items():
+                self.statistics_surface.blit(self.statistics_font.render(string, True, (255, 255, 255)), (0, self.statistics_line_height * i))
+                i += 2 if skip_line else 1
+        self.screen.blit(self.statistics_surface, self.statistics_rect)
 
     def draw_hold(self):
         """Draw the the hold and it's contents"""
         self.screen.blit(self.hold_text, self.hold_text_rect)
         self.hold_surface.fill((0, 0, 0))
-        if self.hold:
-            peice_surface = self.hold.get_surface(self.cells, self.hold_cell_size)
-            self.hold_surface.blit(peice_surface, (self.hold_padding.x + self.hold_cell_size.x * (4 - self.hold.matrix_size.x) // 2, self.hold_padding.y + self.hold_cell_size.y * (4 - self.hold.matrix_size.x) // 2))
+        hold = self.engine.hold
+        if hold:
+            peice_surface = self.get_peice_surface(hold, self.cells, self.hold_cell_size)
+            self.hold_surface.blit(peice_surface, (self.hold_padding.x + self.hold_cell_size.x * (4 - hold.matrix_size.x) // 2, self.hold_padding.y + self.hold_cell_size.y * (4 - hold.matrix_size.x) // 2))
             self.screen.blit(self.hold_surface, self.hold_rect)
         pygame.draw.rect(self.screen, (100, 100, 100), self.hold_rect, 2)
 
@@ -493,28 +411,79 @@ class PyTetrisGame(MenuScreen):
         """Draw the the queue and it's contents"""
         self.screen.blit(self.queue_text, self.queue_text_rect)
         self.queue_surface.fill((0, 0, 0))
-        for i, peice in enumerate(self.queue):
-            self.queue_surface.blit(peice.get_surface(self.cells, self.queue_cell_size), (self.queue_padding.x + self.queue_cell_size.x * (4 - peice.matrix_size.x) // 2, self.queue_padding.y + self.queue_cell_size.y * (4 - peice.matrix_size.y) // 2 + (4 * self.queue_cell_size.y + self.queue_padding.y) * i))
+        for i, peice in enumerate(self.engine.queue):
+            self.queue_surface.blit(self.get_peice_surface(peice, self.cells, self.queue_cell_size), (self.queue_padding.x + self.queue_cell_size.x * (4 - peice.matrix_size.x) // 2, self.queue_padding.y + self.queue_cell_size.y * (4 - peice.matrix_size.y) // 2 + (4 * self.queue_cell_size.y + self.queue_padding.y) * i))
         self.screen.blit(self.queue_surface, self.queue_rect)
         pygame.draw.rect(self.screen, (100, 100, 100), self.queue_rect, 2)
 
-    def draw_board(self):
-        """Draw the the board and it's contents"""
+    def draw_opponent(self):
+        """Draw the opponent's board from {self.versus} small, with how the match is going above it"""
+        versus = self.versus
+        if not versus.started.is_set():
+            text = 'Waiting...'
+        elif versus.winner is not None:
+            text = 'You win' if versus.winner == versus.index else 'You lose'
+        elif not versus.connected:
+            text = 'Disconnected'
+        else:
+            text = 'Opponent'
+        self.screen.fill((0, 0, 0), self.opponent_text_rect)
+        text_surface = self.statistics_font.render(text, True, (255, 255, 255))
+        self.screen.blit(text_surface, text_surface.get_rect(center = self.opponent_text_rect.center))
+        self.screen.fill((0, 0, 0), self.opponent_rect)
+        opponent = versus.opponent
+        if opponent.board_size != self.board_size:
+            # the match is on the opponent's size of board and {self.wait_for_opponent} hasn't changed to it yet
+            opponent = None
+        elif opponent.player:
+            self.opponent_viewport_y = get_viewport_y(self.opponent_viewport_y, opponent.player, opponent.board, self.opponent_visible_rows)
+        for y in range(self.opponent_visible_rows if opponent else 0):
+            for x, cell in enumerate(opponent.board[self.opponent_viewport_y + y]):
+                if cell != Cell.EMPTY:
+                    self.screen.blit(self.opponent_cells[cell.value], (self.opponent_rect.x + x * self.opponent_cell_size.x, self.opponent_rect.y + y * self.opponent_cell_size.y))
+        if opponent and opponent.player:
+            self.screen.set_clip(self.opponent_rect)
+            self.screen.blit(self.opponent_sprites.get(opponent.player, self.opponent_cells, self.opponent_cell_size),
+                    (self.opponent_rect.x + opponent.player.pos.x * self.opponent_cell_size.x, self.opponent_rect.y + (opponent.player.pos.y - self.opponent_viewport_y) * self.opponent_cell_size.y))
+            self.screen.set_clip(None)
+        pygame.draw.rect(self.screen, (100, 100, 100), self.opponent_rect.inflate(4, 4), 2)
+
+    def get_board_background(self) -> pygame.Surface:
+        """Draw the visible part of the empty board with its lines. This never changes so it is only drawn once"""
         # make board a black screen
-        self.board_surface.fill((0, 0, 0))
-        # draw board lines
+        background = pygame.Surface(self.board_surface_size)
+        background.fill((0, 0, 0))
+        # draw board lines, thinner on small cells and not at all when they would cover them
+        if self.cell_size.x < 6:
+            return background
+        width = 2 if self.cell_size.x >= 16 else 1
         for i in range(1, self.board_size.x):
-            pygame.draw.line(self.board_surface, (100, 100, 100), (i * self.cell_size.x - 1, 0), (i * self.cell_size.x - 1, self.board_surface_size.y), 2)
-        for i in range(1, self.board_size.y):
-            pygame.draw.line(self.board_surface, (100, 100, 100), (0, i * self.cell_size.y - 1), (self.board_surface_size.y, i * self.cell_size.y - 1), 2)
-        # draw the contents of the board
-        for i, row in enumerate(self.board):
-            for j, cell in enumerate(row):
+            pygame.draw.line(background, (100, 100, 100), (i * self.cell_size.x - 1, 0), (i * self.cell_size.x - 1, self.board_surface_size.y), width)
+        for i in range(1, self.visible_rows):
+            pygame.draw.line(background, (100, 100, 100), (0, i * self.cell_size.y - 1), (self.board_surface_size.x, i * self.cell_size.y - 1), width)
+        return background
+
+    def update_stack_layer(self):
+        """Redraw the locked peices in the viewport on top of the background, but only if the board changed or scrolled since last time"""
+        board = self.engine.board
+        key = (id(board), board.version, self.viewport_y)
+        if self.stack_layer_key == key:
+            return
+        self.stack_layer_key = key
+        self.stack_layer.blit(self.board_background, (0, 0))
+        for i in range(self.visible_rows):
+            for j, cell in enumerate(board[self.viewport_y + i]):
                 if cell != Cell.EMPTY:
-                    self.board_surface.blit(self.cells[cell.value], (j * self.cell_size.x, i * self.cell_size.y))
+                    self.stack_layer.blit(self.cells[cell.value], (j * self.cell_size.x, i * self.cell_size.y))
+
+    def draw_board(self):
+        """Draw the the board and it's contents"""
+        # draw the empty board and the locked peices
+        self.update_stack_layer()
+        self.board_surface.blit(self.stack_layer, (0, 0))
         # draw the player on the board
-        self.player.draw_shadow(self.cells, self.cell_size, self.board_surface, self.board)
-        self.player.draw(self.cells, self.cell_size, self.board_surface)
+        self.draw_shadow(self.engine.player, self.cells, self.cell_size, self.board_surface)
+        self.draw_peice(self.engine.player, self.cells, self.cell_size, self.board_surface)
         # draw board to the screen
         self.screen.blit(self.board_surface, self.board_surface_pos)
         # draw border around board
@@ -523,121 +492,269 @@ class PyTetrisGame(MenuScreen):
     def draw_board_border(self):
         pygame.draw.rect(self.screen, (100, 100, 100), (self.board_surface_pos, self.board_surface_size), 2)
 
-    def load_cells_from_image(self, file_name: str) -> [pygame.Surface]:
-        """Split an image into 7 surfaces to be used as tiles"""
-        image = pygame.image.load(file_name)
-        image_size = Point._make(image.get_size())
-        cell_size = Point(image_size.x // self.num_of_peices, image_size.y)
-        return [pygame.transform.scale(clip_surface(image, Rect((x, 0), cell_size)), self.cell_size) for x in range(0, image_size.x, cell_size.x)]
-
-    def swap_hold(self):
-        """"Swap the current peice with the peice in self.hold"""
-        if self.can_swap_hold:
-            self.can_swap_hold = False
-            if not self.hold:
-                self.hold = self.get_from_queue()
-            temp = self.hold
-            self.hold = self.player
-            self.player = temp
-            self.player.reset()
+    def get_peice_surface(self, peice: Peice, cells: [pygame.Surface], cell_size: Point, alpha: int = None) -> pygame.Surface:
+        """Get a surface witht the given tetris peice on it. the surface is cached so don't draw on it"""
+        return self.sprites.get(peice, cells, cell_size, alpha)
+
+    def draw_peice(self, peice: Peice, cells: [pygame.Surface], cell_size: Point, screen: pygame.Surface):
+        """Draw the peice onto the board"""
+        screen.blit(self.get_peice_surface(peice, cells, cell_size), (cell_size.x * peice.pos.x, cell_size.y * (peice.pos.y - self.viewport_y)))
+
+    def draw_shadow(self, peice: Peice, shadows: [pygame.Surface], cell_size: Point, screen: pygame.Surface):
+        shadow_pos = peice.get_fast_drop_pos(self.engine.board)
+        shadow_surface = self.get_peice_surface(peice, shadows, cell_size, alpha = 50)
+        screen.blit(shadow_surface, (cell_size.x * shadow_pos.x, cell_size.y * (shadow_pos.y - self.viewport_y)))
+
+    def load_cells_from_image(self, file_name: str, cell_size: Point = None) -> [pygame.Surface]:
+        """
+        Split an image from the images folder into 7 surfaces to be used as tiles
+        :cell_size: Optional. defaults to {self.cell_size}. the size of each tile
+        """
+        return self.assets.get_cells(file_name, self.engine.num_of_peices, cell_size or self.cell_size, self.scale)
+
+    def get_garbage_cell(self, cell_size: Point) -> pygame.Surface:
+        """The gray tile that garbage rows are drawn with"""
+        cell = pygame.Surface(cell_size)
+        cell.fill((110, 110, 110))
+        pygame.draw.rect(cell, (70, 70, 70), cell.get_rect(), max(1, cell_size.x // 10))
+        return cell
 
     def update(self):
         self.draw()
-        if self.delay_counters['ARE_lock']():
-            self.ARE_locked = False
-        self.keyboard_input()
-        self.auto_drop()
-
-    def calculate_score(self, lines: int):
-        if lines == 0:
-            return 0
-        elif lines == 1:
-            return 40 * (self.level + 1)
-        elif lines == 2:
-            return 100 * (self.level + 1)
-        elif lines == 3:
-            return 300 * (self.level + 1)
-        elif lines == 4:
-            return 1200 * (self.level + 1)
-
-    def level_up(self):
-        self.level += 1
-        self.lines_cleared_since_level_up = 0
-        self.delay_counters['auto_drop'].count = self.LEVEL_FRAMES[self.level]
-        winsound.PlaySound('assets/audio/level_up.wav', winsound.SND_ASYNC)
-
-    def lock_and_get_new_peice(self):
-        """Lock {self.player} in place and get a new peice from the queue"""
-        self.player.lock(self.board)
-        self.player = self.get_from_queue()
-        lines = self.clear_lines()
-        self.score += self.calculate_score(lines)
-        self.lines_cleared += lines
-        self.lines_cleared_since_level_up += lines
-        if lines != 0:
-            winsound.PlaySound(self.line_clear_sound_paths[lines - 1], winsound.SND_ASYNC)
-        if self.level != 29 and self.lines_cleared_since_level_up >= self.LEVEL_LINES[self.level]:
-            self.level_up()
-        self.can_swap_hold = True
-        self.delay_counters['ARE_lock'].reset()
-        self.ARE_locked = True
-
-    def auto_drop(self):
-        """Move the peice down one and lock if it cannot go farther down"""
-        if self.delay_counters['auto_drop']() and not self.ARE_locked:
-            if not self.player.move_down(self.board):
-                self.lock_and_get_new_peice()
+        if self.profiler.enabled:
+            self.draw_profiler()
+        self.step()
+
+    def step(self):
+        """Run one frame of the game without drawing it"""
+        actions = self.keyboard_input()
+        if self.viewer:
+            events = self.viewer.poll()
+            if self.viewer.resynced:
+                self.viewer.resynced = False
+                self.full_redraw = True
+                if self.engine.board_size != self.board_size:
+                    self.set_board_size(self.engine.board_size)
+            self.handle_events(events)
+            return
+        if self.playback:
+            actions = next(self.playback, None)
+            if actions is None:
+                return # the replay is over so the game stays how it ended
+        elif self.recording and not self.engine.game_over:
+            self.recording.record(actions)
+        if self.versus and self.versus.winner is not None:
+            events = self.engine.end_game() # the match is over so the game stays how it ended
+        else:
+            events = self.engine.step(actions)
+        self.handle_events(events)
+        if self.versus:
+            self.sync_versus(events)
+        if self.broadcaster:
+            self.broadcaster.publish(self.engine, events)
+
+    # events that change where the player is
+    MOVE_EVENTS = {Event.MOVE, Event.ROTATE, Event.SPAWN, Event.HOLD}
+
+    def sync_versus(self, events: [Event]):
+        """Send the opponent what happened during the last step, and take in what they sent"""
+        versus = self.versus
+        moved = False
+        for event in events:
+            if event == Event.LOCK:
+                versus.send_lock(self.engine.last_locked)
+            elif event == Event.ATTACK:
+                versus.send_attack(self.engine.last_attack)
+            elif event == Event.GARBAGE:
+                versus.send_garbage(*self.engine.last_garbage)
+            elif event == Event.GAME_OVER:
+                versus.send_game_over()
+            elif event in self.MOVE_EVENTS:
+                moved = True
+        if moved:
+            # one move a frame is enough to show where the peice is
+            versus.send_move(self.engine.player)
+        for message, values in versus.poll():
+            if message == Message.ATTACK:
+                self.engine.receive_garbage(values[0])
+            else:
+                self.changed_regions.add('opponent')
+
+    def wait_for_opponent(self):
+        """Keep the window responding until the server has found an opponent, then start the game"""
+        self.draw_everything()
+        pygame.display.update()
+        while self.running and not self.versus.started.wait(1 / self.frame_rate):
+            for event in pygame.event.get():
+                self.handle_event(event)
+        if self.versus.board_size != self.engine.board_size:
+            # the opponent connected first so the match is on their size of board
+            self.engine.board_size = self.versus.board_size
+            self.set_board_size(self.versus.board_size)
+            self.full_redraw = True
+        self.engine.reset(self.versus.seed)
+
+    def save_recording(self):
+        """Save the replay of the game being played into {self.record_dir}"""
+        if self.recording and self.recording.frames:
+            self.recording.finish(self.engine)
+            os.makedirs(self.record_dir, exist_ok = True)
+            self.recording.save(os.path.join(self.record_dir, f'{time.strftime("%Y%m%d-%H%M%S")}-{self.engine.seed}.replay'))
+        self.recording = None
+
+    EVENT_REGIONS = { # the parts of the screen that have to be redrawn after each event
+            Event.MOVE: {'player'},
+            Event.ROTATE: {'player'},
+            Event.SPAWN: {'player', 'queue'},
+            Event.HOLD: {'player', 'hold', 'queue'},
+            Event.LOCK: {'board', 'statistics'},
+            Event.LINE_CLEAR: {'board', 'statistics'},
+            Event.LEVEL_UP: {'statistics'},
+            Event.GAME_OVER: set(),
+            Event.ATTACK: set(),
+            Event.GARBAGE: {'board', 'player'},
+            }
+
+    def handle_events(self, events: [Event]):
+        """React to what happened inside the engine during the last step"""
+        for event in events:
+            self.changed_regions |= self.EVENT_REGIONS[event]
+            if event == Event.LINE_CLEAR:
+                # create clearing lines animations
+                self.cleared_indicies.extend(self.engine.last_cleared)
+                if self.line_clear_sounds:
+                    self.audio.play(self.line_clear_sounds[min(len(self.engine.last_cleared), len(self.line_clear_sounds)) - 1])
+            elif event == Event.LEVEL_UP:
+                self.audio.play('level_up')
+            elif event == Event.GAME_OVER:
+                self.save_recording()
 
     def key_up(self, event: pygame.event.Event):
         """This is triggered when a key is released"""
-        if event.key == K_ESCAPE or event.key == K_p:
-            self.no_pause = False
+        self.input.record(event)
 
     def key_down(self, event: pygame.event.Event):
-        """This function doesn't let K_SPACE into the inherited key_down function"""
-        if event.key != K_SPACE:
+        """The keys bound to actions go to {self.input} and don't get into the inherited key_down function"""
+        if self.input.record(event):
+            return
+        if event.key == K_ESCAPE or event.key == K_p:
+            self.pause_pressed = True
+        elif event.key == K_F3:
+            self.profiler.toggle()
+            self.full_redraw = True
+        elif event.key == K_F4:
+            self.profiler.dump(f'frame_times-{time.strftime("%Y%m%d-%H%M%S")}.json')
+        elif event.key != K_SPACE:
             super().key_down(event)
 
-    def keyboard_input(self):
-        """Use pygame.key.get_pressed for input instead of keyboard events"""
-        keys = pygame.key.get_pressed()
-        if (keys[K_ESCAPE] or keys[K_p]) and not self.no_pause:
-            self.no_pause = True
-            self.pause_menu.run()
-        if not self.ARE_locked:
-            if self.delay_counters['soft_drop'].run_or_reset(keys[K_s]):
-                self.player.move_down(self.board)
-                self.delay_counters['auto_drop'].reset()
-            if self.delay_counters['DAS_fast_drop'].run_or_reset(keys[K_w]):
-                self.player.fast_drop(self.board)
-                self.lock_and_get_new_peice()
-            if self.delay_counters['DAS_move_left'].run_or_reset(keys[K_a]):
-                self.player.move_left(self.board)
-            if self.delay_counters['DAS_move_right'].run_or_reset(keys[K_d]):
-                self.player.move_right(self.board)
-            if self.delay_counters['DAS_rotate_left'].run_or_reset(keys[K_q]):
-                self.player.rotate_left(self.board)
-            if self.delay_counters['DAS_rotate_right'].run_or_reset(keys[K_e]):
-                self.player.rotate_right(self.board)
-        if keys[K_SPACE]:
-            self.swap_hold()
-
-class OptionsMenu(MenuScreen):
+    def draw_profiler(self):
+        """Draw the p50, p99 and max milliseconds of each phase of a frame from {self.profiler}"""
+        if self.profiler_refresh():
+            self.profiler_lines = ['ms      p50    p99    max']
+            for name, stats in self.profiler.get_stats().items():
+                self.profiler_lines += [name, f'    {stats["p50"]:6.2f} {stats["p99"]:6.2f} {stats["max"]:6.2f}']
+            latency = self.input.get_latency_stats()
+            if latency:
+                self.profiler_lines += ['input latency', f'    {latency["p50"]:6.2f} {latency["p99"]:6.2f} {latency["max"]:6.2f}']
+            self.profiler_lines += [f'dropped frames {self.dropped_frames}', f'skipped steps {self.skipped_steps}']
+        self.screen.fill((0, 0, 0), self.profiler_rect)
+        for i, line in enumerate(self.profiler_lines):
+            text = self.profiler_font.render(line, True, (200, 200, 200))
+            self.screen.blit(text, (self.profiler_rect.x, self.profiler_rect.y + i * 14), Rect((0, 0), self.profiler_rect.size))
+        self.dirty_rects.append(self.profiler_rect)
+
+    def run(self):
+        """Run the main loop, only updating {self.dirty_rects} of the display when they are being used"""
+        self.running = True
+        if self.versus and not self.versus.started.is_set():
+            self.wait_for_opponent()
+        self.full_redraw = True
+        self.next_step_time = None
+        self.frame_start = None
+        while self.running:
+            for event in pygame.event.get():
+                self.handle_event(event)
+            if self.fixed_timestep:
+                if not self.catch_up():
+                    continue
+            self.update()
+            if self.use_dirty_rects:
+                pygame.display.update([rect.move(self.offset) for rect in self.dirty_rects])
+            else:
+                pygame.display.update()
+            if not self.fixed_timestep:
+                self.wait_for_next_frame()
+
+    def wait_for_next_frame(self):
+        """Wait out the rest of the frame like {self.tick}, taking in key presses while waiting so they are timed when they happened"""
+        if self.frame_start is not None:
+            self.wait_until(self.frame_start + 1 / self.frame_rate)
+        self.frame_start = time.perf_counter()
+
+    def wait_until(self, end: float):
+        """Sleep until {end} on the perf_counter clock, handling key events every {self.INPUT_POLL_INTERVAL} seconds"""
+        while self.running and (left := end - time.perf_counter()) > 0:
+            time.sleep(min(left, self.INPUT_POLL_INTERVAL))
+            for event in pygame.event.get((KEYDOWN, KEYUP)):
+                self.handle_event(event)
+
+    def catch_up(self) -> bool:
+        """
+        Keep the game stepping {self.frame_rate} times a second by the clock instead of once per drawn frame
+        every step that is due is played, the ones before the last are stepped here without being drawn and counted in {self.dropped_frames}.
+        after a stall of more than {self.MAX_STALL} seconds, e.g. a breakpoint or the computer sleeping, the steps missed are
+        counted in {self.skipped_steps} and thrown away instead of all falling in one burst. when the next step isn't due yet this waits for it
+        :returns: True when the next frame should be drawn and stepped by {self.update}
+        """
+        now = time.perf_counter()
+        if self.next_step_time is None:
+            self.next_step_time = now
+        if now < self.next_step_time:
+            self.wait_until(self.next_step_time)
+            return False
+        step_time = 1 / self.frame_rate
+        if now - self.next_step_time > self.MAX_STALL:
+            skipped = int((now - self.next_step_time) / step_time)
+            self.skipped_steps += skipped
+            self.next_step_time += skipped * step_time
+        self.next_step_time += step_time
+        while self.running and self.next_step_time is not None and now >= self.next_step_time:
+            self.step()
+            self.dropped_frames += 1
+            self.next_step_time += step_time
+        return self.running
+
+    def keyboard_input(self) -> Action:
+        """
+        Take the key presses since the last step from {self.input}, and pause if that was pressed
+        :returns: the actions for {self.engine} during this step
+        """
+        if self.pause_pressed:
+            self.pause_pressed = False
+            self.pause()
+        return self.input.get_actions()
+
+class OptionsMenu(PyTetrisScreen):
     """The options menu for the pytetris game"""
     # TODO: Add real options
     # TODO: Finish this
 
     def __init__(self, parent: GameScreen):
-        super().__init__(parent.screen, parent.window_size, frame_rate = 10)
+        super().__init__(parent.display, parent.scale, frame_rate = 10)
         self.parent = parent
-        self.font_path = parent.font_path
-        font = pygame.font.Font(self.font_path, 30)
-        back_button_font = pygame.font.Font(self.font_path, 15)
+        self.root = parent.root
+        self.shadow_button = ToggleButton(None, 'Shadow On', 'Shadow Off', None, None, on_font_color = (50, 200, 50), off_font_color = (200, 50, 50))
+        self.layout()
+        self.button_index = 1
+
+    def layout(self):
+        back_button_font = self.parent.assets.cached_font(scaled(15, self.scale))
+        self.shadow_button.rect = scaled_rect(100, 100, 300, 100, self.scale)
+        self.shadow_button.font = self.parent.assets.cached_font(scaled(30, self.scale))
         self.buttons = [
-                Button(self.back, 'Back', Rect(10, 10, 100, 50), back_button_font, highlight_color = None),
-                ToggleButton(None, 'Shadow On', 'Shadow Off', Rect(100, 100, 300, 100), font, on_font_color = (50, 200, 50), off_font_color = (200, 50, 50)),
+                Button(self.back, 'Back', scaled_rect(10, 10, 100, 50, self.scale), back_button_font, highlight_color = None),
+                self.shadow_button,
                 ]
-        self.button_index = 1
 
     def update(self):
         self.screen.fill((0, 50, 100))
@@ -646,59 +763,120 @@ class OptionsMenu(MenuScreen):
     def back(self):
         self.running = False
 
-class ControlsMenu(MenuScreen):
-    # TODO: Add ability for user to remap controls
-    # TODO: Finish this
+class ControlsMenu(PyTetrisScreen):
+    """
+    Shows the key of every action and lets it be remapped
+    pressing an action's button waits for the next key to bind to it, escape cancels.
+    the bindings are the main menu's so the game picks them up straight away, and they are saved each time one changes
+    """
 
     def __init__(self, parent: GameScreen):
-        super().__init__(parent.screen, parent.window_size)
+        super().__init__(parent.display, parent.scale)
         self.parent = parent
-        self.font_path = parent.font_path
-        self.background = pygame.image.load('assets/images/controls_background.png')
-        back_button_font = pygame.font.Font(self.font_path, 15)
+        self.root = parent.root
+        self.rebinding = None # the action waiting for a key
+        self.layout()
+
+    def layout(self):
+        scale = self.scale
+        assets = self.parent.assets
+        self.title = assets.font(scaled(40, scale)).render('Controls', True, (255, 255, 255))
+        self.title_pos = Point(scaled(300, scale) - self.title.get_width() // 2, scaled(20, scale))
+        self.reserved_text = assets.font(scaled(12, scale)).render('P or Esc pause   F11 fullscreen', True, (150, 150, 150))
+        self.reserved_pos = Point(scaled(300, scale) - self.reserved_text.get_width() // 2, scaled(665, scale))
+        back_button_font = assets.cached_font(scaled(15, scale))
+        action_font = assets.cached_font(scaled(20, scale))
         self.buttons = [
-                Button(self.back, 'Back', Rect(10, 10, 100, 50), back_button_font, highlight_color = None)
+                Button(self.back, 'Back', scaled_rect(10, 10, 100, 50, scale), back_button_font, highlight_color = None)
+                ] + [
+                Button(lambda action = action: self.start_rebinding(action), '', scaled_rect(100, 90 + i * 80, 400, 65, scale), action_font)
+                for i, action in enumerate(ACTION_NAMES)
                 ]
+        self.update_button_text()
+
+    def update_button_text(self):
+        for button, (action, name) in zip(self.buttons[1:], ACTION_NAMES.items()):
+            if action == self.rebinding:
+                button.text = f'{name}: press a key'
+            else:
+                keys = get_keys(self.root.bindings, action)
+                button.text = f'{name}: {" ".join(pygame.key.name(key).upper() for key in keys) or "none"}'
+
+    def start_rebinding(self, action: Action):
+        self.rebinding = action
+        self.update_button_text()
+
+    def key_down(self, event: pygame.event.Event):
+        """While an action is waiting for a key every key goes to it instead of moving around the menu"""
+        if self.rebinding is None:
+            super().key_down(event)
+            return
+        if event.key in RESERVED_KEYS and event.key != K_ESCAPE:
+            return
+        if event.key != K_ESCAPE:
+            rebind(self.root.bindings, event.key, self.rebinding)
+            self.root.save_bindings()
+        self.rebinding = None
+        self.update_button_text()
 
     def update(self):
-        self.screen.blit(self.background, (0, 0))
+        self.screen.fill((0, 0, 0))
+        self.screen.blit(self.title, self.title_pos)
+        self.screen.blit(self.reserved_text, self.reserved_pos)
         super().update()
 
     def back(self):
+        self.rebinding = None
+        self.update_button_text()
         self.running = False
 
-class PauseMenu(MenuScreen):
+class PauseMenu(PyTetrisScreen):
     # TODO: Finish this
 
     def __init__(self, parent: GameScreen):
-        super().__init__(parent.screen, parent.window_size)
+        super().__init__(parent.display, parent.scale)
         self.parent = parent
-        self.font_path = parent.font_path
-        self.board_rect = Rect(parent.board_surface_pos, parent.board_surface_size)
-        exit_button_font = parent.pause_button_font
-        exit_button_rect = parent.pause_button_rect
-        self.title = pygame.font.Font(self.font_path, 40).render('Paused', True, (255, 255, 255))
-        self.title_padding = Point(20, 20)
+        self.root = parent.root
+        self.layout()
+
+    def layout(self):
+        """Place the title and buttons over the board of {self.parent}, which has to be laid out first"""
+        scale = self.scale
+        self.board_rect = self.parent.board_area
+        exit_button_font = self.parent.pause_button_font
+        exit_button_rect = self.parent.pause_button_rect
+        self.title = self.parent.assets.font(scaled(40, scale)).render('Paused', True, (255, 255, 255))
+        self.background = None
+        self.title_padding = Point(scaled(20, scale), scaled(20, scale))
         self.title_rect = Rect((0, 0), self.title.get_size())
         self.title_rect.center = self.board_rect.centerx, self.board_rect.top + self.title_padding.y + self.title_rect.h
-        center_buttons_padding = Point(40, 40)
-        center_buttons_size = Point(self.board_rect.w - center_buttons_padding.x * 2, 60)
+        center_buttons_padding = Point(scaled(40, scale), scaled(40, scale))
+        center_buttons_size = Point(self.board_rect.w - center_buttons_padding.x * 2, scaled(60, scale))
         center_buttons_pos = Point(self.board_rect.centerx - center_buttons_size.x // 2, self.board_rect.top + center_buttons_padding.y + self.title_padding.y * 2 + self.title_rect.h)
         i = 0
         self.buttons = [
                 Button(self.resume, 'Resume', Rect(center_buttons_pos, center_buttons_size), exit_button_font),
                 Button(self.restart, 'Reset', Rect((center_buttons_pos.x, center_buttons_pos.y + (center_buttons_size.y + center_buttons_padding.y) * (i := i + 1)), center_buttons_size), exit_button_font),
-                Button(self.parent.parent.options_menu.run, 'Options', Rect((center_buttons_pos.x, center_buttons_pos.y + (center_buttons_size.y + center_buttons_padding.y) * (i := i + 1)), center_buttons_size), exit_button_font),
-                Button(self.parent.parent.controls_menu.run, 'Controls', Rect((center_buttons_pos.x, center_buttons_pos.y + (center_buttons_size.y + center_buttons_padding.y) * (i := i + 1)), center_buttons_size), exit_button_font),
+                Button(lambda: self.parent.parent.options_menu.run(), 'Options', Rect((center_buttons_pos.x, center_buttons_pos.y + (center_buttons_size.y + center_buttons_padding.y) * (i := i + 1)), center_buttons_size), exit_button_font),
+                Button(lambda: self.parent.parent.controls_menu.run(), 'Controls', Rect((center_buttons_pos.x, center_buttons_pos.y + (center_buttons_size.y + center_buttons_padding.y) * (i := i + 1)), center_buttons_size), exit_button_font),
                 Button(self.exit, 'Exit', exit_button_rect, exit_button_font),
                 ]
 
+    def run(self):
+        """Run the pause menu. The game under it is drawn once when the menu is opened"""
+        self.background = None
+        super().run()
+
     def update(self):
-        self.screen.fill((0, 0, 0))
-        self.parent.draw()
-        self.screen.fill((0, 0, 0), self.board_rect)
-        self.parent.draw_board_border()
-        self.screen.blit(self.title, self.title_rect)
+        if self.background:
+            self.screen.blit(self.background, (0, 0))
+        else:
+            self.screen.fill((0, 0, 0))
+            self.parent.draw_everything()
+            self.screen.fill((0, 0, 0), self.board_rect)
+            self.parent.draw_board_border()
+            self.screen.blit(self.title, self.title_rect)
+            self.background = self.screen.copy()
         super().update()
 
     def key_down(self, event: pygame.event.Event):
@@ -711,46 +889,201 @@ class PauseMenu(MenuScreen):
 
     def restart(self):
         self.running = False
-        self.parent.reset()
+        self.parent.restart()
 
     def exit(self):
         self.running = False
         self.parent.exit()
 
 
-class MainMenu(MenuScreen):
-    """The main menu of the pytetris game"""
+class MainMenu(PyTetrisScreen):
+    """
+    The main menu of the pytetris game
+    it is the root of every other screen, and lays them all out again when the window changes size
+    """
+
+    # the images every screen is drawn with, that are built for the scales next to the one in use before a resize needs them
+    SCALED_IMAGES = ['menu_background.png', 'Title.png']
+    # where the bindings from the controls menu are kept, next to the game so it is the same file wherever it is started from
+    BINDINGS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'controls.json')
 
-    def __init__(self, screen: pygame.Surface, window_size: Point):
-        super().__init__(screen, window_size, frame_rate = 10)
+    def __init__(self, screen: pygame.Surface, window_size: Point, dirty_rects: bool = False, record_dir: str = None, replay: Replay = None,
+            profile: bool = False, fixed_timestep: bool = False, versus: VersusClient = None, broadcaster: Broadcaster = None, viewer: Viewer = None,
+            board_size: Point = Point(10, 20)):
+        """
+        :screen: the surface of the whole window. make it with pygame.RESIZABLE for the window to be resizable
+        :dirty_rects: Optional. defaults to False. passed on to {PyTetrisGame}
+        :record_dir: Optional. defaults to None. passed on to {PyTetrisGame}
+        :replay: Optional. defaults to None. passed on to {PyTetrisGame}
+        :profile: Optional. defaults to False. passed on to {PyTetrisGame}
+        :fixed_timestep: Optional. defaults to False. passed on to {PyTetrisGame}
+        :versus: Optional. defaults to None. passed on to {PyTetrisGame}
+        :broadcaster: Optional. defaults to None. passed on to {PyTetrisGame}
+        :viewer: Optional. defaults to None. passed on to {PyTetrisGame}
+        :board_size: Optional. defaults to 10x20. passed on to {PyTetrisGame}
+        """
+        super().__init__(screen, get_scale(Point._make(window_size), DESIGN_SIZE), frame_rate = 10)
+        self.root = self
+        self.windowed_size = self.real_window_size
+        self.fullscreen = False
         # lucidaconsole, lucidasans, agencyfb, copperplategothic, dubairegualar
         # font = pygame.font.SysFont('lucidaconsole', 60)
-        self.font_path = 'assets/fonts/tetris-atari.ttf'
-        font = pygame.font.Font(self.font_path, 30)
-        self.options_menu = OptionsMenu(self)
-        self.controls_menu = ControlsMenu(self)
-        self.game = PyTetrisGame(self)
+        self.text_cache = TextCache()
+        self.assets = Assets(text_cache = self.text_cache)
+        self.audio = get_audio()
+        self.game_options = (dirty_rects, record_dir, replay, profile, fixed_timestep, versus, broadcaster, viewer, board_size)
+        self.bindings = load_bindings(self.BINDINGS_FILE)
+        self.layout()
+        # the scales next to this one are built in the background so resizing to them never waits
+        for scale in get_neighbour_scales(self.scale) + [SCALES[0]]:
+            self.prescale(scale)
+
+    def layout(self):
+        scale = self.scale
+        font = self.assets.cached_font(scaled(30, scale))
+        # the other screens are built when they are first opened so the menu comes up quicker
         self.buttons = [
-            Button(self.game.run, 'Play', Rect(40, 190, 260, 100), font, border_size = 2),
-            Button(self.controls_menu.run, 'Controls', Rect(40, 300, 260, 100), font, border_size = 2),
-            Button(self.options_menu.run, 'Options', Rect(40, 410, 260, 100), font, border_size = 2),
-            Button(sys.exit, 'Quit', Rect(40, 520, 260, 100), font, border_size = 2),
+            Button(lambda: self.game.run(), 'Play', scaled_rect(40, 190, 260, 100, scale), font, border_size = 2),
+            Button(lambda: self.controls_menu.run(), 'Controls', scaled_rect(40, 300, 260, 100, scale), font, border_size = 2),
+            Button(lambda: self.options_menu.run(), 'Options', scaled_rect(40, 410, 260, 100, scale), font, border_size = 2),
+            Button(sys.exit, 'Quit', scaled_rect(40, 520, 260, 100, scale), font, border_size = 2),
             ]
         # TODO: Create acutally good background / title <07-01-21, ShaneMcDonough>
-        self.background = pygame.image.load('assets/images/menu_background.png')
+        self.background = self.assets.scaled_image('menu_background.png', scale)
         self.background_rect = self.background.get_rect()
         self.background_rect.y = self.window_size.y - self.background_rect.h
-        self.title = pygame.image.load('assets/images/Title.png')
+        self.title = self.assets.scaled_image('Title.png', scale)
+        self.title_pos = Point(scaled(50, scale), scaled(50, scale))
+
+    def prescale(self, scale: float):
+        """Build the images and cell tiles every screen needs at {scale} in the background"""
+        board_size = self.game.board_size if 'game' in self.__dict__ else self.game_options[-1]
+        cells = [('peices.png', len(TETRIMINOS), cell_size) for cell_size in PyTetrisGame.get_cell_sizes(board_size, scale)]
+        self.assets.prescale(scale, self.SCALED_IMAGES, cells)
+
+    def get_screens(self) -> [PyTetrisScreen]:
+        """Every screen that has been opened so far"""
+        screens = [self] + [self.__dict__[name] for name in ('game', 'options_menu', 'controls_menu') if name in self.__dict__]
+        if 'game' in self.__dict__ and 'pause_menu' in self.game.__dict__:
+            screens.append(self.game.pause_menu)
+        return screens
+
+    def resize(self):
+        """
+        Lay every screen out again for the size the window is now
+        if the scale that fits isn't built yet the biggest built one that fits is used until it is,
+        so resizing never waits on scaling images
+        """
+        display = pygame.display.get_surface()
+        wanted = get_scale(Point._make(display.get_size()), DESIGN_SIZE)
+        if wanted in self.assets.ready_scales:
+            scale = wanted
+        elif self.scale <= wanted:
+            scale = self.scale # the screens only have to be moved to the middle of the window until it is built
+        else:
+            scale = max((scale for scale in self.assets.ready_scales if scale <= wanted), default = SCALES[0])
+        for neighbour in [wanted] + get_neighbour_scales(wanted):
+            if neighbour not in self.assets.ready_scales:
+                self.prescale(neighbour)
+        self.assets.keep_scales({scale, wanted, SCALES[0], *get_neighbour_scales(wanted)})
+        if scale == self.scale and display.get_size() == self.real_window_size:
+            return
+        display.fill((0, 0, 0))
+        for screen in self.get_screens():
+            screen.set_window(display, scale)
+        pygame.display.update()
+
+    def toggle_fullscreen(self):
+        """Switch between a resizable window and filling the whole display"""
+        self.fullscreen = not self.fullscreen
+        if self.fullscreen:
+            self.windowed_size = self.real_window_size
+            pygame.display.set_mode((0, 0), FULLSCREEN)
+        else:
+            pygame.display.set_mode(self.windowed_size, RESIZABLE)
+        self.resize()
+
+    def save_bindings(self):
+        try:
+            save_bindings(self.bindings, self.BINDINGS_FILE)
+        except OSError:
+            pass # the new bindings still work until the game is closed
+
+    @cached_property
+    def game(self) -> PyTetrisGame:
+        return PyTetrisGame(self, *self.game_options)
+
+    @cached_property
+    def options_menu(self) -> OptionsMenu:
+        return OptionsMenu(self)
+
+    @cached_property
+    def controls_menu(self) -> ControlsMenu:
+        return ControlsMenu(self)
 
     def update(self):
         self.screen.fill((0, 0, 0))
         self.screen.blit(self.background, self.background_rect)
-        self.screen.blit(self.title, (50, 50))
+        self.screen.blit(self.title, self.title_pos)
         super().update()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = __doc__)
+    parser.add_argument('--dirty-rects', action = 'store_true', help = 'only redraw the parts of the game screen that change')
+    parser.add_argument('--record', metavar = 'DIR', help = 'save a replay of every game into DIR')
+    parser.add_argument('--replay', metavar = 'FILE', help = 'watch a replay instead of playing')
+    parser.add_argument('--fixed-timestep', action = 'store_true', help = 'keep the game at full speed by skipping drawing on slow computers')
+    parser.add_argument('--profile', action = 'store_true', help = 'show how long each part of a frame takes. F3 toggles it and F4 saves it')
+    parser.add_argument('--versus', metavar = 'HOST:PORT', help = 'play against someone else on a versus.py server')
+    parser.add_argument('--broadcast', metavar = 'PORT', type = int, help = 'let spectators watch the game on PORT')
+    parser.add_argument('--watch', metavar = 'HOST:PORT', help = 'watch a game being broadcast instead of playing')
+    parser.add_argument('--board-size', metavar = 'WxH', default = '10x20', help = 'the size of the board in cells. defaults to 10x20')
+    parser.add_argument('--fullscreen', action = 'store_true', help = 'start filling the whole display. F11 switches between it and a window')
+    args = parser.parse_args()
+    try:
+        width, height = (int(size) for size in args.board_size.lower().split('x'))
+    except ValueError:
+        parser.error(f'--board-size should be WxH, not {args.board_size}')
+    board_size = Point(width, height)
+    if board_size.x < 4 or board_size.y < 4:
+        parser.error('--board-size has to be at least 4x4 to fit every peice')
+    replay = None
+    if args.replay:
+        try:
+            replay = Replay.load(args.replay)
+        except (OSError, ValueError) as error:
+            parser.error(f"can't load {args.replay}: {error}")
+        board_size = replay.board_size
+    versus = None
+    if args.versus:
+        host, _, port = args.versus.rpartition(':')
+        versus = VersusClient(host or 'localhost', int(port), board_size)
+        try:
+            versus.connect()
+        except OSError as error:
+            parser.error(f"can't connect to {args.versus}: {error}")
+    broadcaster = None
+    if args.broadcast is not None:
+        broadcaster = Broadcaster(port = args.broadcast)
+        try:
+            broadcaster.start()
+        except OSError as error:
+            parser.error(f"can't broadcast on port {args.broadcast}: {error}")
+    viewer = None
+    if args.watch:
+        host, _, port = args.watch.rpartition(':')
+        viewer = Viewer(host or 'localhost', int(port), board_size)
+        try:
+            viewer.connect()
+        except OSError as error:
+            parser.error(f"can't connect to {args.watch}: {error}")
+    pygame.mixer.pre_init(buffer = 512) # a small buffer so sounds start right away
     pygame.init()
-    size = Point(600, 700)
-    screen = pygame.display.set_mode(size)
-    menu = MainMenu(screen, size)
-    menu.run()
+    screen = pygame.display.set_mode(DESIGN_SIZE, RESIZABLE)
+    menu = MainMenu(screen, DESIGN_SIZE, args.dirty_rects, args.record, replay, args.profile, args.fixed_timestep, versus, broadcaster, viewer, board_size)
+    if args.fullscreen:
+        menu.toggle_fullscreen()
+    if replay or versus or viewer:
+        menu.game.run()
+    else:
+        menu.run()
@@ -0,0 +1,116 @@
+"""Caches for surfaces that are expensive to build but rarely change"""
+
+import pygame
+from pygame.locals import *
+from collections import OrderedDict
+from pygame_tools import Point
+from engine import Peice
+
+
+class SpriteCache:
+    """
+    Keeps the surface of every peice that has been drawn so it only has to be built once
+    surfaces are keyed by (Cell, rotation, cell size, alpha).
+    the least recently used surface is thrown out when there are more than {self.max_size}
+    """
+
+    def __init__(self, max_size: int = 128):
+        """
+        :max_size: Optional. defaults to 128. the most surfaces that are kept at once
+        """
+        self.max_size = max_size
+        self.cells = None
+        self.surfaces = OrderedDict()
+
+    def clear(self):
+        """Throw out every surface. Use this when the tiles or sizes they were built with change"""
+        self.surfaces.clear()
+
+    def get(self, peice: Peice, cells: [pygame.Surface], cell_size: Point, alpha: int = None) -> pygame.Surface:
+        """
+        Get a surface with the given tetris peice on it
+        the surface is shared so it must not be drawn on
+        :cells: the tiles of each Cell. the cache is cleared if these are not the tiles it was last used with
+        :alpha: Optional. defaults to None. the alpha of the whole surface
+        """
+        if cells is not self.cells:
+            self.clear()
+            self.cells = cells
+        key = (peice.get_cell_type(), peice.rotation, tuple(cell_size), alpha)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            return surface
+        surface = self.surfaces[key] = self.build(peice, cells, cell_size, alpha)
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last = False)
+        return surface
+
+    def build(self, peice: Peice, cells: [pygame.Surface], cell_size: Point, alpha: int = None) -> pygame.Surface:
+        """Draw a new surface for {self.get}"""
+        # SRCALPHA allows the background to be transparent
+        result = pygame.Surface((peice.matrix_size.x * cell_size.x, peice.matrix_size.y * cell_size.y), flags = SRCALPHA)
+        result.fill((0, 0, 0, 0)) # set transparent
+        tile = cells[peice.get_cell_type().value]
+        if tile.get_size() != tuple(cell_size):
+            tile = pygame.transform.scale(tile, cell_size)
+        for x, y, _ in peice.shape.cells:
+            result.blit(tile, (x * cell_size.x, y * cell_size.y))
+        if alpha is not None:
+            result.set_alpha(alpha)
+        return result
+
+class TextCache:
+    """
+    Keeps rendered text so the same string is only rendered once
+    surfaces are keyed by (font, text, antialias, color, background).
+    the least recently used surface is thrown out when there are more than {self.max_size}
+    """
+
+    def __init__(self, max_size: int = 256):
+        """
+        :max_size: Optional. defaults to 256. the most surfaces that are kept at once
+        """
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+
+    def clear(self):
+        """Throw out every surface"""
+        self.surfaces.clear()
+
+    def render(self, font: pygame.font.Font, text: str, antialias: bool, color: Color, background: Color = None) -> pygame.Surface:
+        """
+        The same as {font.render} but cached
+        the surface is shared so it must not be drawn on
+        """
+        key = (font, text, antialias, self.get_color_key(color), self.get_color_key(background))
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            return surface
+        surface = self.surfaces[key] = font.render(text, antialias, color, background)
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last = False)
+        return surface
+
+    @staticmethod
+    def get_color_key(color: Color):
+        """pygame.Color can't be hashed so it is turned into a tuple"""
+        return tuple(color) if isinstance(color, Color) else color
+
+class CachedFont:
+    """
+    Wraps a pygame.font.Font so that {self.render} goes through a TextCache
+    it can be passed anywhere a font is expected, like to a Button
+    """
+
+    def __init__(self, font: pygame.font.Font, cache: TextCache):
+        self.font = font
+        self.cache = cache
+
+    def render(self, text: str, antialias: bool, color: Color, background: Color = None) -> pygame.Surface:
+        return self.cache.render(self.font, text, antialias, color, background)
+
+    def __getattr__(self, name: str):
+        """Everything else is passed on to the font"""
+        return getattr(self.font, name)
@@ -0,0 +1,161 @@
+"""
+Record games as their seed and the input of every frame so they can be played again exactly
+a replay file is a header followed by runs of frames with the same input:
+    header: {Replay.HEADER} of magic, version, seed, board width, board height, frames, score, lines and board digest
+    runs: one byte of Action flags, then the number of frames they were held for as a varint
+checking replays headless, e.g.:
+    python replay.py replays/*.replay
+"""
+
+import sys, time, zlib, struct, argparse
+from pygame_tools import Point
+from engine import TetrisEngine, Action
+from board import Board, BitBoard
+
+
+def get_board_digest(board: Board) -> int:
+    """A checksum of every square on {board} that comes out the same for every kind of board"""
+    return zlib.crc32(board.to_bytes())
+
+class Replay:
+    """
+    The inputs of one game
+    the engine only depends on its seed and what is pressed each frame,
+    so stepping a new engine through {self.runs} plays out the same game
+    """
+
+    MAGIC = b'PTRP'
+    # 2 fixed the L and J kicks and 3 fixed gravity after a soft drop, so games recorded before them can play out differently
+    VERSION = 3
+    HEADER = struct.Struct('<4sBQHHIIII')
+
+    def __init__(self, seed: int, board_size: Point = Point(10, 20)):
+        """
+        :seed: the seed of the game's grab bag
+        :board_size: Optional. defaults to 10x20. the size of the board in cells
+        """
+        self.seed = seed
+        self.board_size = board_size
+        self.runs = [] # [Action flags, frames held]
+        self.frames = 0
+        self.score = 0
+        self.lines = 0
+        self.board_digest = 0
+
+    @classmethod
+    def from_engine(cls, engine: TetrisEngine) -> 'Replay':
+        """Start recording the game {engine} was just reset to"""
+        return cls(engine.seed, engine.board_size)
+
+    def record(self, actions: Action):
+        """Add the actions held down during the next frame"""
+        if self.runs and self.runs[-1][0] == actions:
+            self.runs[-1][1] += 1
+        else:
+            self.runs.append([int(actions), 1])
+        self.frames += 1
+
+    def finish(self, engine: TetrisEngine):
+        """Keep how the recorded game ended so playing it again can be checked against it"""
+        self.score = engine.score
+        self.lines = engine.lines_cleared
+        self.board_digest = get_board_digest(engine.board)
+
+    def __iter__(self):
+        """The actions of every frame in order"""
+        for actions, frames in self.runs:
+            actions = Action(actions)
+            for _ in range(frames):
+                yield actions
+
+    def play(self, board_type: type = BitBoard) -> TetrisEngine:
+        """
+        Play the whole game headless as fast as possible
+        :board_type: Optional. defaults to BitBoard. every kind of board plays the same game
+        :returns: the engine at the end of the game
+        """
+        engine = TetrisEngine(self.board_size, board_type = board_type, seed = self.seed)
+        step = engine.step
+        for actions in self:
+            step(actions)
+        return engine
+
+    def verify(self, board_type: type = BitBoard) -> bool:
+        """Check that playing the game again ends with the same score, lines and board as it was recorded with"""
+        engine = self.play(board_type)
+        return (engine.score, engine.lines_cleared, get_board_digest(engine.board)) == (self.score, self.lines, self.board_digest)
+
+    def to_bytes(self) -> bytes:
+        data = bytearray(self.HEADER.pack(self.MAGIC, self.VERSION, self.seed, self.board_size.x, self.board_size.y,
+                self.frames, self.score, self.lines, self.board_digest))
+        for actions, frames in self.runs:
+            data.append(actions)
+            while frames >= 0x80:
+                data.append(frames & 0x7f | 0x80)
+                frames >>= 7
+            data.append(frames)
+        return bytes(data)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'Replay':
+        if len(data) < cls.HEADER.size:
+            raise ValueError('replay is too short to have a header')
+        magic, version, seed, width, height, frames, score, lines, board_digest = cls.HEADER.unpack_from(data)
+        if magic != cls.MAGIC:
+            raise ValueError('not a pytetris replay')
+        if version != cls.VERSION:
+            raise ValueError(f'replay version {version} is not supported')
+        replay = cls(seed, Point(width, height))
+        replay.score = score
+        replay.lines = lines
+        replay.board_digest = board_digest
+        i = cls.HEADER.size
+        try:
+            while i < len(data):
+                actions = data[i]
+                count = shift = 0
+                while True:
+                    i += 1
+                    count |= (data[i] & 0x7f) << shift
+                    shift += 7
+                    if data[i] < 0x80:
+                        break
+                i += 1
+                replay.runs.append([actions, count])
+                replay.frames += count
+        except IndexError:
+            raise ValueError('replay is cut off') from None
+        if replay.frames != frames:
+            raise ValueError(f'replay has {replay.frames} frames but the header says {frames}')
+        return replay
+
+    def save(self, path: str):
+        with open(path, 'wb') as file:
+            file.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path: str) -> 'Replay':
+        with open(path, 'rb') as file:
+            return cls.from_bytes(file.read())
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('replays', nargs = '+', help = 'replay files to check')
+    args = parser.parse_args()
+    failed = 0
+    start = time.perf_counter()
+    frames = 0
+    for path in args.replays:
+        try:
+            replay = Replay.load(path)
+        except (OSError, ValueError) as error:
+            print(f'{path}: {error}')
+            failed += 1
+            continue
+        ok = replay.verify()
+        failed += not ok
+        frames += replay.frames
+        print(f'{path}: {"ok" if ok else "MISMATCH"} score {replay.score} lines {replay.lines} frames {replay.frames}')
+    seconds = time.perf_counter() - start
+    print(f'{len(args.replays) - failed}/{len(args.replays)} replays verified, {frames / seconds:.0f} frames per second', file = sys.stderr)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,86 @@
+import numpy as np
+from random import Random
+from pygame_tools import Point
+from engine import TETRIMINOS, TetrisEngine, GrabBag, Action
+from board import BitBoard
+from batch import BatchEngine, BatchAction
+from movegen import Placement, find_placements
+from harness import balanced
+
+ACTIONS = {
+        Action.NONE: BatchAction.NONE,
+        Action.MOVE_LEFT: BatchAction.MOVE_LEFT,
+        Action.MOVE_RIGHT: BatchAction.MOVE_RIGHT,
+        Action.ROTATE_LEFT: BatchAction.ROTATE_LEFT,
+        Action.ROTATE_RIGHT: BatchAction.ROTATE_RIGHT,
+        Action.SOFT_DROP: BatchAction.SOFT_DROP,
+        Action.FAST_DROP: BatchAction.FAST_DROP,
+        Action.HOLD: BatchAction.HOLD,
+        }
+
+class PressEngine(TetrisEngine):
+    """A TetrisEngine without ARE or a soft drop delay, so like BatchEngine every press does something straight away"""
+    ARE_DELAY = 0
+    SOFT_DROP_DELAY = 1
+
+class SeededBatchEngine(BatchEngine):
+    """Deals each board the peices of a TetrisEngine with the same seed"""
+
+    def __init__(self, seeds: [int], board_size: Point):
+        self.grab_bags = [GrabBag(TETRIMINOS, seed) for seed in seeds]
+        super().__init__(len(seeds), board_size)
+
+    def get_from_grab_bag(self, index: np.ndarray) -> np.ndarray:
+        return np.array([TETRIMINOS.index(next(self.grab_bags[i])) for i in index], dtype = np.int8)
+
+def get_actions(engine: TetrisEngine, random: Random):
+    """
+    Keep putting the peices of {engine} where the balanced heuristic likes them best, with a random press now and then.
+    every press is let go for a step afterwards, since holding one down would start DAS in the engine
+    """
+    while True:
+        if engine.game_over or random.random() < 0.05:
+            yield random.choice(list(Action)) if not engine.game_over else Action.NONE
+            yield Action.NONE
+            continue
+        peice = engine.player
+        def rate(placement: Placement) -> float:
+            board = engine.board.copy()
+            placement.move(peice).lock(board)
+            return balanced(board, len(board.clear_lines()))
+        placement = max(find_placements(engine.board, peice), key = rate)
+        for actions in placement.get_frames(soft_drop_frames = 1):
+            if engine.player is not peice or engine.game_over:
+                # it locked, maybe by gravity on the way. the last press still has to be let go
+                yield Action.NONE
+                break
+            yield actions
+
+def test_batch_plays_the_same_games_as_the_engine():
+    board_size = Point(10, 20)
+    seeds = range(8)
+    random = Random(0)
+    batch = SeededBatchEngine(seeds, board_size)
+    engines = [PressEngine(board_size, board_type = BitBoard, seed = seed) for seed in seeds]
+    bots = [get_actions(engine, random) for engine in engines]
+    # a stack of rows with a hole each so lines get cleared from the start
+    for i, engine in enumerate(engines):
+        for _ in range(6):
+            engine.board.add_garbage(1, random.randrange(board_size.x))
+        batch.boards[i] = np.frombuffer(engine.board.to_bytes(), dtype = np.uint8).reshape(board_size.y, board_size.x)
+    for step in range(1500):
+        actions = [next(bot) for bot in bots]
+        lines = batch.step([ACTIONS[action] for action in actions])
+        for i, engine in enumerate(engines):
+            lines_cleared = engine.lines_cleared
+            engine.step(actions[i])
+            assert lines[i] == engine.lines_cleared - lines_cleared, f'step {step} board {i}'
+            assert batch.boards[i].tobytes() == engine.board.to_bytes(), f'step {step} board {i}'
+            assert (batch.score[i], batch.lines_cleared[i], batch.level[i], batch.game_over[i]) == \
+                    (engine.score, engine.lines_cleared, engine.level, engine.game_over), f'step {step} board {i}'
+            assert TETRIMINOS[batch.peice[i]] == engine.player.tetrimino, f'step {step} board {i}'
+            if not engine.game_over:
+                assert (batch.x[i], batch.y[i], batch.rotation[i]) == (*engine.player.pos, engine.player.rotation), f'step {step} board {i}'
+            assert (TETRIMINOS[batch.hold[i]] if batch.hold[i] != -1 else None) == (engine.hold.tetrimino if engine.hold else None), \
+                    f'step {step} board {i}'
+    assert batch.lines_cleared.min() > 0
@@ -0,0 +1,106 @@
+from random import Random
+from pygame_tools import Point
+from engine import TetrisEngine, Action, Event
+from board import Board, BitBoard, get_heights
+from movegen import find_placements
+
+
+def get_actions(engine: TetrisEngine, random: Random):
+    """
+    Keep putting the peices of {engine} into one of the lowest places they fit, so lines get cleared,
+    with a random press now and then so the peices also get moved around, kicked and held
+    """
+    while True:
+        while engine.ARE_locked or engine.game_over:
+            yield Action.NONE
+        if random.random() < 0.2:
+            yield random.choice(list(Action))
+            continue
+        placements = find_placements(engine.board, engine.player)
+        lowest = max(placement.pos.y for placement in placements)
+        placement = random.choice([placement for placement in placements if placement.pos.y >= lowest - 1])
+        for actions in placement.get_frames():
+            if engine.ARE_locked or engine.game_over:
+                break
+            yield actions
+
+def play_both(board_size: Point, seed: int, steps: int) -> (int, int):
+    """
+    Step an engine on each kind of board through the same seeded inputs and garbage, checking they match after every step
+    :returns: the lines cleared and garbage pushes over every game played
+    """
+    engines = [TetrisEngine(board_size, board_type = board_type, seed = seed) for board_type in (Board, BitBoard)]
+    random = Random(seed)
+    bot = get_actions(engines[0], random)
+    lines = garbage = 0
+    for step in range(steps):
+        actions = next(bot)
+        incoming = random.randint(1, 3) if random.random() < 0.02 else 0
+        events = []
+        for engine in engines:
+            if incoming:
+                engine.receive_garbage(incoming)
+            events.append(engine.step(actions))
+        assert events[0] == events[1], f'step {step}'
+        garbage += events[0].count(Event.GARBAGE)
+        board, bit_board = (engine.board for engine in engines)
+        assert board.to_bytes() == bit_board.to_bytes(), f'step {step}'
+        assert board.heights == bit_board.heights, f'step {step}'
+        assert board.touched_rows == bit_board.touched_rows, f'step {step}'
+        assert engines[0].score == engines[1].score and engines[0].lines_cleared == engines[1].lines_cleared, f'step {step}'
+        assert engines[0].player.get_values() == engines[1].player.get_values(), f'step {step}'
+        if engines[0].game_over:
+            assert engines[1].game_over
+            lines += engines[0].lines_cleared
+            seed += 1
+            for engine in engines:
+                engine.reset(seed)
+    return lines + engines[0].lines_cleared, garbage
+
+def test_boards_play_the_same_game():
+    lines, garbage = play_both(Point(10, 20), 1, 5000)
+    assert lines and garbage
+
+def test_boards_play_the_same_game_on_other_sizes():
+    for board_size in (Point(6, 12), Point(13, 24)):
+        lines, garbage = play_both(board_size, 2, 3000)
+        assert lines and garbage
+
+def get_fills(board: Board) -> [int]:
+    """The filled squares in each row, which a BitBoard keeps as the bits of its rows"""
+    if isinstance(board, BitBoard):
+        return [bin(row).count('1') for row in board.rows]
+    return board.fills
+
+def test_clearing_lines_with_gaps():
+    random = Random(3)
+    for board_size in (Point(10, 20), Point(7, 16)):
+        width, height = board_size
+        for count in (2, 3, 4):
+            for _ in range(50):
+                # full rows spread over the bottom of the board with at least one row that stays between each of them
+                full = sorted(random.sample(range(height // 2, height, 2), count))
+                rows = []
+                for y in range(height):
+                    if y in full:
+                        row = [random.randint(1, 8) for _ in range(width)]
+                    elif y < height // 4:
+                        row = [0] * width
+                    else:
+                        row = [random.choice((0, random.randint(1, 8))) for _ in range(width)]
+                        row[random.randrange(width)] = 0
+                    rows.append(row)
+                expected = [[0] * width for _ in full] + [row for y, row in enumerate(rows) if y not in full]
+                data = bytes(square for row in rows for square in row)
+                expected_data = bytes(square for row in expected for square in row)
+                for board_type in (Board, BitBoard):
+                    board = board_type.from_bytes(board_size, data)
+                    board.touched_rows = set(range(height))
+                    version = board.version
+                    assert board.clear_lines() == full
+                    assert board.to_bytes() == expected_data
+                    assert board.heights == get_heights(board_size, expected_data)
+                    assert get_fills(board) == [width - row.count(0) for row in expected]
+                    assert board.version == version + 1
+                    assert not board.touched_rows
+                    assert board.clear_lines() == [] and board.version == version + 1
@@ -0,0 +1,82 @@
+import pytest
+from random import Random
+from pygame_tools import Point
+from engine import TETRIMINOS, Peice, Cell, TetrisEngine, Action, Event, Snapshot
+from board import Board, BitBoard
+
+
+def get_peice(cell: Cell, pos: Point) -> (Peice, Board):
+    board_size = Point(10, 20)
+    peice = Peice(next(tetrimino for tetrimino in TETRIMINOS if tetrimino.cell == cell), board_size)
+    peice.pos = pos
+    return peice, Board(board_size)
+
+def test_l_kicks_off_the_left_wall():
+    # spawn is SRS state R, turning right to state 2 tries (0, 0) then one to the right
+    peice, board = get_peice(Cell.L, Point(-1, 5))
+    assert peice.rotate_right(board)
+    assert peice.rotation == 1 and peice.pos == Point(0, 5)
+
+def test_j_kicks_off_the_right_wall():
+    # spawn is SRS state L, turning left to state 2 tries (0, 0) then one to the left
+    peice, board = get_peice(Cell.J, Point(8, 5))
+    assert peice.rotate_left(board)
+    assert peice.rotation == 3 and peice.pos == Point(7, 5)
+
+def play(engine: TetrisEngine, seed: int, steps: int) -> [tuple]:
+    """
+    Press random actions with some garbage coming in, starting a new game when one ends
+    :returns: the board, score and falling peice after every step
+    """
+    random = Random(seed)
+    played = []
+    for _ in range(steps):
+        if random.random() < 0.02:
+            engine.receive_garbage(random.randint(1, 3))
+        engine.step(random.choice(list(Action)))
+        if engine.game_over:
+            engine.reset(engine.seed + 1)
+        played.append((engine.board.to_bytes(), engine.score, engine.player.get_values()))
+    return played
+
+def test_snapshot_saves_and_restores():
+    for board_type in (Board, BitBoard):
+        engine = TetrisEngine(board_type = board_type, seed = 4)
+        play(engine, 1, 320)
+        snapshot = engine.snapshot()
+        loaded = Snapshot.from_bytes(snapshot.to_bytes())
+        assert loaded == snapshot
+        ahead = play(engine, 2, 500)
+        # a snapshot restores onto either kind of board
+        for restored_type in (Board, BitBoard):
+            restored = TetrisEngine(board_type = restored_type, seed = 0)
+            restored.restore(loaded)
+            assert restored.snapshot() == snapshot
+            assert play(restored, 2, 500) == ahead
+
+def test_copy_plays_ahead_without_touching_the_original():
+    for board_type in (Board, BitBoard):
+        engine = TetrisEngine(board_type = board_type, seed = 5)
+        play(engine, 1, 320)
+        snapshot = engine.snapshot()
+        copy = engine.copy()
+        assert type(copy.board) is board_type
+        ahead = play(copy, 2, 500)
+        assert engine.snapshot() == snapshot
+        assert play(engine, 2, 500) == ahead
+
+def test_seeds_must_fit_in_a_snapshot():
+    for seed in (-1, TetrisEngine.MAX_SEED + 1, 2 ** 70):
+        with pytest.raises(ValueError):
+            TetrisEngine(seed = seed)
+    engine = TetrisEngine(seed = TetrisEngine.MAX_SEED)
+    assert Snapshot.from_bytes(engine.snapshot().to_bytes()).seed == TetrisEngine.MAX_SEED
+
+def test_end_game():
+    engine = TetrisEngine(seed = 1)
+    engine.step(Action.FAST_DROP)
+    board = engine.board.to_bytes()
+    assert engine.end_game() == [Event.GAME_OVER]
+    assert engine.game_over and engine.board.to_bytes() == board
+    assert engine.end_game() == []
+    assert engine.step(Action.FAST_DROP) == [] and engine.board.to_bytes() == board
@@ -0,0 +1,65 @@
+from pygame_tools import Point
+from engine import TETRIMINOS, TetrisEngine, Peice, Cell, Event
+from board import Board
+from movegen import Placement, find_placements
+
+BOARD_SIZE = Point(10, 20)
+
+def get_engine(rows: [str], cell: Cell) -> TetrisEngine:
+    """An engine with {cell}'s peice falling onto a board that has {rows} at the bottom, X for a filled square"""
+    rows = ['.' * BOARD_SIZE.x] * (BOARD_SIZE.y - len(rows)) + rows
+    engine = TetrisEngine(BOARD_SIZE, seed = 0)
+    engine.board = Board.from_bytes(BOARD_SIZE, bytes(0 if square == '.' else 8 for row in rows for square in row))
+    engine.player = Peice(next(tetrimino for tetrimino in TETRIMINOS if tetrimino.cell == cell), BOARD_SIZE)
+    return engine
+
+def play(engine: TetrisEngine, placement: Placement) -> int:
+    """
+    Step a copy of {engine} through the frames of {placement} and check the peice locked there
+    :returns: how many of the turns on the way were kicked somewhere else
+    """
+    frames = placement.get_frames()
+    game = engine.copy()
+    game.delay_counters['auto_drop'].calls = len(frames) + 1 # gravity would move it off the path, see {Placement.get_frames}
+    peice = engine.player
+    kicks = 0
+    for actions in frames:
+        pos = Point(*game.player.pos)
+        events = game.step(actions)
+        if Event.ROTATE in events and game.player.pos != pos:
+            kicks += 1
+    placed = placement.move(peice)
+    assert (game.last_locked.pos, game.last_locked.rotation) == (placement.pos, placement.rotation)
+    assert not placed.check_valid_position(engine.board, Point(placed.pos.x, placed.pos.y + 1)), 'it rests on something'
+    expected = engine.board.copy()
+    placed.lock(expected)
+    expected.clear_lines()
+    assert game.board.to_bytes() == expected.to_bytes()
+    return kicks
+
+def test_frames_reach_every_placement():
+    ragged = ['X.........', 'XX...X..XX', 'XXX.XXX.XX', 'XXXX.XXXXX']
+    for rows in ([], ragged):
+        for tetrimino in TETRIMINOS:
+            engine = get_engine(rows, tetrimino.cell)
+            placements = find_placements(engine.board, engine.player)
+            assert placements
+            for placement in placements:
+                play(engine, placement)
+
+def test_tuck_under_an_overhang():
+    engine = get_engine(['XXXX......', '..........', '..........'], Cell.O)
+    tucked = [placement for placement in find_placements(engine.board, engine.player) if placement.pos == Point(0, 18)]
+    assert len(tucked) == 1
+    assert play(engine, tucked[0]) == 0
+
+def test_kick_spin():
+    # a T spin triple, the T can only turn into the slot by kicking down a row and over a column
+    engine = get_engine(['...XX.....', '....X.....', 'XXX.XXXXXX', 'XX..XXXXXX', 'XXX.XXXXXX'], Cell.T)
+    spins = [placement for placement in find_placements(engine.board, engine.player) if placement.pos == Point(2, 17)]
+    assert len(spins) == 1
+    assert play(engine, spins[0]) == 1
+    copy = engine.copy()
+    for actions in spins[0].get_frames():
+        copy.step(actions)
+    assert copy.lines_cleared == 3
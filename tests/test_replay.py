@@ -0,0 +1,58 @@
+from random import Random
+from engine import TetrisEngine, Action
+from board import Board, BitBoard
+from replay import Replay
+from test_board import get_actions
+
+
+def record(seed: int, frames: int) -> (Replay, TetrisEngine):
+    """Record a game of the placement bot until it ends or {frames} have gone by"""
+    engine = TetrisEngine(seed = seed)
+    replay = Replay.from_engine(engine)
+    bot = get_actions(engine, Random(seed))
+    for _ in range(frames):
+        actions = next(bot)
+        replay.record(actions)
+        engine.step(actions)
+        if engine.game_over:
+            break
+    replay.finish(engine)
+    return replay, engine
+
+def get_action_offsets(replay: Replay) -> [int]:
+    """Where the Action byte of each run is in {replay.to_bytes}"""
+    offsets = []
+    i = Replay.HEADER.size
+    for _, frames in replay.runs:
+        offsets.append(i)
+        i += 1 + max(1, (frames.bit_length() + 6) // 7)
+    return offsets
+
+def test_replay_saves_loads_and_verifies(tmp_path):
+    replay, engine = record(6, 3000)
+    assert engine.lines_cleared
+    path = tmp_path / 'game.replay'
+    replay.save(path)
+    loaded = Replay.load(path)
+    assert (loaded.seed, loaded.board_size, loaded.frames, loaded.runs) == (replay.seed, replay.board_size, replay.frames, replay.runs)
+    for board_type in (Board, BitBoard):
+        assert loaded.verify(board_type)
+        assert loaded.play(board_type).board.to_bytes() == engine.board.to_bytes()
+
+def test_changed_replay_fails_to_verify(tmp_path):
+    replay, engine = record(6, 3000)
+    data = replay.to_bytes()
+    offsets = get_action_offsets(replay)
+    assert [data[i] for i in offsets] == [actions for actions, _ in replay.runs]
+    # a fast drop halfway through that never happened
+    drop = next(i for i in offsets[len(offsets) // 2:] if data[i] == Action.FAST_DROP)
+    changed = bytearray(data)
+    changed[drop] = Action.NONE
+    path = tmp_path / 'changed.replay'
+    path.write_bytes(changed)
+    assert not Replay.load(path).verify()
+    # a header that doesn't match the game
+    changed = bytearray(data)
+    changed[Replay.HEADER.size - 12] ^= 1 # the lowest byte of the score
+    path.write_bytes(changed)
+    assert not Replay.load(path).verify()
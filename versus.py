@@ -0,0 +1,302 @@
+"""
+Two player versus over the local network
+the server pairs players up in the order they connect and passes what happens in each game on to the other player.
+both games of a match are played on the board size of the player that connected first, which START tells the second.
+each player runs their own engine so their controls never wait on the network, and only a few bytes are sent when
+something changes. a message is one byte of its {Message} type followed by its fixed size payload from {FORMATS}, e.g.:
+    python versus.py --port 7777                  start a server
+    python pytetris.py --versus localhost:7777    play on it
+"""
+
+import socket, asyncio, argparse, threading, queue
+from enum import IntEnum
+from struct import Struct
+from random import Random
+from pygame_tools import Point
+from engine import Peice
+from board import Board
+
+
+# the size of each message is with its type byte, e.g. a MOVE is 1 + 6 bytes of <BBhh
+class Message(IntEnum):
+    START = 0 # server to player: the seed both games use, the index of the player and the board size. 10 bytes
+    MOVE = 1 # the falling peice moved: cell, rotation, x, y. 7 bytes
+    LOCK = 2 # a peice locked: cell, rotation, x, y. 7 bytes
+    GARBAGE = 3 # garbage was pushed up the board: rows, hole. 5 bytes
+    ATTACK = 4 # rows of garbage sent to the opponent. 2 bytes
+    GAME_OVER = 5 # the player topped out. 1 byte
+    RESULT = 6 # server to player: the index of the winner. 2 bytes
+    HELLO = 7 # player to server, first thing after connecting: the board size the player wants. 5 bytes
+
+FORMATS = {
+        Message.START: Struct('<IBHH'),
+        Message.MOVE: Struct('<BBhh'),
+        Message.LOCK: Struct('<BBhh'),
+        Message.GARBAGE: Struct('<HH'),
+        Message.ATTACK: Struct('<B'),
+        Message.GAME_OVER: Struct('<'),
+        Message.RESULT: Struct('<B'),
+        Message.HELLO: Struct('<HH'),
+        }
+
+MIN_BOARD_SIZE = Point(4, 4) # the smallest board every peice fits on
+
+# messages the server passes straight on to the opponent
+RELAYED = {Message.MOVE, Message.LOCK, Message.GARBAGE, Message.ATTACK}
+
+def encode(message: Message, *values: int) -> bytes:
+    return bytes((message,)) + FORMATS[message].pack(*values)
+
+async def read_message(reader: asyncio.StreamReader) -> (Message, (int,)):
+    """
+    Wait for the next whole message
+    :raises asyncio.IncompleteReadError: when the connection closes
+    """
+    message = Message((await reader.readexactly(1))[0])
+    return message, FORMATS[message].unpack(await reader.readexactly(FORMATS[message].size))
+
+def set_no_delay(writer: asyncio.StreamWriter):
+    """Send small messages straight away instead of waiting to put more in the same packet"""
+    sock = writer.get_extra_info('socket')
+    if sock is not None:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+class Match:
+    """Two players on a {VersusServer} playing the same seed on the same size of board against each other"""
+
+    def __init__(self, seed: int, board_size: Point):
+        self.seed = seed
+        self.board_size = board_size
+        self.writers = []
+        self.finished = False
+
+    def send(self, index: int, data: bytes):
+        """Send {data} to the player at {index} unless they have left"""
+        writer = self.writers[index]
+        if not writer.is_closing():
+            writer.write(data)
+
+    def start(self):
+        for index in range(len(self.writers)):
+            self.send(index, encode(Message.START, self.seed, index, *self.board_size))
+
+    def finish(self, winner: int):
+        """Tell both players who won. only the first result of a match counts"""
+        if not self.finished:
+            self.finished = True
+            for index in range(len(self.writers)):
+                self.send(index, encode(Message.RESULT, winner))
+
+class VersusServer:
+    """
+    Pairs up players as they connect and runs their matches
+    the server doesn't simulate any games. it picks the seed, passes on what each player sends,
+    and decides the winner as the first player to top out or leave loses
+    """
+
+    def __init__(self, host: str = '', port: int = 7777):
+        """
+        :host: Optional. defaults to every interface. the address to listen on
+        :port: Optional. defaults to 7777
+        """
+        self.host = host
+        self.port = port
+        self.waiting = None # the match with one player in it waiting for a second
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_player, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        if self.server is None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def handle_player(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Put a new connection into a match and pass on its messages until it closes
+        a connection that doesn't start with a HELLO of a board every peice fits on is closed
+        """
+        set_no_delay(writer)
+        try:
+            message, values = await read_message(reader)
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            message = None
+        board_size = Point(*values) if message == Message.HELLO else None
+        if board_size is None or board_size.x < MIN_BOARD_SIZE.x or board_size.y < MIN_BOARD_SIZE.y:
+            writer.close()
+            return
+        if self.waiting is None:
+            # the first player of a match picks the board size
+            self.waiting = Match(Random().getrandbits(32), board_size)
+        match = self.waiting
+        index = len(match.writers)
+        match.writers.append(writer)
+        if len(match.writers) == 2:
+            self.waiting = None
+            match.start()
+        try:
+            while True:
+                message, values = await read_message(reader)
+                if message in RELAYED and len(match.writers) == 2 and not match.finished:
+                    match.send(1 - index, encode(message, *values))
+                elif message == Message.GAME_OVER:
+                    match.finish(1 - index)
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            # ValueError is an unknown message type, the connection can't be trusted after it
+            pass
+        finally:
+            if match is self.waiting:
+                self.waiting = None
+            elif len(match.writers) == 2:
+                match.finish(1 - index)
+            writer.close()
+
+class OpponentBoard:
+    """
+    What a player sees of their opponent's game, rebuilt from the messages passed on by the server
+    locked peices, cleared lines and garbage are applied to {self.board} the same way the opponent's engine did,
+    so it matches their board without it ever being sent
+    """
+
+    def __init__(self, board_size: Point = Point(10, 20)):
+        """
+        :board_size: Optional. defaults to 10x20. the size of the board in cells
+        """
+        self.board_size = board_size
+        self.board = Board(board_size)
+        self.player = None
+
+    def apply(self, message: Message, values: (int,)) -> bool:
+        """
+        Update the board with a message from the opponent
+        :returns: True if the message changed what the opponent looks like
+        """
+        if message == Message.MOVE:
+            self.player = Peice.from_values(*values, self.board_size)
+        elif message == Message.LOCK:
+            Peice.from_values(*values, self.board_size).lock(self.board)
+            self.board.clear_lines()
+            self.player = None
+        elif message == Message.GARBAGE:
+            self.board.add_garbage(*values)
+        else:
+            return False
+        return True
+
+class VersusClient:
+    """
+    The connection of one player to a {VersusServer}
+    the network runs an event loop on its own thread so the game never waits on it.
+    the game sends with the send methods, and picks up what came in with {self.poll}
+    """
+
+    def __init__(self, host: str, port: int, board_size: Point = Point(10, 20)):
+        """
+        :host: the address of the server
+        :port: the port of the server
+        :board_size: Optional. defaults to 10x20. the size of board asked for. when the opponent connected first
+            their size is used instead, and {self.board_size} is changed to it once the match starts
+        """
+        self.host = host
+        self.port = port
+        self.board_size = board_size
+        self.opponent = OpponentBoard(board_size)
+        self.incoming = queue.SimpleQueue()
+        self.started = threading.Event()
+        self.loop = asyncio.new_event_loop()
+        self.thread = None
+        self.writer = None
+        self.seed = None
+        self.index = None
+        self.winner = None
+        self.connected = False
+
+    def connect(self):
+        """
+        Connect to the server in the background
+        {self.started} is set once there is an opponent, then {self.seed} is the seed to reset the engine with
+        and {self.board_size} is the size of board to play on
+        :raises OSError: when the server can't be reached
+        """
+        future = asyncio.run_coroutine_threadsafe(asyncio.open_connection(self.host, self.port), self.loop)
+        self.thread = threading.Thread(target = self.loop.run_forever, daemon = True)
+        self.thread.start()
+        reader, self.writer = future.result()
+        set_no_delay(self.writer)
+        self.connected = True
+        self.send(Message.HELLO, *self.board_size)
+        asyncio.run_coroutine_threadsafe(self.receive(reader), self.loop)
+
+    async def receive(self, reader: asyncio.StreamReader):
+        try:
+            while True:
+                message, values = await read_message(reader)
+                if message == Message.START:
+                    self.seed, self.index, width, height = values
+                    if (width, height) != tuple(self.board_size):
+                        self.board_size = Point(width, height)
+                        self.opponent = OpponentBoard(self.board_size)
+                    self.started.set()
+                else:
+                    self.incoming.put((message, values))
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            self.incoming.put((None, ()))
+
+    def send(self, message: Message, *values: int):
+        """Send a message from the game's thread"""
+        if self.connected:
+            self.loop.call_soon_threadsafe(self.writer.write, encode(message, *values))
+
+    def send_move(self, peice: Peice):
+        self.send(Message.MOVE, *peice.get_values())
+
+    def send_lock(self, peice: Peice):
+        self.send(Message.LOCK, *peice.get_values())
+
+    def send_garbage(self, rows: int, hole: int):
+        self.send(Message.GARBAGE, min(rows, 0xffff), hole)
+
+    def send_attack(self, rows: int):
+        self.send(Message.ATTACK, min(rows, 255))
+
+    def send_game_over(self):
+        self.send(Message.GAME_OVER)
+
+    def poll(self) -> [(Message, (int,))]:
+        """
+        Get the messages that came in since the last poll. moves, locks and garbage are applied to {self.opponent}
+        and a RESULT sets {self.winner}. losing the connection comes out as a message of None
+        """
+        messages = []
+        while True:
+            try:
+                message, values = self.incoming.get_nowait()
+            except queue.Empty:
+                return messages
+            if message is None:
+                self.connected = False
+            elif message == Message.RESULT:
+                self.winner = values[0]
+            else:
+                self.opponent.apply(message, values)
+            messages.append((message, values))
+
+    def close(self):
+        if self.connected:
+            self.connected = False
+            self.loop.call_soon_threadsafe(self.writer.close)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default = '', help = 'the address to listen on. defaults to every interface')
+    parser.add_argument('--port', type = int, default = 7777, help = 'defaults to 7777')
+    args = parser.parse_args()
+    server = VersusServer(args.host, args.port)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass